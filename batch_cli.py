@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+批量解析命令行工具
+从文件或标准输入逐行读取视频链接，并发解析，每完成一个即向标准输出写出一行 JSON（JSON Lines）；
+在途任务数有上限，内存占用与输入规模无关
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from typing import Any, Dict, Iterable, Iterator, List, TextIO
+
+from integrated_parser import IntegratedVideoParser
+from parse_result import json_default
+from scheduler import BATCH
+from structured_log import setup_logging
+from vid_index import VidIndex
+
+
+def iter_urls(paths: List[str]) -> Iterator[str]:
+    """逐行读取输入中的链接，跳过空行和 # 注释行；'-' 表示标准输入"""
+    for path in paths or ['-']:
+        stream = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+        try:
+            for line in stream:
+                url = line.strip()
+                if url and not url.startswith('#'):
+                    yield url
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+
+def parse_one(parser: IntegratedVideoParser, url: str, priority: str = BATCH) -> Dict[str, Any]:
+    """解析单个链接，异常也转为结果行；默认按批量类别调度，不与交互请求争抢执行槽位"""
+    start_time = time.monotonic()
+    try:
+        result = parser.parse_video(url, priority=priority).copy()
+    except Exception as e:
+        result = {'success': False, 'error': f'解析异常: {str(e)}'}
+    result['input'] = url
+    result['elapsed'] = round(time.monotonic() - start_time, 3)
+    return result
+
+
+def run_batch(parser: IntegratedVideoParser,
+              urls: Iterable[str],
+              out: TextIO,
+              parallelism: int = 8,
+              ordered: bool = False,
+              progress: TextIO = None) -> Dict[str, Any]:
+    """并发解析并流式输出，返回统计信息"""
+    window = parallelism * 2
+    stats = {'total': 0, 'success': 0, 'failed': 0}
+    start_time = time.monotonic()
+
+    def emit(result: Dict[str, Any]) -> None:
+        out.write(json.dumps(result, ensure_ascii=False, default=json_default) + '\n')
+        stats['total'] += 1
+        stats['success' if result.get('success') else 'failed'] += 1
+        if progress is not None and stats['total'] % 1000 == 0:
+            elapsed = time.monotonic() - start_time
+            progress.write(f"已完成 {stats['total']} 条，{stats['total'] / elapsed:.1f} 条/秒\n")
+
+    with ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix='batch') as executor:
+        pending = deque() if ordered else set()
+        for url in urls:
+            future = executor.submit(parse_one, parser, url)
+            if ordered:
+                pending.append(future)
+                # 按输入顺序输出：队首完成即写出；窗口满时等待队首
+                while pending and (pending[0].done() or len(pending) >= window):
+                    emit(pending.popleft().result())
+            else:
+                pending.add(future)
+                if len(pending) >= window:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for finished in done:
+                        emit(finished.result())
+        if ordered:
+            while pending:
+                emit(pending.popleft().result())
+        else:
+            for finished in as_completed(pending):
+                emit(finished.result())
+    out.flush()
+
+    stats['elapsed'] = round(time.monotonic() - start_time, 3)
+    stats['rate'] = round(stats['total'] / stats['elapsed'], 2) if stats['elapsed'] else 0.0
+    return stats
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='批量解析视频链接，输出 JSON Lines')
+    parser.add_argument('inputs', nargs='*', help="输入文件，每行一个链接；省略或 '-' 表示标准输入")
+    parser.add_argument('-j', '--parallelism', type=int, default=8, help='并发解析数')
+    parser.add_argument('--ordered', action='store_true', help='按输入顺序输出（默认按完成顺序）')
+    parser.add_argument('-q', '--quiet', action='store_true', help='不在标准错误输出进度')
+    parser.add_argument('--vid-index', default=None, help='视频元数据索引文件，命中的视频不再请求平台页面')
+    args = parser.parse_args()
+
+    out = sys.stdout
+    progress = None if args.quiet else sys.stderr
+    # 解析器日志写到标准错误，标准输出只保留 JSON 行
+    setup_logging(sys.stderr)
+    vid_index = VidIndex(args.vid_index) if args.vid_index else None
+    stats = run_batch(IntegratedVideoParser(vid_index=vid_index), iter_urls(args.inputs), out,
+                      parallelism=args.parallelism, ordered=args.ordered, progress=progress)
+    if progress is not None:
+        progress.write(f"完成：共 {stats['total']} 条，成功 {stats['success']}，失败 {stats['failed']}，"
+                       f"耗时 {stats['elapsed']} 秒，{stats['rate']} 条/秒\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+可断点续跑的批量解析任务
+进度与结果保存在本地 SQLite 任务库中：重启后跳过已完成和重复的视频（按规范键去重），
+临时失败放到最后重试，并提供实时进度与吞吐统计
+"""
+
+import argparse
+import json
+import logging
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Iterable, Optional, TextIO
+
+from integrated_parser import IntegratedVideoParser
+from batch_cli import iter_urls, parse_one
+from negative_cache import TRANSIENT
+from parse_result import json_default
+from structured_log import get_logger, log_event, setup_logging
+
+logger = get_logger('batch_job')
+
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+RETRY = 'retry'
+
+# 未标注失败类别的结果中，重试也无法成功的错误
+PERMANENT_ERRORS = ('不支持的视频平台', '无法提取')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS items_status_seq ON items (status, seq);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def is_transient_failure(result: Dict[str, Any]) -> bool:
+    """失败结果是否值得重试"""
+    if result.get('success'):
+        return False
+    if result.get('error_type'):
+        return result['error_type'] == TRANSIENT
+    error = result.get('error') or ''
+    return not any(marker in error for marker in PERMANENT_ERRORS)
+
+
+class BatchJob:
+    """批量解析任务"""
+
+    def __init__(self,
+                 path: str,
+                 parser: Optional[IntegratedVideoParser] = None,
+                 parallelism: int = 8,
+                 max_attempts: int = 3,
+                 retry_delay: float = 5.0,
+                 commit_interval: float = 1.0):
+        self.path = path
+        self.parser = parser or IntegratedVideoParser()
+        self.parallelism = parallelism
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.commit_interval = commit_interval
+        self.db = sqlite3.connect(path)
+        self.db.executescript(_SCHEMA)
+        # WAL 模式下每次提交只追加日志，崩溃后数据库仍保持一致
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self._started_at: Optional[float] = None
+        self._processed = 0
+
+    def _meta(self, name: str) -> Optional[str]:
+        row = self.db.execute('SELECT value FROM meta WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, name: str, value: str) -> None:
+        self.db.execute('INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)', (name, value))
+
+    @property
+    def input_complete(self) -> bool:
+        """输入是否已完整导入过"""
+        return self._meta('input_complete') == '1'
+
+    def add_urls(self, urls: Iterable[str], chunk_size: int = 5000, append: bool = False) -> int:
+        """导入链接（按规范键去重），返回新增条数
+
+        输入已完整导入过时（续跑）不再读取 urls 并记录警告；append=True 时追加导入，已有的视频仍按规范键去重。
+        """
+        if self.input_complete and not append:
+            log_event(logger, 'batch_job.input_skipped', level=logging.WARNING,
+                      path=self.path, stage='import', outcome='skipped')
+            return 0
+        row = self.db.execute('SELECT COALESCE(MAX(seq), 0) FROM items').fetchone()
+        seq = row[0]
+        added = 0
+        chunk = []
+
+        def flush():
+            nonlocal added
+            before = self.db.total_changes
+            self.db.executemany(
+                'INSERT OR IGNORE INTO items (key, url, seq, status) VALUES (?, ?, ?, ?)', chunk)
+            added += self.db.total_changes - before
+            self.db.commit()
+            chunk.clear()
+
+        for url in urls:
+            seq += 1
+            platform, vid = self.parser.canonical_key(url)
+            chunk.append((f'{platform}|{vid}', url, seq, PENDING))
+            if len(chunk) >= chunk_size:
+                flush()
+        flush()
+        self._set_meta('input_complete', '1')
+        self.db.commit()
+        return added
+
+    def _iter_items(self, status: str, max_attempts: Optional[int] = None, page_size: int = 1000):
+        """按输入顺序分页读取指定状态的条目"""
+        last_seq = 0
+        while True:
+            query = 'SELECT key, url, seq, attempts FROM items WHERE status = ? AND seq > ?'
+            params = [status, last_seq]
+            if max_attempts is not None:
+                query += ' AND attempts < ?'
+                params.append(max_attempts)
+            rows = self.db.execute(query + ' ORDER BY seq LIMIT ?', params + [page_size]).fetchall()
+            if not rows:
+                return
+            for key, url, seq, attempts in rows:
+                yield key, url, attempts
+            last_seq = rows[-1][2]
+
+    def _record(self, key: str, attempts: int, result: Dict[str, Any]) -> None:
+        """写入单条结果"""
+        if result.get('success'):
+            status, error = DONE, None
+        else:
+            error = result.get('error')
+            status = RETRY if is_transient_failure(result) and attempts < self.max_attempts else FAILED
+        self.db.execute(
+            'UPDATE items SET status = ?, attempts = ?, result = ?, error = ?, updated = ? WHERE key = ?',
+            (status, attempts, json.dumps(result, ensure_ascii=False, default=json_default), error, time.time(), key)
+        )
+        self._processed += 1
+
+    def _process(self, items, on_progress: Optional[Callable[[Dict[str, Any]], None]]) -> None:
+        """并发处理一批条目，定期提交"""
+        window = self.parallelism * 2
+        last_commit = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.parallelism, thread_name_prefix='batch-job') as executor:
+            pending = {}
+
+            def collect(done):
+                nonlocal last_commit
+                for future in done:
+                    key, attempts = pending.pop(future)
+                    self._record(key, attempts, future.result())
+                if time.monotonic() - last_commit >= self.commit_interval:
+                    self.db.commit()
+                    last_commit = time.monotonic()
+                    if on_progress:
+                        on_progress(self.progress())
+
+            try:
+                for key, url, attempts in items:
+                    pending[executor.submit(parse_one, self.parser, url)] = (key, attempts + 1)
+                    if len(pending) >= window:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        collect(done)
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+            finally:
+                # 中断时也保存已完成的结果
+                self.db.commit()
+
+    def run(self, on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """执行任务：先处理全部待解析条目，再重试临时失败的条目"""
+        self._started_at = time.monotonic()
+        self._processed = 0
+        self._process(self._iter_items(PENDING), on_progress)
+
+        while True:
+            retry_items = list(self._iter_items(RETRY, self.max_attempts, page_size=self.parallelism * 50))
+            if not retry_items:
+                break
+            time.sleep(self.retry_delay)
+            self._process(iter(retry_items), on_progress)
+        return self.progress()
+
+    def progress(self) -> Dict[str, Any]:
+        """各状态条目数与本次运行的吞吐"""
+        counts = dict(self.db.execute('SELECT status, COUNT(*) FROM items GROUP BY status').fetchall())
+        total = sum(counts.values())
+        stats = {
+            'total': total,
+            'done': counts.get(DONE, 0),
+            'failed': counts.get(FAILED, 0),
+            'retry': counts.get(RETRY, 0),
+            'pending': counts.get(PENDING, 0)
+        }
+        if self._started_at is not None:
+            elapsed = time.monotonic() - self._started_at
+            rate = self._processed / elapsed if elapsed > 0 else 0.0
+            remaining = stats['pending'] + stats['retry']
+            stats['elapsed'] = round(elapsed, 1)
+            stats['rate'] = round(rate, 2)
+            stats['eta'] = round(remaining / rate, 1) if rate > 0 else None
+        return stats
+
+    def export(self, out: TextIO, include_failed: bool = True) -> int:
+        """按输入顺序导出结果为 JSON Lines"""
+        statuses = (DONE, FAILED, RETRY) if include_failed else (DONE,)
+        count = 0
+        query = 'SELECT result FROM items WHERE result IS NOT NULL AND status IN (%s) ORDER BY seq' % (
+            ','.join('?' * len(statuses)))
+        for (result,) in self.db.execute(query, statuses):
+            out.write(result + '\n')
+            count += 1
+        return count
+
+    def close(self) -> None:
+        """关闭任务库"""
+        self.db.close()
+
+
+def _print_progress(stats: Dict[str, Any]) -> None:
+    """进度输出到标准错误"""
+    sys.stderr.write(
+        f"进度: 完成 {stats['done']}/{stats['total']}，失败 {stats['failed']}，待重试 {stats['retry']}，"
+        f"{stats.get('rate', 0)} 条/秒，预计剩余 {stats.get('eta') or '-'} 秒\n"
+    )
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='可断点续跑的批量解析任务')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='导入链接并执行（重复执行即从断点继续）')
+    run_parser.add_argument('job', help='任务库文件路径')
+    run_parser.add_argument('inputs', nargs='*', help="输入文件；省略或 '-' 表示标准输入")
+    run_parser.add_argument('-j', '--parallelism', type=int, default=8, help='并发解析数')
+    run_parser.add_argument('--max-attempts', type=int, default=3, help='临时失败的最大尝试次数')
+    run_parser.add_argument('--append', action='store_true', help='向已导入过输入的任务库追加新链接')
+
+    status_parser = subparsers.add_parser('status', help='查看任务进度')
+    status_parser.add_argument('job', help='任务库文件路径')
+
+    export_parser = subparsers.add_parser('export', help='导出结果为 JSON Lines')
+    export_parser.add_argument('job', help='任务库文件路径')
+    export_parser.add_argument('--only-success', action='store_true', help='只导出成功的结果')
+
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        job = BatchJob(args.job, parallelism=args.parallelism, max_attempts=args.max_attempts)
+        setup_logging(sys.stderr)
+        if job.input_complete and not args.append:
+            sys.stderr.write("任务库已导入过输入，本次输入不再导入（从断点继续）；追加新链接请使用 --append\n")
+        else:
+            added = job.add_urls(iter_urls(args.inputs), append=args.append)
+            sys.stderr.write(f"新导入 {added} 条\n")
+        stats = job.run(on_progress=_print_progress)
+        _print_progress(stats)
+    elif args.command == 'status':
+        job = BatchJob(args.job)
+        print(json.dumps(job.progress(), ensure_ascii=False))
+    else:
+        job = BatchJob(args.job)
+        job.export(sys.stdout, include_failed=not args.only_success)
+    job.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+共享缓存后端
+多个解析服务节点通过同一后端共享视频元数据和线路健康状态。
+提供进程内实现和 Redis 协议（RESP）实现，批量读写在一次往返中完成；
+附带一个兼容 Redis 协议的本地替身服务，便于在没有 Redis 的环境中测试
+"""
+
+import argparse
+import queue
+import socket
+import socketserver
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+class CacheError(Exception):
+    """缓存后端不可用或返回错误"""
+
+
+class CacheBackend:
+    """缓存后端接口
+
+    键和值均为字符串，ttl 为秒数（None 表示不过期）。
+    子类至少实现 get_many、set_many、delete，单键读写默认由批量接口实现。
+    """
+
+    def get(self, key: str) -> Optional[str]:
+        """读取单个键，不存在时返回 None"""
+        return self.get_many([key])[0]
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        """写入单个键"""
+        self.set_many({key: value}, ttl)
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[str]]:
+        """批量读取，按 keys 顺序返回"""
+        raise NotImplementedError
+
+    def set_many(self, items: Dict[str, str], ttl: Optional[float] = None) -> None:
+        """批量写入"""
+        raise NotImplementedError
+
+    def delete(self, *keys: str) -> None:
+        """删除键"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """释放连接"""
+
+
+class MemoryBackend(CacheBackend):
+    """进程内实现（单节点或测试使用）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: Dict[str, Tuple[Optional[float], str]] = {}
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[str]]:
+        now = time.monotonic()
+        values = []
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is not None and entry[0] is not None and entry[0] <= now:
+                    del self._data[key]
+                    entry = None
+                values.append(entry[1] if entry is not None else None)
+        return values
+
+    def set_many(self, items: Dict[str, str], ttl: Optional[float] = None) -> None:
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            for key, value in items.items():
+                self._data[key] = (expires, value)
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def flush(self) -> None:
+        """清空全部数据"""
+        with self._lock:
+            self._data.clear()
+
+
+def encode_command(*args) -> bytes:
+    """按 RESP 编码一条命令"""
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode('utf-8')
+        parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+    return b''.join(parts)
+
+
+def _parse_int(payload: bytes) -> int:
+    """解析回复中的整数，格式错误视为协议错误"""
+    try:
+        return int(payload)
+    except ValueError:
+        raise CacheError(f'回复格式错误: {payload!r}') from None
+
+
+def read_reply(stream):
+    """从缓冲流中读取一条 RESP 回复；格式错误抛出 CacheError"""
+    line = stream.readline()
+    if not line.endswith(b'\r\n'):
+        raise CacheError('连接已断开')
+    prefix, payload = line[:1], line[1:-2]
+    if prefix == b'+':
+        return payload.decode('utf-8', 'replace')
+    if prefix == b'-':
+        raise CacheError(payload.decode('utf-8', 'replace'))
+    if prefix == b':':
+        return _parse_int(payload)
+    if prefix == b'$':
+        length = _parse_int(payload)
+        if length < 0:
+            return None
+        data = stream.read(length + 2)
+        if len(data) != length + 2:
+            raise CacheError('连接已断开')
+        return data[:-2]
+    if prefix == b'*':
+        count = _parse_int(payload)
+        return None if count < 0 else [read_reply(stream) for _ in range(count)]
+    raise CacheError(f'无法识别的回复: {line!r}')
+
+
+class RedisBackend(CacheBackend):
+    """Redis 协议实现
+
+    使用小型连接池；批量写入以流水线方式一次发送全部命令、再依次读取回复。
+    所有键自动加上 prefix，多个应用可共用同一个 Redis。
+    """
+
+    def __init__(self,
+                 host: str = '127.0.0.1',
+                 port: int = 6379,
+                 db: int = 0,
+                 password: Optional[str] = None,
+                 prefix: str = 'video2:',
+                 timeout: float = 2.0,
+                 pool_size: int = 4):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.prefix = prefix
+        self.timeout = timeout
+        self._pool: 'queue.LifoQueue' = queue.LifoQueue(maxsize=pool_size)
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> 'RedisBackend':
+        """由 redis://[:password@]host[:port][/db] 创建"""
+        from urllib.parse import urlsplit
+        parts = urlsplit(url)
+        db = int(parts.path.strip('/') or 0)
+        return cls(parts.hostname or '127.0.0.1', parts.port or 6379, db, parts.password, **kwargs)
+
+    def _connect(self):
+        """建立新连接并完成认证与选库"""
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connection = (sock, sock.makefile('rb'))
+        setup = []
+        if self.password:
+            setup.append(('AUTH', self.password))
+        if self.db:
+            setup.append(('SELECT', self.db))
+        if setup:
+            self._pipeline(connection, setup)
+        return connection
+
+    @staticmethod
+    def _pipeline(connection, commands: Iterable[Tuple]) -> list:
+        """一次发送多条命令，按顺序读取回复"""
+        sock, stream = connection
+        commands = list(commands)
+        sock.sendall(b''.join(encode_command(*command) for command in commands))
+        return [read_reply(stream) for _ in commands]
+
+    @contextmanager
+    def _connection(self):
+        """从连接池借出连接；出错的连接（回复可能只读了一部分）直接关闭不再归还"""
+        try:
+            connection = self._pool.get_nowait()
+        except queue.Empty:
+            try:
+                connection = self._connect()
+            except OSError as e:
+                raise CacheError(f'无法连接 Redis: {e}') from e
+        try:
+            yield connection
+        except BaseException:
+            self._close_connection(connection)
+            raise
+        else:
+            try:
+                self._pool.put_nowait(connection)
+            except queue.Full:
+                self._close_connection(connection)
+
+    @staticmethod
+    def _close_connection(connection) -> None:
+        sock, stream = connection
+        try:
+            stream.close()
+            sock.close()
+        except OSError:
+            pass
+
+    def execute(self, *commands: Tuple) -> list:
+        """执行一批命令（流水线），返回各命令的回复"""
+        try:
+            with self._connection() as connection:
+                return self._pipeline(connection, commands)
+        except OSError as e:
+            raise CacheError(f'Redis 通信失败: {e}') from e
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[str]]:
+        if not keys:
+            return []
+        values = self.execute(('MGET',) + tuple(self.prefix + key for key in keys))[0]
+        return [value.decode('utf-8') if value is not None else None for value in values]
+
+    def set_many(self, items: Dict[str, str], ttl: Optional[float] = None) -> None:
+        if not items:
+            return
+        if ttl:
+            milliseconds = max(1, int(ttl * 1000))
+            commands = [('SET', self.prefix + key, value, 'PX', milliseconds) for key, value in items.items()]
+        else:
+            commands = [('SET', self.prefix + key, value) for key, value in items.items()]
+        self.execute(*commands)
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self.execute(('DEL',) + tuple(self.prefix + key for key in keys))
+
+    def ping(self) -> bool:
+        """检查连接"""
+        return self.execute(('PING',))[0] == 'PONG'
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._close_connection(self._pool.get_nowait())
+            except queue.Empty:
+                return
+
+
+class LocalRedisServer:
+    """兼容 Redis 协议的本地替身服务（数据保存在 MemoryBackend 中）
+
+    支持 PING、ECHO、AUTH、SELECT、GET、SET（EX/PX）、MGET、MSET、DEL、FLUSHDB，
+    用于测试和本地开发，不适合生产使用。
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        self.store = MemoryBackend()
+        store = self.store
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                while True:
+                    try:
+                        command = read_reply(self.rfile)
+                    except (CacheError, OSError, ValueError):
+                        return
+                    if not isinstance(command, list) or not command:
+                        return
+                    self.wfile.write(self.server.owner._execute(store, command))
+
+        self._server = socketserver.ThreadingTCPServer((host, port), Handler, bind_and_activate=True)
+        self._server.daemon_threads = True
+        self._server.owner = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """监听地址 (host, port)"""
+        return self._server.server_address[:2]
+
+    @staticmethod
+    def _bulk(value: Optional[str]) -> bytes:
+        if value is None:
+            return b'$-1\r\n'
+        data = value.encode('utf-8')
+        return b'$%d\r\n%s\r\n' % (len(data), data)
+
+    def _execute(self, store: MemoryBackend, command: list) -> bytes:
+        """执行一条命令，返回编码后的回复"""
+        name = command[0].decode('utf-8').upper()
+        args = [arg.decode('utf-8') for arg in command[1:]]
+        if name == 'PING':
+            return b'+PONG\r\n'
+        if name == 'ECHO' and args:
+            return self._bulk(args[0])
+        if name in ('AUTH', 'SELECT'):
+            return b'+OK\r\n'
+        if name == 'GET' and len(args) == 1:
+            return self._bulk(store.get(args[0]))
+        if name == 'SET' and len(args) >= 2:
+            ttl = None
+            if len(args) >= 4 and args[2].upper() in ('EX', 'PX'):
+                ttl = float(args[3]) / (1 if args[2].upper() == 'EX' else 1000)
+            store.set(args[0], args[1], ttl)
+            return b'+OK\r\n'
+        if name == 'MGET':
+            values = store.get_many(args)
+            return b'*%d\r\n' % len(values) + b''.join(self._bulk(value) for value in values)
+        if name == 'MSET' and len(args) % 2 == 0:
+            store.set_many(dict(zip(args[::2], args[1::2])))
+            return b'+OK\r\n'
+        if name == 'DEL':
+            existing = sum(value is not None for value in store.get_many(args))
+            store.delete(*args)
+            return b':%d\r\n' % existing
+        if name == 'FLUSHDB':
+            store.flush()
+            return b'+OK\r\n'
+        return b'-ERR unknown command\r\n'
+
+    def start(self) -> 'LocalRedisServer':
+        """在后台线程中启动"""
+        self._thread = threading.Thread(target=self._server.serve_forever, name='local-redis', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """停止服务"""
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main():
+    """命令行入口：启动本地替身服务"""
+    parser = argparse.ArgumentParser(description='兼容 Redis 协议的本地替身服务')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=6379, help='监听端口')
+    args = parser.parse_args()
+
+    server = LocalRedisServer(args.host, args.port)
+    print(f"本地缓存服务已启动: redis://{args.host}:{server.address[1]}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
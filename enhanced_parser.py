@@ -12,13 +12,26 @@ import json
 import random
 import time
 from urllib.parse import urlparse, parse_qs, unquote, quote
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 import base64
 
+from transport import ParserSession
+from line_probe import probe_line
+from line_router import LineRouter, shared_router
+from line_catalog import Line, LineCatalog, get_catalog
+from parse_result import ParseResult, ParseUrlList
+from profiling import profiled
+from negative_cache import UNSUPPORTED, INVALID, UNEXTRACTABLE, TRANSIENT, error_type_for_status
+
+# B站接口中表示视频不存在的返回码：-400 视频ID格式错误、-404 不存在、62002 已删除或不可见；
+# 62004（审核中）与 -403（权限不足）等稍后或换节点可能成功，按临时失败处理
+BILIBILI_INVALID_CODES = (-400, -404, 62002)
+
 class EnhancedVIPParser:
     """强化版VIP视频解析器"""
     
-    def __init__(self):
+    def __init__(self, session: Optional[requests.Session] = None, probe_mode: str = 'light',
+                 router: Optional[LineRouter] = None, catalog: Optional[LineCatalog] = None):
         # 多个用户代理，随机轮换避免被识别
         self.user_agents = [
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -28,49 +41,8 @@ class EnhancedVIPParser:
             'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15'
         ]
         
-        # 真实可用的第三方解析接口（按优先级排序）
-        self.parse_apis = [
-            {
-                'name': '线路1-高清稳定',
-                'url': 'https://jx.xmflv.com/?url={}',
-                'type': 'iframe'
-            },
-            {
-                'name': '线路2-快速解析',  
-                'url': 'https://api.bb3.buzz/jiexi/?url={}',
-                'type': 'iframe'
-            },
-            {
-                'name': '线路3-通用解析',
-                'url': 'https://jx.618g.com/?url={}',
-                'type': 'iframe'
-            },
-            {
-                'name': '线路4-备用解析',
-                'url': 'https://okjx.cc/?url={}',
-                'type': 'iframe'
-            },
-            {
-                'name': '线路5-VIP专用',
-                'url': 'https://www.1717yun.com/jx/ty.php?url={}',
-                'type': 'iframe'
-            },
-            {
-                'name': '线路6-无广告',
-                'url': 'https://vip.gaotian.love/api/?key=8CNrwNGWumgOHNK5r3H7jsDJb1XhPp&url={}',
-                'type': 'iframe'
-            },
-            {
-                'name': '线路7-超清画质',
-                'url': 'https://jx.jsonplayer.com/player/?url={}',
-                'type': 'iframe'
-            },
-            {
-                'name': '线路8-极速播放',
-                'url': 'https://jx.bozrc.com:4433/player/?url={}',
-                'type': 'iframe'
-            }
-        ]
+        # 线路目录快照；为 None 时使用进程内共享、可热更新的目录
+        self._catalog = catalog
         
         # 支持的视频平台
         self.platforms = {
@@ -101,9 +73,26 @@ class EnhancedVIPParser:
             }
         }
         
-        # 请求会话，保持连接
-        self.session = requests.Session()
+        # 线路探测方式：light 仅读取页面前几 KB，full 下载完整页面
+        self.probe_mode = probe_mode
+        self.probe_keywords = ('video', 'mp4', 'iframe', 'player')
+        
+        # 根据探测结果学习的按平台线路路由表（默认进程内共享）
+        self.router = router or shared_router
+        
+        # 请求会话，保持连接（可由集成解析器注入共享传输层）
+        self.session = session or ParserSession()
         
+    @property
+    def catalog(self) -> LineCatalog:
+        """当前线路目录快照"""
+        return self._catalog or get_catalog()
+    
+    @property
+    def parse_apis(self) -> Tuple[Line, ...]:
+        """通用第三方解析接口（按优先级排序）"""
+        return self.catalog.group('generic')
+    
     def get_random_headers(self) -> Dict[str, str]:
         """获取随机请求头"""
         return {
@@ -131,78 +120,69 @@ class EnhancedVIPParser:
     
     def test_parse_api(self, api_config: Dict[str, str], test_url: str) -> Dict[str, Any]:
         """测试解析接口可用性"""
-        try:
-            parse_url = api_config['url'].format(quote(test_url, safe=':/?#[]@!$&\'()*+,;='))
-            headers = self.get_random_headers()
-            
-            response = self.session.get(parse_url, headers=headers, timeout=10)
-            
-            if response.status_code == 200:
-                # 简单检测是否包含视频相关内容
-                content = response.text.lower()
-                if any(keyword in content for keyword in ['video', 'mp4', 'iframe', 'player']):
-                    return {
-                        'available': True,
-                        'response_time': response.elapsed.total_seconds(),
-                        'url': parse_url
-                    }
-            
+        parse_url = api_config['url'].format(quote(test_url, safe=':/?#[]@!$&\'()*+,;='))
+        probe = probe_line(
+            self.session, parse_url, self.get_random_headers(),
+            timeout=10, keywords=self.probe_keywords, mode=self.probe_mode
+        )
+        
+        # 探测结果计入路由表
+        platform_info = self.detect_platform(test_url)
+        if platform_info and api_config.get('name'):
+            self.router.record(platform_info['key'], api_config['name'],
+                               probe['available'], probe.get('response_time'))
+        
+        if 'error' in probe:
             return {
                 'available': False,
-                'error': f'状态码: {response.status_code}',
-                'url': parse_url
+                'error': probe['error'],
+                'url': api_config['url'].format(test_url)
             }
-            
-        except Exception as e:
+        
+        if probe['available']:
             return {
-                'available': False,
-                'error': str(e),
-                'url': api_config['url'].format(test_url)
+                'available': True,
+                'response_time': probe['response_time'],
+                'url': parse_url
             }
+        
+        return {
+            'available': False,
+            'error': f'状态码: {probe["status_code"]}',
+            'url': parse_url
+        }
+    
+    def _ranked_lines(self, platform_key: str, catalog: Optional[LineCatalog] = None) -> List[Line]:
+        """通用线路，按该平台路由表得分排序；catalog 为本次请求读取的线路目录"""
+        catalog = catalog or self.catalog
+        return self.router.rank(platform_key, list(catalog.group('generic')))
     
-    def get_all_parse_urls(self, original_url: str) -> List[Dict[str, str]]:
-        """获取所有解析接口的URL"""
+    def _ranked_youku_lines(self, catalog: Optional[LineCatalog] = None) -> List[Line]:
+        """优酷专用线路：优先使用指定的解析器，其后为不重复的通用线路，按路由表得分排序"""
+        catalog = catalog or self.catalog
+        youku_apis = list(catalog.group('youku_preferred'))
+        preferred_urls = {api.url for api in youku_apis}
+        youku_apis += [api for api in catalog.group('generic') if api.url not in preferred_urls]
+        
+        # 无路由数据时保持首选解析器在前
+        return self.router.rank('youku.com', youku_apis)
+    
+    def get_all_parse_urls(self, original_url: str, platform_key: Optional[str] = None) -> List[Dict[str, str]]:
+        """获取所有解析接口的URL，按该平台路由表得分排序"""
         encoded_url = quote(original_url, safe=':/?#[]@!$&\'()*+,;=')
         
-        parse_urls = []
-        for api in self.parse_apis:
-            parse_url = api['url'].format(encoded_url)
-            parse_urls.append({
-                'name': api['name'],
-                'url': parse_url,
-                'type': api['type']
-            })
+        if platform_key is None:
+            platform_info = self.detect_platform(original_url)
+            platform_key = platform_info['key'] if platform_info else ''
         
-        return parse_urls
+        return ParseUrlList(self._ranked_lines(platform_key), encoded_url).to_list()
     
     def get_youku_parse_urls(self, original_url: str) -> List[Dict[str, str]]:
         """获取优酷视频专用解析接口的URL - 优先使用指定解析器"""
         encoded_url = quote(original_url, safe=':/?#[]@!$&\'()*+,;=')
-        
-        # 优酷专用解析接口，优先使用指定的解析器
-        youku_apis = [
-            {
-                'name': '优酷专用解析器-首选',
-                'url': 'https://jx.xmflv.com/?url={}',
-                'type': 'iframe'
-            }
-        ]
-        
-        # 添加其他备用解析接口
-        for api in self.parse_apis[1:]:  # 跳过第一个，因为已经在上面添加了
-            youku_apis.append(api)
-        
-        parse_urls = []
-        for api in youku_apis:
-            parse_url = api['url'].format(encoded_url)
-            parse_urls.append({
-                'name': api['name'],
-                'url': parse_url,
-                'type': api['type']
-            })
-        
-        return parse_urls
+        return ParseUrlList(self._ranked_youku_lines(), encoded_url).to_list()
     
+    @profiled()
     def parse_video(self, url: str) -> Dict[str, Any]:
         """解析视频信息"""
         platform_info = self.detect_platform(url)
@@ -210,32 +190,222 @@ class EnhancedVIPParser:
         if not platform_info:
             return {
                 'success': False,
-                'error': '不支持的视频平台'
+                'error': '不支持的视频平台',
+                'error_type': UNSUPPORTED
             }
         
+        # 线路目录可能被热替换，每个请求只读取一次
+        catalog = self.catalog
         try:
             # 调用对应平台的解析函数
             result = platform_info['parser'](url)
             result['platform'] = platform_info['name']
             
-            # 添加所有可用的解析链接
+            # 添加所有可用的解析链接（访问时才生成）
             if result['success']:
+                result = ParseResult(result)
+                encoded_url = quote(url, safe=':/?#[]@!$&\'()*+,;=')
                 # 如果是优酷视频，使用专用的解析接口列表
                 if platform_info['key'] == 'youku.com':
-                    result['parse_urls'] = self.get_youku_parse_urls(url)
-                    result['best_parse_url'] = result['parse_urls'][0]['url'] if result['parse_urls'] else None
+                    parse_urls = result.set_lines(self._ranked_youku_lines(catalog), encoded_url)
                     result['preferred_parser'] = 'https://jx.xmflv.com/?url='
                 else:
-                    result['parse_urls'] = self.get_all_parse_urls(url)
-                    result['best_parse_url'] = result['parse_urls'][0]['url'] if result['parse_urls'] else None
+                    parse_urls = result.set_lines(self._ranked_lines(platform_info['key'], catalog), encoded_url)
+                
+                # 线路已按路由表得分排序，取得分最高的一条；探索只在会记录结果的探测中进行
+                best_api = parse_urls.lines[0] if parse_urls.lines else None
+                result['best_parse_url'] = best_api.format(encoded_url) if best_api else None
             
             return result
         except Exception as e:
             return {
                 'success': False,
-                'error': f'解析失败: {str(e)}'
+                'error': f'解析失败: {str(e)}',
+                'error_type': TRANSIENT
             }
     
+    def extract_vid_from_url(self, url: str, platform_key: Optional[str] = None) -> Optional[str]:
+        """仅从链接本身提取视频ID（不发起网络请求），无法提取时返回 None"""
+        if platform_key is None:
+            platform_info = self.detect_platform(url)
+            if not platform_info:
+                return None
+            platform_key = platform_info['key']
+        
+        if platform_key == 'v.qq.com':
+            return self._extract_tencent_vid_from_url(url)
+        if platform_key == 'bilibili.com':
+            bv_match = re.search(r'BV([a-zA-Z0-9]+)', url)
+            if bv_match:
+                return 'BV' + bv_match.group(1)
+            av_match = re.search(r'av(\d+)', url)
+            if av_match:
+                return 'av' + av_match.group(1)
+            return None
+        if platform_key == 'youku.com':
+            match = re.search(r'/id_([^.]+)\.html', url) or re.search(r'vid=([^&]+)', url)
+            return match.group(1) if match else None
+        if platform_key == 'mgtv.com':
+            match = re.search(r'/b/\d+/(\d+)\.html', url)
+            return match.group(1) if match else None
+        return None
+    
+    def _extract_tencent_vid_from_url(self, url: str) -> Optional[str]:
+        """从腾讯视频链接中提取视频ID"""
+        patterns = [
+            r'vid=([a-zA-Z0-9]+)',
+            r'/([a-zA-Z0-9]+)\.html',
+            r'/cover/[^/]+/([a-zA-Z0-9]+)\.html'
+        ]
+        
+        for pattern in patterns:
+            match = re.search(pattern, url)
+            if match:
+                return match.group(1)
+        return None
+    
+    def build_url_only_result(self, url: str, catalog: Optional[LineCatalog] = None) -> Optional[Dict[str, Any]]:
+        """仅根据链接构造解析结果（不发起网络请求），适用于链接中带视频ID的腾讯视频和B站链接"""
+        platform_info = self.detect_platform(url)
+        if not platform_info or platform_info['key'] not in ('v.qq.com', 'bilibili.com'):
+            return None
+        
+        vid = self.extract_vid_from_url(url, platform_info['key'])
+        if not vid:
+            return None
+        
+        title = '腾讯视频' if platform_info['key'] == 'v.qq.com' else 'B站视频'
+        return self._link_only_result(url, platform_info, vid, title, 'url_only', catalog)
+    
+    def build_metadata_result(self, url: str, metadata: Dict[str, str], parse_method: str,
+                              catalog: Optional[LineCatalog] = None) -> Optional[Dict[str, Any]]:
+        """由已知元数据（标题、时长、缩略图）构造解析结果（不发起网络请求），适用于所有支持的平台"""
+        platform_info = self.detect_platform(url)
+        if not platform_info:
+            return None
+        
+        vid = self.extract_vid_from_url(url, platform_info['key']) or ''
+        result = self._link_only_result(url, platform_info, vid, platform_info['name'], parse_method, catalog)
+        result.update((field, value) for field, value in metadata.items() if value)
+        return result
+    
+    def _link_only_result(self, url: str, platform_info: Dict[str, Any], vid: str, title: str,
+                          parse_method: str, catalog: Optional[LineCatalog]) -> Dict[str, Any]:
+        """不含页面信息的成功结果，线路按路由表排序（优酷使用专用线路列表）"""
+        result = ParseResult(
+            success=True,
+            platform=platform_info['name'],
+            title=title,
+            duration='未知',
+            thumbnail='',
+            vid=vid,
+            original_url=url,
+            vip_content=platform_info['key'] != 'bilibili.com',
+            parse_method=parse_method
+        )
+        encoded_url = quote(url, safe=':/?#[]@!$&\'()*+,;=')
+        if platform_info['key'] == 'youku.com':
+            lines = self._ranked_youku_lines(catalog)
+        else:
+            lines = self._ranked_lines(platform_info['key'], catalog)
+        parse_urls = result.set_lines(lines, encoded_url)
+        result['best_parse_url'] = parse_urls.lines[0].format(encoded_url) if parse_urls else None
+        return result
+    
+    def parse_series(self, url: str) -> Dict[str, Any]:
+        """解析整部剧集：只请求一次腾讯视频剧集页（/x/cover/），从中提取全部分集ID并批量生成每集的解析结果"""
+        cover_match = re.search(r'v\.qq\.com/x/cover/([a-zA-Z0-9]+)', url)
+        if not cover_match:
+            return {
+                'success': False,
+                'error': '仅支持腾讯视频剧集页（/x/cover/）链接',
+                'error_type': UNSUPPORTED,
+                'original_url': url
+            }
+        cid = cover_match.group(1)
+        
+        try:
+            headers = self.get_random_headers()
+            response = self.session.get(url, headers=headers, timeout=10)
+            if response.status_code != 200:
+                return {
+                    'success': False,
+                    'error': f'获取剧集页失败: HTTP {response.status_code}',
+                    'error_type': error_type_for_status(response.status_code),
+                    'platform': '腾讯视频',
+                    'original_url': url
+                }
+            html = response.text
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'腾讯视频剧集解析错误: {str(e)}',
+                'error_type': TRANSIENT,
+                'platform': '腾讯视频',
+                'original_url': url
+            }
+        
+        series_title = '腾讯视频'
+        title_match = re.search(r'<title>(.*?)</title>', html)
+        if title_match:
+            series_title = re.sub(r'_.*$', '', title_match.group(1).replace(' - 腾讯视频', '')).strip() or series_title
+        
+        vids = self._extract_tencent_series_vids(html, cid)
+        if not vids:
+            vid = self._extract_tencent_vid_from_url(url)
+            if vid and vid != cid:
+                vids.append(vid)
+        if not vids:
+            return {
+                'success': False,
+                'error': '页面中未找到分集信息',
+                'error_type': UNEXTRACTABLE,
+                'platform': '腾讯视频',
+                'original_url': url
+            }
+        
+        # 所有分集使用同一份线路目录
+        catalog = self.catalog
+        episodes = []
+        for index, vid in enumerate(vids, 1):
+            episode = self.build_url_only_result(f'https://v.qq.com/x/cover/{cid}/{vid}.html', catalog)
+            episode['title'] = f'{series_title} 第{index}集'
+            episode['episode'] = index
+            episodes.append(episode)
+        
+        return {
+            'success': True,
+            'platform': '腾讯视频',
+            'original_url': url,
+            'title': series_title,
+            'episode_count': len(episodes),
+            'episodes': episodes,
+            'parse_method': 'series'
+        }
+    
+    def _extract_tencent_series_vids(self, html: str, cid: str) -> List[str]:
+        """剧集页的分集ID（腾讯视频 vid 为 11 位），按出现顺序去重
+
+        优先取本剧集 COVER_INFO 中的 video_ids 列表；没有时退回带本剧集ID的分集链接，
+        页面上推荐的其他剧集与视频不计入。
+        """
+        decoder = json.JSONDecoder()
+        for match in re.finditer(r'COVER_INFO\s*=\s*\{', html):
+            try:
+                cover, _ = decoder.raw_decode(html, match.end() - 1)
+            except ValueError:
+                continue
+            if cover.get('id', cid) != cid:
+                continue
+            vids = [vid for vid in cover.get('video_ids') or ()
+                    if isinstance(vid, str) and re.fullmatch(r'[a-zA-Z0-9]{11}', vid)]
+            if vids:
+                return list(dict.fromkeys(vids))
+        return list(dict.fromkeys(
+            match.group(1) for match in re.finditer(rf'/x/cover/{cid}/([a-zA-Z0-9]{{11}})\.html', html)
+        ))
+    
+    @profiled()
     def _parse_tencent(self, url: str) -> Dict[str, Any]:
         """解析腾讯视频（增强版）"""
         try:
@@ -244,24 +414,17 @@ class EnhancedVIPParser:
             title = '腾讯视频'
             
             # 方式1: 从URL直接提取
-            patterns = [
-                r'vid=([a-zA-Z0-9]+)',
-                r'/([a-zA-Z0-9]+)\.html',
-                r'/cover/[^/]+/([a-zA-Z0-9]+)\.html'
-            ]
+            vid = self._extract_tencent_vid_from_url(url)
             
-            for pattern in patterns:
-                match = re.search(pattern, url)
-                if match:
-                    vid = match.group(1)
-                    break
-            
-            # 方式2: 从页面HTML提取
+            # 方式2: 从页面HTML提取；页面请求失败时记录失败类别
+            fetch_error_type = None
             if not vid:
                 try:
                     headers = self.get_random_headers()
                     response = self.session.get(url, headers=headers, timeout=10)
-                    if response.status_code == 200:
+                    if response.status_code != 200:
+                        fetch_error_type = error_type_for_status(response.status_code)
+                    else:
                         html = response.text
                         
                         # 提取标题
@@ -282,13 +445,14 @@ class EnhancedVIPParser:
                             if match:
                                 vid = match.group(1)
                                 break
-                except:
-                    pass
+                except Exception:
+                    fetch_error_type = TRANSIENT
             
             if not vid:
                 return {
                     'success': False,
-                    'error': '无法提取视频ID，请检查链接是否正确'
+                    'error': '无法提取视频ID，请检查链接是否正确',
+                    'error_type': fetch_error_type or UNEXTRACTABLE
                 }
             
             return {
@@ -304,9 +468,11 @@ class EnhancedVIPParser:
         except Exception as e:
             return {
                 'success': False,
-                'error': f'腾讯视频解析错误: {str(e)}'
+                'error': f'腾讯视频解析错误: {str(e)}',
+                'error_type': TRANSIENT
             }
     
+    @profiled()
     def _parse_iqiyi(self, url: str) -> Dict[str, Any]:
         """解析爱奇艺视频（增强版）"""
         try:
@@ -359,9 +525,11 @@ class EnhancedVIPParser:
         except Exception as e:
             return {
                 'success': False,
-                'error': f'爱奇艺解析错误: {str(e)}'
+                'error': f'爱奇艺解析错误: {str(e)}',
+                'error_type': TRANSIENT
             }
     
+    @profiled()
     def _parse_youku(self, url: str) -> Dict[str, Any]:
         """解析优酷视频（增强版） - 优先使用指定解析器"""
         try:
@@ -407,9 +575,11 @@ class EnhancedVIPParser:
         except Exception as e:
             return {
                 'success': False,
-                'error': f'优酷解析错误: {str(e)}'
+                'error': f'优酷解析错误: {str(e)}',
+                'error_type': TRANSIENT
             }
     
+    @profiled()
     def _parse_bilibili(self, url: str) -> Dict[str, Any]:
         """解析B站视频（增强版）"""
         try:
@@ -426,7 +596,8 @@ class EnhancedVIPParser:
             else:
                 return {
                     'success': False,
-                    'error': '无法提取B站视频ID'
+                    'error': '无法提取B站视频ID',
+                    'error_type': UNEXTRACTABLE
                 }
             
             headers = self.get_random_headers()
@@ -447,18 +618,28 @@ class EnhancedVIPParser:
                         'original_url': url,
                         'vip_content': False  # B站大部分内容免费
                     }
+                
+                # 视频不存在、已删除或不可见属于确定性失败，其余（如请求被拦截）可重试
+                return {
+                    'success': False,
+                    'error': f"B站API调用失败: {data.get('message') or data.get('code')}",
+                    'error_type': INVALID if data.get('code') in BILIBILI_INVALID_CODES else TRANSIENT
+                }
             
             return {
                 'success': False,
-                'error': 'B站API调用失败'
+                'error': 'B站API调用失败',
+                'error_type': error_type_for_status(response.status_code)
             }
             
         except Exception as e:
             return {
                 'success': False,
-                'error': f'B站解析错误: {str(e)}'
+                'error': f'B站解析错误: {str(e)}',
+                'error_type': TRANSIENT
             }
     
+    @profiled()
     def _parse_mgtv(self, url: str) -> Dict[str, Any]:
         """解析芒果TV（增强版）"""
         try:
@@ -502,7 +683,8 @@ class EnhancedVIPParser:
         except Exception as e:
             return {
                 'success': False,
-                'error': f'芒果TV解析错误: {str(e)}'
+                'error': f'芒果TV解析错误: {str(e)}',
+                'error_type': TRANSIENT
             }
     
     def _format_duration(self, seconds: int) -> str:
@@ -527,9 +709,9 @@ class EnhancedVIPParser:
         """获取解析接口信息"""
         return [
             {
-                'name': api['name'],
-                'url': api['url'].replace('{}', '[视频链接]'),
-                'type': api['type']
+                'name': api.name,
+                'url': api.display_url,
+                'type': api.type
             }
             for api in self.parse_apis
-        ] 
+        ]
@@ -6,46 +6,347 @@
 集成优酷专线解析器到现有系统中
 """
 
+import asyncio
+import json
+import logging
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from enhanced_parser import EnhancedVIPParser
 from youku_enhanced_parser import YoukuEnhancedParser
-from typing import Dict, Any, Optional
+from transport import ParserSession, HedgingPolicy
+from rate_limit import HostRateLimiter
+from metrics import metrics
+from singleflight import SingleFlight, shared_flight
+from line_router import LineRouter, shared_router
+from warmup import ConnectionWarmer, collect_hosts, shared_dns_cache
+from link_resolver import LinkResolver, is_short_link, rewrite_mobile_url
+from negative_cache import NegativeCache, shared_negative_cache
+from vid_index import VidIndex
+from cache_backend import CacheBackend, CacheError
+from profiling import profiled
+from scheduler import PriorityScheduler, INTERACTIVE
+from structured_log import get_logger, log_event
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, Optional, Tuple, Callable
+from urllib.parse import urlsplit, urlunsplit
+import threading
+import time
+
+logger = get_logger('integrated_parser')
+
+# 写入共享缓存后端的元数据字段
+METADATA_FIELDS = ('title', 'duration', 'thumbnail')
+
+class DeferredParseResult(dict):
+    """两阶段解析结果
+
+    创建时只包含根据链接即可得到的信息（视频ID、全部解析链接），
+    标题、时长、缩略图和经过测试的最佳线路在后台补全后原地合并，
+    可通过 enrichment（Future）、wait() 或回调获取补全后的结果。
+    """
+    
+    def __init__(self, initial: Dict[str, Any], enrichment: Future,
+                 on_enriched: Optional[Callable[['DeferredParseResult'], None]] = None):
+        super().__init__(initial)
+        self['metadata_pending'] = True
+        self.enrichment = enrichment
+        self._on_enriched = on_enriched
+        enrichment.add_done_callback(self._merge)
+    
+    def _merge(self, future: Future) -> None:
+        """合并后台解析结果"""
+        error = future.exception()
+        if error is not None:
+            self['enrichment_error'] = str(error)
+        else:
+            full_result = future.result()
+            if full_result.get('success'):
+                self.update(full_result)
+            else:
+                self['enrichment_error'] = full_result.get('error', '未知错误')
+        self['metadata_pending'] = False
+        if self._on_enriched:
+            self._on_enriched(self)
+    
+    def wait(self, timeout: Optional[float] = None) -> 'DeferredParseResult':
+        """等待补全完成，返回自身"""
+        try:
+            self.enrichment.result(timeout=timeout)
+        except Exception:
+            # 失败信息已记录在 enrichment_error 中
+            pass
+        return self
 
 class IntegratedVideoParser:
     """集成视频解析器"""
     
-    def __init__(self):
+    def __init__(self, hedging: Optional[HedgingPolicy] = None,
+                 singleflight: Optional[SingleFlight] = None,
+                 rate_limiter: Optional[HostRateLimiter] = None,
+                 router: Optional[LineRouter] = None,
+                 warm_up: bool = False,
+                 link_resolver: Optional[LinkResolver] = None,
+                 negative_cache: Optional[NegativeCache] = None,
+                 vid_index: Optional[VidIndex] = None,
+                 cache_backend: Optional[CacheBackend] = None,
+                 metadata_ttl: float = 86400,
+                 scheduler: Optional[PriorityScheduler] = None):
+        # 两个解析器共享同一传输层；传入 hedging 时对平台页面请求启用对冲，
+        # 传入 rate_limiter 时按上游主机限速
+        self.session = ParserSession(hedging=hedging, rate_limiter=rate_limiter)
+        
+        # 短链接与移动端链接在分派前转为规范链接（HEAD 跟随跳转，结果带 TTL 缓存）
+        self.link_resolver = link_resolver or LinkResolver(self.session)
+        
+        # 同一视频的并发解析合并为一次（默认进程内共享）
+        self.singleflight = singleflight or shared_flight
+        
+        # 可选：上游解析前的优先级调度器，交互请求与批量请求按权重分享并发
+        self.scheduler = scheduler
+        
+        # 可选：已解析视频的只读元数据索引，作为解析前的第一级缓存
+        self.vid_index = vid_index
+        
+        # 确定性失败（不支持、无效、无法提取ID）按规范键短期缓存（默认进程内共享）
+        self.negative_cache = negative_cache if negative_cache is not None else shared_negative_cache
+        
+        # 两阶段解析的后台补全线程池（惰性创建）
+        self._enrich_executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        
+        # 两个解析器共享线路路由表，探索率由 LineRouter(exploration_rate=...) 配置；
+        # 接入共享缓存后端时使用独立的路由表，不改动进程级共享路由表
+        if router is None:
+            router = LineRouter() if cache_backend is not None else shared_router
+        self.router = router
+        
+        # 可选：多节点共享的缓存后端，保存视频元数据并同步线路路由表
+        self.cache_backend = cache_backend
+        self.metadata_ttl = metadata_ttl
+        if cache_backend is not None:
+            self.router.attach_backend(cache_backend)
+        
         # 初始化原有的解析器
-        self.original_parser = EnhancedVIPParser()
+        self.original_parser = EnhancedVIPParser(session=self.session, router=self.router)
         
         # 初始化优酷专线解析器
-        self.youku_parser = YoukuEnhancedParser()
+        self.youku_parser = YoukuEnhancedParser(session=self.session, router=self.router)
+        
+        # 可选：后台预解析并预连接平台主机与线路主机（DNS 结果进入 TTL 缓存）
+        self.warmer: Optional[ConnectionWarmer] = None
+        if warm_up:
+            api_urls = [api['url'] for api in self.youku_parser.youku_parse_apis]
+            api_urls += [api['url'] for api in self.original_parser.parse_apis]
+            hosts = collect_hosts(api_urls)
+            # DNS 缓存只作用于预热的主机
+            shared_dns_cache.install(host for _, host, _ in hosts)
+            self.warmer = ConnectionWarmer(self.session, hosts)
+            self.warmer.start()
+    
+    def canonical_key(self, url: str) -> Tuple[str, str]:
+        """视频的规范键 (平台, 视频ID)，仅根据链接计算；无法提取ID时退化为规范化链接"""
+        url = rewrite_mobile_url(url.strip())
+        if self.youku_parser.is_youku_url(url):
+            vid = self.youku_parser.extract_video_id_from_url(url)
+            return ('youku.com', vid or _normalize_url(url))
+        
+        platform_info = self.original_parser.detect_platform(url)
+        if not platform_info:
+            return ('unknown', _normalize_url(url))
+        vid = self.original_parser.extract_vid_from_url(url, platform_info['key'])
+        return (platform_info['key'], vid or _normalize_url(url))
+    
+    @profiled()
+    def parse_video(self, url: str, deferred: bool = False,
+                    on_enriched: Optional[Callable[[DeferredParseResult], None]] = None,
+                    priority: str = INTERACTIVE) -> Dict[str, Any]:
+        """解析视频 - 同一视频的并发请求合并为一次上游解析
+        
+        deferred=True 时，若链接中已包含视频ID（优酷、腾讯视频、B站），立即返回不经网络请求的
+        DeferredParseResult，元数据在后台补全后合并并调用 on_enriched。
+        配置了调度器时，上游解析按 priority（INTERACTIVE / BATCH）排队；缓存命中不占用执行槽位。
+        """
+        url = self.link_resolver.resolve(url)
+        key = self.canonical_key(url)
+        result = self._cached_result(url, key)
+        if result is None:
+            if deferred:
+                initial = self._build_url_only_result(url)
+                if initial is not None:
+                    return DeferredParseResult(initial, self._submit_enrichment(url, priority), on_enriched)
+            
+            result = self.singleflight.do(key, self._upstream, self._parse_video, url, priority)
+            self._remember(key, result)
+        if deferred:
+            # 无法仅凭链接得到结果时同步解析，但仍保持相同的返回类型
+            completed = Future()
+            completed.set_result(result)
+            return DeferredParseResult(result, completed, on_enriched)
+        return result
     
-    def parse_video(self, url: str) -> Dict[str, Any]:
+    def _cached_result(self, url: str, key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+        """不经网络请求的结果：依次查元数据索引、共享缓存后端、失败结果缓存"""
+        if self.vid_index is not None:
+            result = self._result_from_metadata(url, self.vid_index.get(key), 'index')
+            metrics.incr('vid_index.hit' if result is not None else 'vid_index.miss')
+            if result is not None:
+                return result
+        if self.cache_backend is not None:
+            result = self._result_from_metadata(url, self._backend_metadata(key), 'cache')
+            metrics.incr('cache_backend.hit' if result is not None else 'cache_backend.miss')
+            if result is not None:
+                return result
+        return self.negative_cache.get(key)
+    
+    def _backend_metadata(self, key: Tuple[str, str]) -> Optional[Dict[str, str]]:
+        """从共享缓存后端读取元数据；内容损坏时删除该键，按未命中处理"""
+        try:
+            raw = self.cache_backend.get(_metadata_key(key))
+        except CacheError:
+            metrics.incr('cache_backend.error')
+            return None
+        if not raw:
+            return None
+        try:
+            metadata = json.loads(raw)
+        except ValueError:
+            metadata = None
+        if isinstance(metadata, dict):
+            return metadata
+        metrics.incr('cache_backend.corrupt')
+        try:
+            self.cache_backend.delete(_metadata_key(key))
+        except CacheError:
+            metrics.incr('cache_backend.error')
+        return None
+    
+    def _result_from_metadata(self, url: str, metadata: Optional[Dict[str, str]],
+                              parse_method: str) -> Optional[Dict[str, Any]]:
+        """由已知元数据构造结果；缓存只保存元数据，线路链接按链接本身和路由表生成，所有平台可用"""
+        if metadata is None:
+            return None
+        if self.youku_parser.is_youku_url(url):
+            result = self.youku_parser.build_metadata_result(url, metadata, parse_method)
+            parser_type, parser_info = 'youku_enhanced', '优酷专线解析器'
+        else:
+            result = self.original_parser.build_metadata_result(url, metadata, parse_method)
+            parser_type, parser_info = 'original', '原始解析器'
+        if result is not None:
+            result['parser_type'] = parser_type
+            result['parser_info'] = parser_info
+        return result
+    
+    def _remember(self, key: Tuple[str, str], result: Dict[str, Any]) -> None:
+        """保存解析结果：失败结果进入失败缓存，成功结果的元数据写入共享缓存后端"""
+        if not result.get('success'):
+            self.negative_cache.put(key, result)
+            return
+        if self.cache_backend is None or result.get('parse_method') in ('index', 'cache'):
+            return
+        metadata = {field: result.get(field) or '' for field in METADATA_FIELDS}
+        try:
+            self.cache_backend.set(_metadata_key(key), json.dumps(metadata, ensure_ascii=False),
+                                   self.metadata_ttl)
+        except CacheError:
+            metrics.incr('cache_backend.error')
+    
+    @profiled()
+    def parse_series(self, url: str, priority: str = INTERACTIVE) -> Dict[str, Any]:
+        """解析整部剧集（优酷节目页、腾讯视频 /x/cover/ 剧集页），一次页面请求返回全部分集的解析结果"""
+        url = self.link_resolver.resolve(url)
+        key = ('series',) + self.canonical_key(url)
+        return self.singleflight.do(key, self._upstream, self._parse_series, url, priority)
+    
+    def _upstream(self, fn: Callable[[str], Any], url: str, priority: str) -> Any:
+        """经调度器执行上游解析，未配置调度器时直接执行"""
+        if self.scheduler is None:
+            return fn(url)
+        return self.scheduler.run(fn, url, priority=priority)
+    
+    def _parse_series(self, url: str) -> Dict[str, Any]:
+        """按平台分派剧集解析"""
+        if self.youku_parser.is_youku_url(url):
+            result = self.youku_parser.parse_series(url)
+            parser_type, parser_info = 'youku_enhanced', '优酷专线解析器'
+        else:
+            result = self.original_parser.parse_series(url)
+            parser_type, parser_info = 'original', '原始解析器'
+        result['parser_type'] = parser_type
+        result['parser_info'] = parser_info
+        for episode in result.get('episodes', ()):
+            episode['parser_type'] = parser_type
+            episode['parser_info'] = parser_info
+        return result
+    
+    def _build_url_only_result(self, url: str) -> Optional[Dict[str, Any]]:
+        """仅根据链接构造第一阶段结果"""
+        if self.youku_parser.is_youku_url(url):
+            result = self.youku_parser.build_url_only_result(url)
+            parser_type, parser_info = 'youku_enhanced', '优酷专线解析器'
+        else:
+            result = self.original_parser.build_url_only_result(url)
+            parser_type, parser_info = 'original', '原始解析器'
+        if result is not None:
+            result['parser_type'] = parser_type
+            result['parser_info'] = parser_info
+        return result
+    
+    def _submit_enrichment(self, url: str, priority: str) -> Future:
+        """提交后台完整解析"""
+        with self._executor_lock:
+            if self._enrich_executor is None:
+                self._enrich_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='enrich')
+        return self._enrich_executor.submit(self.parse_video, url, priority=priority)
+    
+    async def parse_video_async(self, url: str, priority: str = INTERACTIVE) -> Dict[str, Any]:
+        """异步解析视频，与 parse_video 共享在途请求"""
+        if is_short_link(url):
+            # 短链接解析可能发起网络请求，放到线程中执行
+            url = await asyncio.get_running_loop().run_in_executor(None, self.link_resolver.resolve, url)
+        else:
+            url = rewrite_mobile_url(url.strip())
+        key = self.canonical_key(url)
+        result = self._cached_result(url, key)
+        if result is None:
+            result = await self.singleflight.do_async(key, self._upstream, self._parse_video, url, priority)
+            self._remember(key, result)
+        return result
+    
+    def _parse_video(self, url: str) -> Dict[str, Any]:
         """解析视频 - 优酷使用专线，其他平台使用原方法"""
+        started = time.perf_counter()
         
         # 检测是否为优酷链接
         if self.youku_parser.is_youku_url(url):
-            print("🎯 检测到优酷链接，使用优酷专线解析...")
             result = self.youku_parser.parse_youku_video(url)
             
             # 标记使用的解析方法
             result['parser_type'] = 'youku_enhanced'
             result['parser_info'] = '优酷专线解析器'
-            
-            return result
         else:
-            print("🔍 使用原始解析器解析...")
             result = self.original_parser.parse_video(url)
             
             # 标记使用的解析方法
             result['parser_type'] = 'original'
             result['parser_info'] = '原始解析器'
-            
-            return result
+        
+        key = self.canonical_key(url)
+        success = bool(result.get('success'))
+        # 成功事件量大，按比例采样；失败事件全部记录
+        log_event(logger, 'parse.finished',
+                  level=logging.INFO if success else logging.WARNING,
+                  sampled=success,
+                  key=f'{key[0]}|{key[1]}',
+                  platform=result.get('platform') or key[0],
+                  stage='upstream',
+                  parser_type=result['parser_type'],
+                  duration=round(time.perf_counter() - started, 4),
+                  outcome='success' if success else 'failure',
+                  error_type=result.get('error_type'),
+                  error=result.get('error'))
+        return result
     
     def get_supported_platforms(self) -> list:
         """获取支持的平台"""
@@ -61,11 +362,28 @@ class IntegratedVideoParser:
         """获取原始解析API信息"""
         return self.original_parser.get_parse_apis_info()
     
-    def test_youku_apis(self, url: str) -> list:
+    def test_youku_apis(self, url: str, priority: str = INTERACTIVE) -> list:
         """测试优酷专线APIs"""
         if self.youku_parser.is_youku_url(url):
-            return self.youku_parser.test_all_apis(url)
+            return self._upstream(self.youku_parser.test_all_apis, url, priority)
         return []
+    
+    def get_routing_table(self) -> list:
+        """获取线路路由表（各平台各线路的成功率得分）"""
+        return self.router.snapshot()
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """获取运行指标快照（对冲次数、合并节省的上游调用、各主机耗时等）"""
+        return metrics.snapshot()
+
+def _metadata_key(key: Tuple[str, str]) -> str:
+    """共享缓存后端中视频元数据的键"""
+    return f'meta:{key[0]}|{key[1]}'
+
+def _normalize_url(url: str) -> str:
+    """规范化链接：去除首尾空白与片段，协议和主机名转小写"""
+    parts = urlsplit(url.strip())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, parts.query, ''))
 
 def test_integrated_parser():
     """测试集成解析器"""
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+解析线路目录
+线路定义统一保存在外部 lines.json 中，加载为按优先级预排序、预编译的不可变结构，供所有解析器共享；
+文件变化时原子替换，正在处理的请求继续使用各自持有的旧快照
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from structured_log import get_logger, log_event
+
+logger = get_logger('line_catalog')
+
+# 默认目录文件，可通过环境变量 PARSER_LINE_CATALOG 指定
+DEFAULT_CATALOG_PATH = os.environ.get(
+    'PARSER_LINE_CATALOG',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lines.json')
+)
+
+# 检查文件是否变化的最小间隔（秒）
+RELOAD_CHECK_INTERVAL = 2.0
+
+
+class Line:
+    """单条解析线路（不可变）
+
+    兼容原有的字典用法（line['name']、line.get('priority')），
+    URL 模板预先拆分为前后缀，生成解析链接时只需一次字符串拼接。
+    """
+
+    __slots__ = ('name', 'url', 'type', 'priority', 'prefix', 'suffix', 'display_url')
+
+    _FIELDS = ('name', 'url', 'type', 'priority')
+
+    def __init__(self, name: str, url: str, type: str = 'iframe', priority: int = 0):
+        if url.count('{}') != 1:
+            raise ValueError(f'线路 {name} 的URL模板必须包含且仅包含一个 {{}}')
+        prefix, suffix = url.split('{}')
+        for attr, value in (('name', name), ('url', url), ('type', type), ('priority', int(priority)),
+                            ('prefix', prefix), ('suffix', suffix),
+                            ('display_url', prefix + '[视频链接]' + suffix)):
+            object.__setattr__(self, attr, value)
+
+    def __setattr__(self, key, value):
+        raise AttributeError('Line 为不可变对象')
+
+    def format(self, encoded_url: str) -> str:
+        """生成解析链接"""
+        return self.prefix + encoded_url + self.suffix
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self._FIELDS else default
+
+    def keys(self) -> Iterator[str]:
+        return iter(self._FIELDS)
+
+    def __repr__(self) -> str:
+        return f'Line(name={self.name!r}, priority={self.priority})'
+
+
+class LineCatalog:
+    """线路目录快照（不可变）"""
+
+    def __init__(self, groups: Dict[str, Tuple[Line, ...]], path: Optional[str] = None,
+                 mtime: Optional[float] = None):
+        self._groups = groups
+        self.path = path
+        self.mtime = mtime
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], path: Optional[str] = None,
+                  mtime: Optional[float] = None) -> 'LineCatalog':
+        """由 {分组: [线路定义, ...]} 构建目录，各分组按优先级排序"""
+        groups = {}
+        for group, entries in data.items():
+            lines = [Line(entry['name'], entry['url'], entry.get('type', 'iframe'),
+                          entry.get('priority', index))
+                     for index, entry in enumerate(entries, 1)]
+            groups[group] = tuple(sorted(lines, key=lambda line: line.priority))
+        return cls(groups, path, mtime)
+
+    @classmethod
+    def load(cls, path: str) -> 'LineCatalog':
+        """从 JSON 文件加载目录"""
+        mtime = os.stat(path).st_mtime
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls.from_dict(data, path, mtime)
+
+    def group(self, name: str) -> Tuple[Line, ...]:
+        """获取分组内按优先级排序的线路"""
+        return self._groups.get(name, ())
+
+    def groups(self) -> Tuple[str, ...]:
+        """全部分组名"""
+        return tuple(self._groups)
+
+
+class CatalogHolder:
+    """持有当前目录快照，文件变化时重新加载并原子替换"""
+
+    def __init__(self, path: str = DEFAULT_CATALOG_PATH, check_interval: float = RELOAD_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._catalog = LineCatalog.load(path)
+        self._next_check = time.monotonic() + check_interval
+
+    def get(self) -> LineCatalog:
+        """获取当前目录快照（必要时检查文件是否变化）"""
+        if time.monotonic() >= self._next_check:
+            self._maybe_reload()
+        return self._catalog
+
+    def _maybe_reload(self) -> None:
+        """文件修改时间变化时重新加载；加载失败时继续使用旧目录"""
+        if not self._lock.acquire(blocking=False):
+            # 其他线程正在检查，直接使用当前快照
+            return
+        try:
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                mtime = os.stat(self.path).st_mtime
+                if mtime != self._catalog.mtime:
+                    # 单次引用赋值即完成替换，持有旧快照的请求不受影响
+                    self._catalog = LineCatalog.load(self.path)
+            except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+                # 文件损坏或结构不符（如分组不是列表）时保留旧目录
+                log_event(logger, 'catalog.reload_failed', level=logging.WARNING,
+                          path=self.path, stage='catalog', outcome='failure', error=str(e))
+        finally:
+            self._lock.release()
+
+    def reload(self) -> LineCatalog:
+        """立即重新加载"""
+        self._catalog = LineCatalog.load(self.path)
+        return self._catalog
+
+
+_default_holder: Optional[CatalogHolder] = None
+_default_holder_lock = threading.Lock()
+
+
+def get_catalog() -> LineCatalog:
+    """获取进程内共享的线路目录快照"""
+    global _default_holder
+    if _default_holder is None:
+        with _default_holder_lock:
+            if _default_holder is None:
+                _default_holder = CatalogHolder()
+    return _default_holder.get()
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+线路健康监控
+后台定时探测全部优酷专线和通用线路，将结果写入本地紧凑时间序列文件，并提供按时间窗口的可用率/耗时分位数查询
+"""
+
+import argparse
+import json
+import logging
+import math
+import mmap
+import os
+import random
+import struct
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+from urllib.parse import quote
+
+from metrics import percentile
+from structured_log import get_logger, log_event, setup_logging
+from line_probe import probe_line
+from line_router import ANY_PLATFORM
+from youku_enhanced_parser import ROUTER_PLATFORM as YOUKU_ROUTER_PLATFORM, YoukuEnhancedParser
+from enhanced_parser import EnhancedVIPParser
+
+logger = get_logger('line_monitor')
+
+# 单条记录：时间戳(float64) 线路编号(uint16) 是否可用(uint8) 耗时秒(float32)，共 15 字节
+RECORD = struct.Struct('<dHBf')
+
+DEFAULT_TEST_URL = 'https://v.youku.com/video?vid=XNjQ4MzA5ODkwOA=='
+
+
+class LineHealthStore:
+    """线路健康时间序列存储
+
+    记录按时间顺序保存在二进制文件中，线路名称与编号的对应关系保存在同名 .lines.json 中。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lines_path = path + '.lines.json'
+        self._lock = threading.Lock()
+        self._line_ids: Dict[str, int] = {}
+        if os.path.exists(self.lines_path):
+            with open(self.lines_path, 'r', encoding='utf-8') as f:
+                self._line_ids = json.load(f)
+        self._line_names = {v: k for k, v in self._line_ids.items()}
+
+    def _line_id(self, line_key: str) -> int:
+        """获取线路编号，新线路写入名称表（调用方持有锁）"""
+        line_id = self._line_ids.get(line_key)
+        if line_id is None:
+            line_id = self._line_ids[line_key] = len(self._line_ids)
+            self._line_names[line_id] = line_key
+            tmp_path = self.lines_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._line_ids, f, ensure_ascii=False)
+            os.replace(tmp_path, self.lines_path)
+        return line_id
+
+    def _read_records(self) -> bytes:
+        """读取全部完整记录（调用方持有锁）"""
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        return data[:len(data) - len(data) % RECORD.size]
+
+    def _rewrite(self, data: bytes) -> None:
+        """原子替换数据文件（调用方持有锁）"""
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def _last_timestamp(self) -> Optional[float]:
+        """文件中最后一条记录的时间戳（调用方持有锁）"""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell() - f.tell() % RECORD.size
+            if size == 0:
+                return None
+            f.seek(size - RECORD.size)
+            return RECORD.unpack(f.read(RECORD.size))[0]
+
+    def append_many(self, records: List[Tuple[float, str, bool, Optional[float]]]) -> None:
+        """批量追加 (时间戳, 线路键, 是否可用, 耗时) 记录，保持文件按时间有序"""
+        if not records:
+            return
+        records = sorted(records, key=lambda record: record[0])
+        with self._lock:
+            payload = b''.join(
+                RECORD.pack(ts, self._line_id(line_key), 1 if ok else 0,
+                            latency if latency is not None else math.nan)
+                for ts, line_key, ok, latency in records
+            )
+            last_ts = self._last_timestamp()
+            if last_ts is None or records[0][0] >= last_ts:
+                with open(self.path, 'ab') as f:
+                    f.write(payload)
+                return
+            # 早于已有记录（如多个探测轮次并发写入），归并后重写
+            merged = sorted(
+                list(RECORD.iter_unpack(self._read_records())) + list(RECORD.iter_unpack(payload)),
+                key=lambda record: record[0]
+            )
+            self._rewrite(b''.join(RECORD.pack(*record) for record in merged))
+
+    def append(self, line_key: str, ok: bool, latency: Optional[float], ts: Optional[float] = None) -> None:
+        """追加单条记录"""
+        self.append_many([(ts if ts is not None else time.time(), line_key, ok, latency)])
+
+    def query(self, since: float, until: Optional[float] = None) -> Iterator[Tuple[float, str, bool, Optional[float]]]:
+        """按时间范围读取记录"""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < RECORD.size:
+            return
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            count = len(data) // RECORD.size
+
+            # 记录按时间有序，二分定位窗口，只复制并解码窗口内的数据
+            class _Timestamps:
+                def __len__(self):
+                    return count
+
+                def __getitem__(self, index):
+                    return RECORD.unpack_from(data, index * RECORD.size)[0]
+
+            timestamps = _Timestamps()
+            start = bisect_left(timestamps, since)
+            end = count if until is None else bisect_right(timestamps, until)
+            window = data[start * RECORD.size:end * RECORD.size]
+        for ts, line_id, ok, latency in RECORD.iter_unpack(window):
+            yield ts, self._line_names.get(line_id, str(line_id)), bool(ok), None if math.isnan(latency) else latency
+
+    def summary(self, window: float = 86400, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """时间窗口内每条线路的可用率和耗时分位数"""
+        now = now if now is not None else time.time()
+        stats: Dict[str, Dict[str, Any]] = {}
+        for _, line_key, ok, latency in self.query(now - window, now):
+            entry = stats.setdefault(line_key, {'total': 0, 'ok': 0, 'latencies': []})
+            entry['total'] += 1
+            if ok:
+                entry['ok'] += 1
+                if latency is not None:
+                    entry['latencies'].append(latency)
+
+        return [
+            {
+                'line': line_key,
+                'samples': entry['total'],
+                'availability': entry['ok'] / entry['total'],
+                'p50': percentile(entry['latencies'], 50),
+                'p95': percentile(entry['latencies'], 95)
+            }
+            for line_key, entry in sorted(stats.items())
+        ]
+
+    def timeseries(self, window: float = 86400, bucket: float = 3600,
+                   now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """按时间桶统计每条线路的可用率，用于绘图"""
+        now = now if now is not None else time.time()
+        buckets: Dict[Tuple[float, str], List[int]] = {}
+        for ts, line_key, ok, _ in self.query(now - window, now):
+            counts = buckets.setdefault((ts - ts % bucket, line_key), [0, 0])
+            counts[0] += 1
+            counts[1] += 1 if ok else 0
+        return [
+            {'time': start, 'line': line_key, 'availability': ok / total}
+            for (start, line_key), (total, ok) in sorted(buckets.items())
+        ]
+
+    def compact(self, retention: float, now: Optional[float] = None) -> bool:
+        """删除超过保留期的记录；没有过期记录时不重写文件，返回是否重写"""
+        cutoff = (now if now is not None else time.time()) - retention
+        with self._lock:
+            if not os.path.exists(self.path):
+                return False
+            with open(self.path, 'rb') as f:
+                head = f.read(RECORD.size)
+            # 文件按时间有序，最早的记录未过期即无需压缩
+            if len(head) < RECORD.size or RECORD.unpack(head)[0] >= cutoff:
+                return False
+            data = self._read_records()
+            timestamps = [record[0] for record in RECORD.iter_unpack(data)]
+            self._rewrite(data[bisect_left(timestamps, cutoff) * RECORD.size:])
+            return True
+
+
+class LineHealthMonitor:
+    """线路健康监控器"""
+
+    def __init__(self,
+                 store: LineHealthStore,
+                 test_url: str = DEFAULT_TEST_URL,
+                 interval: float = 300,
+                 jitter: float = 0.2,
+                 max_concurrency: int = 4,
+                 probe_spread: float = 1.0,
+                 retention: float = 7 * 86400,
+                 youku_parser: Optional[YoukuEnhancedParser] = None,
+                 original_parser: Optional[EnhancedVIPParser] = None):
+        self.store = store
+        self.test_url = test_url
+        self.interval = interval
+        self.jitter = jitter
+        self.max_concurrency = max_concurrency
+        self.probe_spread = probe_spread
+        self.retention = retention
+        self.youku_parser = youku_parser or YoukuEnhancedParser()
+        self.original_parser = original_parser or EnhancedVIPParser(session=self.youku_parser.session)
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # 页面按钮与后台线程可能同时触发探测，逐轮执行
+        self._round_lock = threading.Lock()
+
+    def targets(self) -> List[Tuple[str, str]]:
+        """全部待探测线路 (线路键, 探测链接)"""
+        encoded_url = quote(self.test_url, safe=':/?#[]@!$&\'()*+,;=')
+        targets = [
+            (f"youku:{api.name}", api.format(encoded_url))
+            for api in self.youku_parser.youku_parse_apis
+        ]
+        targets += [
+            (f"generic:{api.name}", api.format(encoded_url))
+            for api in self.original_parser.parse_apis
+        ]
+        return targets
+
+    def _probe(self, target: Tuple[str, str]) -> Tuple[float, str, bool, Optional[float]]:
+        """探测单条线路"""
+        line_key, url = target
+        # 错开同一轮内的请求，避免同时打到同一主机
+        time.sleep(random.uniform(0, self.probe_spread))
+        result = probe_line(self.youku_parser.session, url, self.youku_parser.get_random_headers(),
+                            timeout=10, keywords=self.youku_parser.probe_keywords)
+        return time.time(), line_key, result['available'], result.get('response_time')
+
+    def run_once(self) -> List[Tuple[float, str, bool, Optional[float]]]:
+        """探测一轮所有线路并写入存储，同时计入线路路由表"""
+        with self._round_lock:
+            return self._run_round()
+
+    def _run_round(self) -> List[Tuple[float, str, bool, Optional[float]]]:
+        """执行一轮探测（调用方持有轮次锁）"""
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='line-monitor') as executor:
+            records = sorted(executor.map(self._probe, self.targets()))
+        self.store.append_many(records)
+        
+        for _, line_key, ok, latency in records:
+            group, line_name = line_key.split(':', 1)
+            if group == 'youku':
+                self.youku_parser.router.record(YOUKU_ROUTER_PLATFORM, line_name, ok, latency)
+            else:
+                # 通用线路服务所有平台，监控结果不归入测试链接所属的平台
+                self.original_parser.router.record(ANY_PLATFORM, line_name, ok, latency)
+        return records
+
+    def _run(self) -> None:
+        """后台循环"""
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+                self.store.compact(self.retention)
+            except Exception as e:
+                log_event(logger, 'monitor.probe_failed', level=logging.WARNING,
+                          stage='monitor', outcome='failure', error=str(e))
+            delay = self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+            self._stop_event.wait(delay)
+
+    def start(self) -> None:
+        """启动后台监控线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='line-monitor', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """停止后台监控"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def is_running(self) -> bool:
+        """后台线程是否在运行"""
+        return self._thread is not None and self._thread.is_alive()
+
+
+def main():
+    """命令行入口：长期运行的线路监控"""
+    parser = argparse.ArgumentParser(description='线路健康监控')
+    parser.add_argument('--store', default=os.environ.get('LINE_HEALTH_STORE', 'line_health.bin'),
+                        help='时间序列文件路径')
+    parser.add_argument('--url', default=DEFAULT_TEST_URL, help='用于探测的视频链接')
+    parser.add_argument('--interval', type=float, default=300, help='探测间隔（秒）')
+    parser.add_argument('--concurrency', type=int, default=4, help='最大并发探测数')
+    parser.add_argument('--once', action='store_true', help='只探测一轮后输出汇总')
+    args = parser.parse_args()
+    setup_logging()
+
+    store = LineHealthStore(args.store)
+    monitor = LineHealthMonitor(store, test_url=args.url, interval=args.interval,
+                                max_concurrency=args.concurrency)
+    if args.once:
+        monitor.run_once()
+        for entry in store.summary():
+            print(f"{entry['line']}: 可用率 {entry['availability']:.0%}，样本 {entry['samples']}")
+        return
+
+    monitor.start()
+    try:
+        while monitor.is_running():
+            time.sleep(1)
+    except KeyboardInterrupt:
+        monitor.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+解析线路探测
+轻量模式先发 HEAD，再用 Range/流式 GET 只读取前几 KB，并对原始字节一次性做不区分大小写的关键字扫描
+"""
+
+import re
+import time
+from typing import Dict, Any, Iterable, Optional, Pattern
+
+import requests
+
+# 线路页面中表明含有播放器的关键字
+DEFAULT_KEYWORDS = ('video', 'mp4', 'iframe', 'player')
+
+# 轻量模式读取的最大字节数
+DEFAULT_MAX_BYTES = 8192
+
+# HEAD 不被支持时回退到 GET 的状态码
+_HEAD_UNSUPPORTED = (403, 404, 405, 501)
+
+_keyword_cache: Dict[tuple, Pattern] = {}
+
+
+def compile_keywords(keywords: Iterable[str]) -> Pattern:
+    """将关键字编译为单个不区分大小写的字节正则（带缓存）"""
+    key = tuple(keywords)
+    pattern = _keyword_cache.get(key)
+    if pattern is None:
+        pattern = re.compile(b'|'.join(re.escape(k.encode('ascii')) for k in key), re.IGNORECASE)
+        _keyword_cache[key] = pattern
+    return pattern
+
+
+def _is_media_type(content_type: str) -> bool:
+    """响应本身就是媒体流"""
+    content_type = content_type.lower()
+    return content_type.startswith(('video/', 'audio/')) or 'mpegurl' in content_type
+
+
+def _read_prefix(response: requests.Response, max_bytes: int) -> bytes:
+    """流式读取响应的前 max_bytes 字节"""
+    buffer = bytearray()
+    for chunk in response.iter_content(chunk_size=min(max_bytes, 4096)):
+        buffer += chunk
+        if len(buffer) >= max_bytes:
+            break
+    return bytes(buffer[:max_bytes])
+
+
+def probe_line(session: requests.Session,
+               url: str,
+               headers: Dict[str, str],
+               timeout: float = 10,
+               keywords: Iterable[str] = DEFAULT_KEYWORDS,
+               mode: str = 'light',
+               max_bytes: int = DEFAULT_MAX_BYTES) -> Dict[str, Any]:
+    """探测一条解析线路
+
+    返回 {'available', 'status_code', 'response_time', 'method'}，请求异常时返回 {'available': False, 'error'}。
+    mode='full' 时下载完整页面后扫描（旧行为）。
+    """
+    pattern = compile_keywords(keywords)
+    start_time = time.time()
+    try:
+        if mode == 'full':
+            response = session.get(url, headers=headers, timeout=timeout)
+            return {
+                'available': response.status_code == 200 and pattern.search(response.content) is not None,
+                'status_code': response.status_code,
+                'response_time': time.time() - start_time,
+                'method': 'GET'
+            }
+
+        head = session.head(url, headers=headers, timeout=timeout, allow_redirects=True)
+        if head.status_code == 200 and _is_media_type(head.headers.get('Content-Type', '')):
+            return {
+                'available': True,
+                'status_code': head.status_code,
+                'response_time': time.time() - start_time,
+                'method': 'HEAD'
+            }
+        if head.status_code >= 400 and head.status_code not in _HEAD_UNSUPPORTED:
+            return {
+                'available': False,
+                'status_code': head.status_code,
+                'response_time': time.time() - start_time,
+                'method': 'HEAD'
+            }
+
+        ranged_headers = dict(headers)
+        ranged_headers['Range'] = f'bytes=0-{max_bytes - 1}'
+        response = session.get(url, headers=ranged_headers, timeout=timeout, stream=True)
+        try:
+            status_code = response.status_code
+            has_video_content = False
+            if status_code in (200, 206):
+                has_video_content = pattern.search(_read_prefix(response, max_bytes)) is not None
+        finally:
+            response.close()
+        return {
+            'available': has_video_content,
+            # 部分内容响应视同 200，保持与完整下载一致的结果
+            'status_code': 200 if status_code == 206 else status_code,
+            'response_time': time.time() - start_time,
+            'method': 'GET'
+        }
+    except Exception as e:
+        return {
+            'available': False,
+            'error': str(e)
+        }
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+按平台学习的线路路由
+根据线路探测的真实结果维护 (平台, 线路) 成功率表，以 ε-贪心策略在利用与探索之间选择最佳线路；
+接入共享缓存后端后，各节点定期合并彼此的探测结果
+"""
+
+import json
+import random
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from cache_backend import CacheBackend, CacheError
+from metrics import metrics
+
+# 与平台无关的线路统计（如后台监控以固定测试链接探测的通用线路），计入所有平台的排序
+ANY_PLATFORM = '*'
+
+
+class LineRouter:
+    """线路路由表
+
+    每条 (平台, 线路) 记录衰减后的成功/失败次数和平滑耗时，得分为带先验的成功率后验均值。
+    没有数据时所有线路得分相同，保持传入的原有顺序。
+    """
+
+    def __init__(self,
+                 exploration_rate: float = 0.1,
+                 prior_success: float = 1.0,
+                 prior_failure: float = 1.0,
+                 decay: float = 0.98,
+                 latency_alpha: float = 0.3):
+        self.exploration_rate = exploration_rate
+        self.prior_success = prior_success
+        self.prior_failure = prior_failure
+        # 每次记录时旧数据的保留比例，使路由能跟上线路质量的变化
+        self.decay = decay
+        self.latency_alpha = latency_alpha
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str], List[Optional[float]]] = {}
+        # 共享后端（可选）：上次同步后本地新增的探测结果 [成功, 失败, 耗时, 次数]
+        self._backend: Optional[CacheBackend] = None
+        self._key_prefix = 'router:'
+        self._pending: Dict[Tuple[str, str], List[Optional[float]]] = {}
+        self._known: set = set()
+        self._sync_thread: Optional[threading.Thread] = None
+        self._sync_stop = threading.Event()
+
+    def _apply(self, stats: List[Optional[float]], success: bool, latency: Optional[float]) -> None:
+        """把一次探测结果计入统计（调用方持有锁）"""
+        stats[0] = stats[0] * self.decay + (1 if success else 0)
+        stats[1] = stats[1] * self.decay + (0 if success else 1)
+        if success and latency is not None:
+            stats[2] = latency if stats[2] is None else (
+                self.latency_alpha * latency + (1 - self.latency_alpha) * stats[2])
+
+    def _merge(self, base: Optional[List[Optional[float]]], delta: List[Optional[float]]) -> List[Optional[float]]:
+        """在 base 之后应用 delta 中累积的探测结果（成功/失败次数与逐条 record 等价，耗时为近似）"""
+        successes, failures, latency = base or (0.0, 0.0, None)
+        factor = self.decay ** delta[3]
+        if delta[2] is not None:
+            latency = delta[2] if latency is None else (
+                self.latency_alpha * delta[2] + (1 - self.latency_alpha) * latency)
+        return [successes * factor + delta[0], failures * factor + delta[1], latency]
+
+    def record(self, platform: str, line_name: str, success: bool, latency: Optional[float] = None) -> None:
+        """记录一次线路探测结果"""
+        key = (platform, line_name)
+        with self._lock:
+            self._apply(self._stats.setdefault(key, [0.0, 0.0, None]), success, latency)
+            if self._backend is not None:
+                delta = self._pending.setdefault(key, [0.0, 0.0, None, 0])
+                self._apply(delta, success, latency)
+                delta[3] += 1
+
+    def attach_backend(self, backend: CacheBackend, sync_interval: float = 5.0,
+                       key_prefix: str = 'router:') -> None:
+        """接入共享后端，后台线程每隔 sync_interval 秒与其他节点合并一次路由表
+
+        重复接入同一后端无效果；已接入其他后端时抛出 RuntimeError（先调用 detach_backend）。
+        """
+        with self._lock:
+            if self._backend is backend:
+                return
+            if self._backend is not None:
+                raise RuntimeError('路由表已接入其他共享后端')
+            self._backend = backend
+            self._key_prefix = key_prefix
+            # 每次接入使用新的停止事件，旧同步线程在 detach 后一定退出
+            self._sync_stop = threading.Event()
+            stop = self._sync_stop
+        self._sync_thread = threading.Thread(
+            target=self._sync_loop, args=(sync_interval, stop), name='router-sync', daemon=True)
+        self._sync_thread.start()
+
+    def detach_backend(self) -> None:
+        """停止同步"""
+        self._sync_stop.set()
+        with self._lock:
+            self._backend = None
+            self._pending.clear()
+
+    def _sync_loop(self, interval: float, stop: threading.Event) -> None:
+        while not stop.wait(interval):
+            try:
+                self.sync()
+            except CacheError:
+                metrics.incr('router.sync_failed')
+
+    def sync(self) -> None:
+        """与共享后端合并一次：读取共享统计，叠加本地新增结果后写回
+
+        读改写之间其他节点的写入可能被覆盖，路由表只需近似一致，不做加锁。
+        """
+        backend = self._backend
+        if backend is None:
+            return
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            keys = sorted(set(self._stats) | self._known)
+        if not keys:
+            return
+        backend_keys = [f'{self._key_prefix}{platform}|{line_name}' for platform, line_name in keys]
+        try:
+            values = backend.get_many(backend_keys)
+            merged, updates = {}, {}
+            for key, backend_key, raw in zip(keys, backend_keys, values):
+                shared = json.loads(raw) if raw else None
+                if key in pending:
+                    shared = self._merge(shared, pending[key])
+                    updates[backend_key] = json.dumps(shared)
+                if shared is not None:
+                    merged[key] = shared
+            backend.set_many(updates)
+        except CacheError:
+            # 同步失败时保留本地新增结果，下次重试
+            with self._lock:
+                for key, delta in pending.items():
+                    current = self._pending.get(key)
+                    if current is not None:
+                        # 先前的结果在前，同步期间新增的在后
+                        delta = self._merge(delta[:3], current) + [delta[3] + current[3]]
+                    self._pending[key] = delta
+            raise
+        with self._lock:
+            for key, stats in merged.items():
+                # 同步期间新增的本地结果叠加在共享统计之上
+                delta = self._pending.get(key)
+                self._stats[key] = self._merge(stats, delta) if delta else stats
+        metrics.incr('router.synced')
+
+    def _combined(self, platform: str, line_name: str) -> Optional[List[Optional[float]]]:
+        """平台统计叠加与平台无关的统计，耗时优先取平台自身的（调用方持有锁）"""
+        own = self._stats.get((platform, line_name))
+        shared = self._stats.get((ANY_PLATFORM, line_name)) if platform != ANY_PLATFORM else None
+        if own is None or shared is None:
+            return own or shared
+        return [own[0] + shared[0], own[1] + shared[1], own[2] if own[2] is not None else shared[2]]
+
+    def score(self, platform: str, line_name: str) -> float:
+        """线路成功率的后验均值"""
+        with self._lock:
+            successes, failures, _ = self._combined(platform, line_name) or (0.0, 0.0, None)
+        return (successes + self.prior_success) / (
+            successes + failures + self.prior_success + self.prior_failure)
+
+    def rank(self, platform: str, lines: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """按得分排序线路（纯利用），得分相同的保持原有顺序"""
+        with self._lock:
+            stats = {line['name']: self._combined(platform, line['name']) for line in lines}
+            if self._backend is not None:
+                # 记住用到的线路，同步时也拉取其他节点对它们的统计
+                self._known.update((key, name) for name in stats for key in (platform, ANY_PLATFORM))
+
+        def sort_key(item):
+            index, line = item
+            successes, failures, latency = stats[line['name']] or (0.0, 0.0, None)
+            score = (successes + self.prior_success) / (
+                successes + failures + self.prior_success + self.prior_failure)
+            return (-round(score, 6), latency if latency is not None else float('inf'), index)
+
+        return [line for _, line in sorted(enumerate(lines), key=sort_key)]
+
+    def choose(self, platform: str, lines: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """ε-贪心选择一条线路"""
+        if not lines:
+            return None
+        if len(lines) > 1 and random.random() < self.exploration_rate:
+            return random.choice(lines)
+        return self.rank(platform, lines)[0]
+
+    def order(self, platform: str, lines: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """探测顺序：首条为 ε-贪心选择的线路，其余按得分排序"""
+        ranked = self.rank(platform, lines)
+        chosen = self.choose(platform, ranked)
+        return [chosen] + [line for line in ranked if line is not chosen] if chosen else ranked
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """导出路由表"""
+        with self._lock:
+            items = list(self._stats.items())
+        return [
+            {
+                'platform': platform,
+                'line': line_name,
+                'successes': round(successes, 3),
+                'failures': round(failures, 3),
+                'score': (successes + self.prior_success) / (
+                    successes + failures + self.prior_success + self.prior_failure),
+                'latency': latency
+            }
+            for (platform, line_name), (successes, failures, latency) in sorted(items)
+        ]
+
+
+# 进程级共享路由表
+shared_router = LineRouter()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+短链接与移动端链接解析
+移动端分享链接在本地改写为桌面端规范链接；短链接只用 HEAD 请求跟随跳转（不下载页面），
+短链接 → 规范链接的映射带 TTL 缓存，解析失败也做短期缓存，每个短链接至多一次往返
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+from urllib.parse import urljoin, urlsplit, parse_qs
+
+import requests
+
+from metrics import metrics
+from singleflight import SingleFlight
+
+# 需要跟随跳转才能得到目标链接的短链接域名
+SHORT_LINK_HOSTS = ('b23.tv', 'url.cn', 't.cn', 'dwz.cn')
+
+# 跳转状态码
+REDIRECT_STATUS = (301, 302, 303, 307, 308)
+
+
+def _rewrite_tencent_mobile(match: re.Match, url: str) -> Optional[str]:
+    """m.v.qq.com 播放页 → 桌面端播放页"""
+    query = parse_qs(urlsplit(url).query)
+    vid = (query.get('vid') or [None])[0]
+    cid = (query.get('cid') or [None])[0]
+    if vid and cid:
+        return f'https://v.qq.com/x/cover/{cid}/{vid}.html'
+    if vid:
+        return f'https://v.qq.com/x/page/{vid}.html'
+    if cid:
+        return f'https://v.qq.com/x/cover/{cid}.html'
+    return None
+
+
+# 移动端链接改写规则：(正则, 由匹配结果与原链接生成规范链接的函数)
+MOBILE_REWRITES: Tuple[Tuple[re.Pattern, Callable[[re.Match, str], Optional[str]]], ...] = (
+    (re.compile(r'^https?://m\.youku\.com/\w+/id_([^./?#]+)\.html'),
+     lambda m, url: f'https://v.youku.com/v_show/id_{m.group(1)}.html'),
+    (re.compile(r'^https?://m\.bilibili\.com/video/((?:BV|av)[a-zA-Z0-9]+)'),
+     lambda m, url: f'https://www.bilibili.com/video/{m.group(1)}'),
+    (re.compile(r'^https?://m\.v\.qq\.com/'), _rewrite_tencent_mobile),
+)
+
+
+def rewrite_mobile_url(url: str) -> str:
+    """本地改写移动端链接（不发起网络请求），无匹配规则时原样返回"""
+    for pattern, rewrite in MOBILE_REWRITES:
+        match = pattern.match(url)
+        if match:
+            return rewrite(match, url) or url
+    return url
+
+
+def is_short_link(url: str) -> bool:
+    """是否为需要跟随跳转的短链接"""
+    host = (urlsplit(url).hostname or '').lower()
+    return any(host == short or host.endswith('.' + short) for short in SHORT_LINK_HOSTS)
+
+
+class LinkResolver:
+    """短链接解析器
+
+    ttl 内命中缓存直接返回；解析失败时在 negative_ttl 内直接返回原链接，不再重复请求。
+    同一短链接的并发解析合并为一次请求。
+    """
+
+    def __init__(self,
+                 session: Optional[requests.Session] = None,
+                 ttl: float = 3600,
+                 negative_ttl: float = 300,
+                 max_entries: int = 10000,
+                 max_hops: int = 5,
+                 timeout: float = 5):
+        self.session = session or requests.Session()
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.max_hops = max_hops
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        # 短链接 → (过期时间, 规范链接或 None)，按最近使用排序
+        self._entries: 'OrderedDict[str, Tuple[float, Optional[str]]]' = OrderedDict()
+        # 单独计数，不计入解析请求合并的 singleflight.* 指标
+        self._flight = SingleFlight(metric_prefix='linkresolver.singleflight')
+
+    def resolve(self, url: str) -> str:
+        """返回可直接分派的规范链接；无法解析时返回原链接"""
+        url = url.strip()
+        if not is_short_link(url):
+            return rewrite_mobile_url(url)
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(url)
+                metrics.incr('linkresolver.cache_hit', negative=entry[1] is None)
+                return entry[1] or url
+
+        target = self._flight.do(url, self._fetch, url)
+        return target or url
+
+    def _fetch(self, url: str) -> Optional[str]:
+        """用 HEAD 请求跟随跳转，离开短链接域名即停止，结果写入缓存"""
+        metrics.incr('linkresolver.cache_miss')
+        target = None
+        current = url
+        try:
+            for _ in range(self.max_hops):
+                response = self.session.head(current, allow_redirects=False, timeout=self.timeout)
+                location = response.headers.get('Location')
+                if response.status_code not in REDIRECT_STATUS or not location:
+                    break
+                current = urljoin(current, location)
+                if not is_short_link(current):
+                    # 目标页面本身无需访问，交给正常分派流程
+                    target = rewrite_mobile_url(current)
+                    break
+        except requests.RequestException:
+            metrics.incr('linkresolver.failed')
+
+        ttl = self.ttl if target else self.negative_ttl
+        with self._lock:
+            self._entries[url] = (time.monotonic() + ttl, target)
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return target
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+本地压测工具
+在本机启动平台页面与解析线路的替身服务，解析器发出的全部 HTTP 请求经传输适配器改写到替身服务；
+按阶梯并发驱动 parse_video 或 test_all_apis，统计每一级的吞吐量、耗时百分位数和错误率，并给出饱和拐点；
+替身服务运行在独立进程中，不与被测解析器争用同一个 GIL
+
+用法：
+    python load_test.py --target parse --steps 1,2,4,8,16,32 --step-duration 10
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+
+from integrated_parser import IntegratedVideoParser
+from line_router import LineRouter
+from metrics import percentile
+from negative_cache import NegativeCache
+from singleflight import SingleFlight
+from structured_log import setup_logging
+
+# 默认的阶梯并发数
+DEFAULT_STEPS = (1, 2, 4, 8, 16, 32)
+
+# 吞吐量的边际增量低于起始单并发效率的这一比例时，视为已饱和
+DEFAULT_MIN_EFFICIENCY = 0.5
+
+# 错误率超过该值的阶梯视为已过载
+DEFAULT_MAX_ERROR_RATE = 0.05
+
+# 平台页面与接口主机（其余主机均按解析线路应答）
+PAGE_HOSTS = ('youku.com', 'v.qq.com', 'iqiyi.com', 'mgtv.com')
+BILIBILI_API_HOST = 'api.bilibili.com'
+
+PAGE_TEMPLATE = ('<html><head><title>替身视频 {vid} - 在线观看</title>'
+                 '<meta property="og:image" content="https://img.example.com/{vid}.jpg"></head>'
+                 '<body><script>var PAGE_CONFIG = {{"videoId":"{vid}","vid":"{vid}","seconds":1440}};</script>'
+                 '{padding}</body></html>')
+
+LINE_PAGE = ('<html><head><title>player</title></head>'
+             '<body><iframe src="/player.html"></iframe><video src="/v.mp4"></video></body></html>').encode('utf-8')
+
+
+def _matches(host: str, domain: str) -> bool:
+    return host == domain or host.endswith('.' + domain)
+
+
+class _StandInHTTPServer(ThreadingHTTPServer):
+    # 高并发阶梯下一次涌入大量连接，加大监听队列避免连接被拒
+    request_queue_size = 256
+
+
+class StandInServer:
+    """平台页面与解析线路的替身服务
+
+    请求路径形如 /<原主机>/<原路径>；每个请求先等待模拟的上游耗时（latency 上下浮动 jitter 比例），
+    再按 error_rate / line_error_rate 随机返回 503。
+    """
+
+    def __init__(self,
+                 latency: float = 0.05,
+                 jitter: float = 0.5,
+                 error_rate: float = 0.0,
+                 line_error_rate: float = 0.0,
+                 page_size: int = 200_000,
+                 host: str = '127.0.0.1',
+                 port: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.line_error_rate = line_error_rate
+        # 真实平台页面通常有数百 KB，用填充内容模拟页面解析的开销
+        self.padding = '<div class="item"></div>' * max(0, page_size // 24)
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                owner._handle(self, send_body=True)
+
+            def do_HEAD(self):
+                owner._handle(self, send_body=False)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = _StandInHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """监听地址 (host, port)"""
+        return self._server.server_address[:2]
+
+    def _respond(self, original_host: str, path: str) -> Tuple[int, str, bytes]:
+        """按原主机生成应答 (状态码, 内容类型, 内容)"""
+        if _matches(original_host, BILIBILI_API_HOST):
+            bvid = path.rsplit('=', 1)[-1]
+            data = {'code': 0, 'data': {'title': f'替身视频 {bvid}', 'duration': 1440,
+                                        'pic': f'https://img.example.com/{bvid}.jpg', 'bvid': bvid}}
+            return 200, 'application/json', json.dumps(data, ensure_ascii=False).encode('utf-8')
+        if any(_matches(original_host, domain) for domain in PAGE_HOSTS):
+            vid = 'X' + format(abs(hash(path)) % 10 ** 12, '012d')
+            return 200, 'text/html; charset=utf-8', PAGE_TEMPLATE.format(vid=vid, padding=self.padding).encode('utf-8')
+        if random.random() < self.line_error_rate:
+            return 503, 'text/plain', b'unavailable'
+        return 200, 'text/html; charset=utf-8', LINE_PAGE
+
+    def _handle(self, handler: BaseHTTPRequestHandler, send_body: bool) -> None:
+        original_host, _, path = handler.path.lstrip('/').partition('/')
+        delay = self.latency * random.uniform(1 - self.jitter, 1 + self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if random.random() < self.error_rate:
+            status, content_type, body = 503, 'text/plain', b'unavailable'
+        else:
+            status, content_type, body = self._respond(original_host, '/' + path)
+        handler.send_response(status)
+        handler.send_header('Content-Type', content_type)
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        if send_body:
+            try:
+                handler.wfile.write(body)
+            except OSError:
+                # 客户端只读取前几 KB 即断开（轻量探测）
+                pass
+
+    def start(self) -> 'StandInServer':
+        """在后台线程中启动"""
+        self._thread = threading.Thread(target=self._server.serve_forever, name='stand-in', daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """在当前线程中运行"""
+        self._server.serve_forever()
+
+    def stop(self) -> None:
+        """停止服务"""
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _serve_stand_in(options: Dict[str, Any], conn) -> None:
+    """子进程入口：启动替身服务并把监听地址发回父进程"""
+    server = StandInServer(**options)
+    conn.send(server.address)
+    conn.close()
+    server.serve_forever()
+
+
+class StandInProcess:
+    """在独立进程中运行的替身服务（参数同 StandInServer）
+
+    替身服务的请求处理与被测解析器在同一进程时会争用 GIL，高并发阶梯下测得的耗时包含替身服务自身的开销；
+    放到子进程后只剩真实的网络往返。
+    """
+
+    def __init__(self,
+                 latency: float = 0.05,
+                 jitter: float = 0.5,
+                 error_rate: float = 0.0,
+                 line_error_rate: float = 0.0,
+                 page_size: int = 200_000,
+                 host: str = '127.0.0.1',
+                 port: int = 0,
+                 start_timeout: float = 10.0):
+        self.latency = latency
+        self.options = {'latency': latency, 'jitter': jitter, 'error_rate': error_rate,
+                        'line_error_rate': line_error_rate, 'page_size': page_size, 'host': host, 'port': port}
+        self.start_timeout = start_timeout
+        self._process: Optional[multiprocessing.Process] = None
+        self._address: Optional[Tuple[str, int]] = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """监听地址 (host, port)"""
+        if self._address is None:
+            raise RuntimeError('替身服务尚未启动')
+        return self._address
+
+    def start(self) -> 'StandInProcess':
+        """启动子进程并等待其开始监听"""
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        self._process = multiprocessing.Process(target=_serve_stand_in, args=(self.options, sender),
+                                                name='stand-in', daemon=True)
+        self._process.start()
+        sender.close()
+        try:
+            if not receiver.poll(self.start_timeout):
+                raise RuntimeError('替身服务进程启动超时')
+            self._address = receiver.recv()
+        except (EOFError, RuntimeError):
+            self.stop()
+            raise RuntimeError('替身服务进程启动失败') from None
+        finally:
+            receiver.close()
+        return self
+
+    def stop(self) -> None:
+        """结束子进程"""
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+
+
+class LocalRedirectAdapter(HTTPAdapter):
+    """把任意主机的请求改写到替身服务：https://host/path → http://127.0.0.1:port/host/path
+
+    传输层的按主机统计、对冲和限速在改写之前完成，仍按原主机生效。
+    """
+
+    def __init__(self, address: Tuple[str, int], **kwargs):
+        self.target = f'http://{address[0]}:{address[1]}'
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        if not request.url.startswith(self.target):
+            request.url = f'{self.target}/{parts.hostname}{parts.path or "/"}' + (f'?{parts.query}' if parts.query else '')
+        return super().send(request, **kwargs)
+
+
+def install_redirect(parser: IntegratedVideoParser, address: Tuple[str, int], pool_size: int = 64) -> None:
+    """让解析器的全部请求发往替身服务"""
+    adapter = LocalRedirectAdapter(address, pool_connections=pool_size, pool_maxsize=pool_size)
+    parser.session.mount('http://', adapter)
+    parser.session.mount('https://', adapter)
+
+
+def iter_workload_urls(platforms: Sequence[str] = ('youku', 'qq', 'iqiyi', 'bilibili', 'mgtv')) -> Iterator[str]:
+    """各平台轮流、视频ID互不相同的链接（避免命中合并与缓存，每次都真正解析）"""
+    templates = {
+        'youku': 'https://v.youku.com/v_show/id_XLOAD{n:08d}.html',
+        'qq': 'https://v.qq.com/x/cover/load{n:08d}.html',
+        'iqiyi': 'https://www.iqiyi.com/v_load{n:08d}.html',
+        'bilibili': 'https://www.bilibili.com/video/BV1L{n:08d}',
+        'mgtv': 'https://www.mgtv.com/b/1/{n:08d}.html'
+    }
+    for n in itertools.count(1):
+        for platform in platforms:
+            yield templates[platform].format(n=n)
+
+
+def run_step(call: Callable[[str], bool], urls: Iterator[str], concurrency: int,
+             duration: float) -> Dict[str, Any]:
+    """以固定并发（闭环：每个工作线程完成一个再发下一个）运行 duration 秒，返回本级统计"""
+    url_lock = threading.Lock()
+    latencies: List[float] = []
+    counts = {'errors': 0}
+    stats_lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        while time.perf_counter() < deadline:
+            with url_lock:
+                url = next(urls)
+            start = time.perf_counter()
+            try:
+                ok = call(url)
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with stats_lock:
+                latencies.append(elapsed)
+                if not ok:
+                    counts['errors'] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, name=f'load-{i}', daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    requests_done = len(latencies)
+    return {
+        'concurrency': concurrency,
+        'requests': requests_done,
+        'errors': counts['errors'],
+        'error_rate': round(counts['errors'] / requests_done, 4) if requests_done else 0.0,
+        'throughput': round(requests_done / elapsed, 2) if elapsed else 0.0,
+        'p50': _ms(percentile(latencies, 50)),
+        'p90': _ms(percentile(latencies, 90)),
+        'p99': _ms(percentile(latencies, 99)),
+        'max': _ms(max(latencies) if latencies else None)
+    }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+def find_knee(steps: List[Dict[str, Any]],
+              min_efficiency: float = DEFAULT_MIN_EFFICIENCY,
+              max_error_rate: float = DEFAULT_MAX_ERROR_RATE) -> Dict[str, Any]:
+    """找出饱和拐点
+
+    以第一级的单并发吞吐量为基准，逐级计算增加的吞吐量与增加的并发数之比（边际效率）；
+    第一个边际效率低于 min_efficiency 或错误率超过 max_error_rate 的阶梯之前一级即为拐点。
+    所有阶梯都未饱和时返回最后一级，并标记 saturated=False。
+    """
+    if not steps:
+        return {'concurrency': None, 'saturated': False, 'reason': '没有数据'}
+    baseline = steps[0]['throughput'] / steps[0]['concurrency'] if steps[0]['concurrency'] else 0.0
+    for previous, step in zip(steps, steps[1:]):
+        added = step['concurrency'] - previous['concurrency']
+        efficiency = (step['throughput'] - previous['throughput']) / added / baseline if added and baseline else 0.0
+        step['efficiency'] = round(efficiency, 2)
+        if step['error_rate'] > max_error_rate:
+            return {'concurrency': previous['concurrency'], 'throughput': previous['throughput'],
+                    'saturated': True, 'reason': f"并发 {step['concurrency']} 时错误率 {step['error_rate']:.1%}"}
+        if efficiency < min_efficiency:
+            return {'concurrency': previous['concurrency'], 'throughput': previous['throughput'],
+                    'saturated': True, 'reason': f"并发 {step['concurrency']} 时边际效率 {efficiency:.2f}"}
+    last = steps[-1]
+    return {'concurrency': last['concurrency'], 'throughput': last['throughput'],
+            'saturated': False, 'reason': '所有阶梯均未饱和，可继续加大并发'}
+
+
+def build_target(parser: IntegratedVideoParser, target: str) -> Callable[[str], bool]:
+    """压测目标：parse（parse_video）或 lines（优酷专线 test_all_apis）"""
+    if target == 'parse':
+        return lambda url: bool(parser.parse_video(url).get('success'))
+    # 线路测试对所有链接一视同仁，统一使用优酷链接；没有任何可用线路时记为错误
+    return lambda url: any(item.get('available') for item in parser.test_youku_apis(url))
+
+
+def run_load_test(target: str = 'parse',
+                  steps: Sequence[int] = DEFAULT_STEPS,
+                  step_duration: float = 10.0,
+                  warmup: float = 2.0,
+                  server: Optional[Union[StandInProcess, StandInServer]] = None,
+                  platforms: Optional[Sequence[str]] = None,
+                  on_step: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """启动替身服务并逐级压测，返回各级统计与拐点；未传入 server 时在独立进程中启动替身服务"""
+    own_server = server is None
+    if own_server:
+        server = StandInProcess().start()
+    try:
+        # 使用独立的合并器、失败缓存和路由表，不受进程内其他解析器影响
+        parser = IntegratedVideoParser(singleflight=SingleFlight(), negative_cache=NegativeCache(),
+                                       router=LineRouter())
+        install_redirect(parser, server.address, pool_size=max(steps) * 2)
+        if target == 'lines':
+            urls = iter_workload_urls(('youku',))
+        else:
+            urls = iter_workload_urls(platforms) if platforms else iter_workload_urls()
+        call = build_target(parser, target)
+
+        if warmup > 0:
+            # 建立连接、填充路由表，不计入结果
+            run_step(call, urls, min(steps), warmup)
+
+        results = []
+        for concurrency in steps:
+            step = run_step(call, urls, concurrency, step_duration)
+            results.append(step)
+            if on_step:
+                on_step(step)
+        return {
+            'target': target,
+            'step_duration': step_duration,
+            'upstream_latency': server.latency,
+            'steps': results,
+            'knee': find_knee(results)
+        }
+    finally:
+        if own_server:
+            server.stop()
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """文本报告"""
+    lines = [f"目标: {report['target']}  每级时长: {report['step_duration']} 秒  "
+             f"模拟上游耗时: {report['upstream_latency'] * 1000:.0f} ms",
+             f"{'并发':>6} {'请求数':>8} {'吞吐(次/秒)':>12} {'错误率':>8} {'p50(ms)':>9} "
+             f"{'p90(ms)':>9} {'p99(ms)':>9} {'边际效率':>8}"]
+    for step in report['steps']:
+        lines.append(f"{step['concurrency']:>6} {step['requests']:>8} {step['throughput']:>12} "
+                     f"{step['error_rate']:>8.1%} {step['p50']!s:>9} {step['p90']!s:>9} {step['p99']!s:>9} "
+                     f"{step.get('efficiency', '-')!s:>8}")
+    knee = report['knee']
+    lines.append(f"拐点: 并发 {knee['concurrency']}，吞吐 {knee.get('throughput')} 次/秒（{knee['reason']}）")
+    return '\n'.join(lines)
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='本地阶梯并发压测')
+    parser.add_argument('--target', choices=('parse', 'lines'), default='parse',
+                        help='parse: parse_video；lines: 优酷专线 test_all_apis')
+    parser.add_argument('--steps', default=','.join(map(str, DEFAULT_STEPS)), help='阶梯并发数，逗号分隔')
+    parser.add_argument('--step-duration', type=float, default=10.0, help='每级持续时间（秒）')
+    parser.add_argument('--warmup', type=float, default=2.0, help='预热时间（秒），不计入结果')
+    parser.add_argument('--platforms', default=None, help='parse 目标的平台，逗号分隔（youku,qq,iqiyi,bilibili,mgtv）')
+    parser.add_argument('--latency', type=float, default=0.05, help='模拟的上游耗时（秒）')
+    parser.add_argument('--jitter', type=float, default=0.5, help='上游耗时的浮动比例')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='替身服务随机返回 503 的比例')
+    parser.add_argument('--line-error-rate', type=float, default=0.0, help='线路额外返回 503 的比例')
+    parser.add_argument('--json', default=None, help='同时把报告写入 JSON 文件')
+    args = parser.parse_args()
+    setup_logging(sys.stderr)
+
+    server = StandInProcess(latency=args.latency, jitter=args.jitter,
+                           error_rate=args.error_rate, line_error_rate=args.line_error_rate).start()
+    try:
+        report = run_load_test(
+            target=args.target,
+            steps=[int(step) for step in args.steps.split(',') if step.strip()],
+            step_duration=args.step_duration,
+            warmup=args.warmup,
+            server=server,
+            platforms=args.platforms.split(',') if args.platforms else None,
+            on_step=lambda step: sys.stderr.write(
+                f"并发 {step['concurrency']}: {step['throughput']} 次/秒, p99 {step['p99']} ms\n")
+        )
+    finally:
+        server.stop()
+    print(format_report(report))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+解析器运行指标
+线程安全的计数器与耗时采样，供传输层、缓存、调度等模块共同使用
+"""
+
+import math
+import threading
+from collections import deque
+from typing import Dict, Any, Optional, Tuple
+
+
+def _metric_key(name: str, labels: Dict[str, Any]) -> Tuple:
+    """生成带标签的指标键"""
+    return (name,) + tuple(sorted(labels.items()))
+
+
+def _format_key(key: Tuple) -> str:
+    """将指标键格式化为可读字符串，如 hedge.fired{host=v.qq.com}"""
+    name, labels = key[0], key[1:]
+    if not labels:
+        return name
+    return name + '{' + ','.join(f'{k}={v}' for k, v in labels) + '}'
+
+
+def percentile(values, q: float) -> Optional[float]:
+    """计算百分位数（最近秩法），无样本时返回 None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(q / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self, sample_size: int = 1024):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple, float] = {}
+        self._samples: Dict[Tuple, deque] = {}
+        self._totals: Dict[Tuple, list] = {}
+        self.sample_size = sample_size
+
+    def incr(self, name: str, value: float = 1, **labels) -> None:
+        """计数器累加"""
+        key = _metric_key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """记录一次观测值（如耗时秒数），保留最近 sample_size 个样本"""
+        key = _metric_key(name, labels)
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.sample_size)
+                self._totals[key] = [0, 0.0]
+            samples.append(value)
+            totals = self._totals[key]
+            totals[0] += 1
+            totals[1] += value
+
+    def get_counter(self, name: str, **labels) -> float:
+        """读取计数器当前值"""
+        with self._lock:
+            return self._counters.get(_metric_key(name, labels), 0)
+
+    def get_percentile(self, name: str, q: float, **labels) -> Optional[float]:
+        """读取观测值的百分位数"""
+        with self._lock:
+            samples = list(self._samples.get(_metric_key(name, labels), ()))
+        return percentile(samples, q)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """导出所有指标的快照"""
+        with self._lock:
+            counters = {_format_key(k): v for k, v in self._counters.items()}
+            observations = {}
+            for key, samples in self._samples.items():
+                count, total = self._totals[key]
+                values = list(samples)
+                observations[_format_key(key)] = {
+                    'count': count,
+                    'sum': total,
+                    'p50': percentile(values, 50),
+                    'p95': percentile(values, 95),
+                    'p99': percentile(values, 99)
+                }
+        return {'counters': counters, 'observations': observations}
+
+    def reset(self) -> None:
+        """清空所有指标"""
+        with self._lock:
+            self._counters.clear()
+            self._samples.clear()
+            self._totals.clear()
+
+
+# 进程级默认注册表
+metrics = MetricsRegistry()
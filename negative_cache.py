@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+失败结果缓存
+解析失败按原因分类；不支持的平台、无效链接、无法提取ID 等确定性失败按规范键短期缓存，
+重复提交直接返回缓存结果，不再请求上游；网络等临时失败不缓存
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from metrics import metrics
+
+# 失败类别（解析结果中的 error_type）
+UNSUPPORTED = 'unsupported'      # 不支持的平台或链接类型
+INVALID = 'invalid'              # 平台确认视频不存在或链接无效
+UNEXTRACTABLE = 'unextractable'  # 页面正常但无法提取视频ID
+TRANSIENT = 'transient'          # 网络错误、超时、上游 5xx 等，重试可能成功
+
+# 各类别的缓存时长（秒），不在表中的类别不缓存
+DEFAULT_TTLS = {
+    UNSUPPORTED: 3600,
+    INVALID: 600,
+    UNEXTRACTABLE: 300
+}
+
+
+# 确认资源不存在的状态码；401/403/412/451 等多为鉴权、风控或地区限制，换时间或节点重试可能成功
+INVALID_STATUS_CODES = (404, 410)
+
+
+def error_type_for_status(status_code: int) -> str:
+    """按 HTTP 状态码判断失败类别：404/410 视为链接无效，其余视为临时失败"""
+    if status_code in INVALID_STATUS_CODES:
+        return INVALID
+    return TRANSIENT
+
+
+class NegativeCache:
+    """失败结果缓存（LRU + 按类别 TTL）"""
+
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, max_entries: int = 10000):
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Hashable, Tuple[float, Dict[str, Any]]]' = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """命中未过期的失败结果时返回其副本（带 cached 标记），否则返回 None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            result = dict(entry[1])
+        metrics.incr('negcache.hit', error_type=result.get('error_type'))
+        result['cached'] = True
+        return result
+
+    def put(self, key: Hashable, result: Dict[str, Any]) -> bool:
+        """缓存确定性失败结果，返回是否已缓存"""
+        if result.get('success'):
+            return False
+        ttl = self.ttls.get(result.get('error_type'))
+        if not ttl:
+            return False
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, dict(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        metrics.incr('negcache.stored', error_type=result.get('error_type'))
+        return True
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+# 进程级共享的失败结果缓存
+shared_negative_cache = NegativeCache()
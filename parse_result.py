@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+紧凑的解析结果
+成功结果的固定字段保存在 __slots__ 中，parse_urls 只保存排好序的共享线路对象与编码后的链接，
+访问时才生成 {'name', 'url', 'type', ...} 字典；对外保持字典接口，原有调用方无需修改
+"""
+
+from collections.abc import MutableMapping, Sequence
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from line_catalog import Line
+
+# parse_urls 中每条线路的默认字段
+PARSE_URL_FIELDS = ('name', 'url', 'type')
+
+
+class ParseUrlList(Sequence):
+    """按需生成的解析链接列表（只读）"""
+
+    __slots__ = ('lines', 'encoded_url', 'fields')
+
+    def __init__(self, lines: Iterable[Line], encoded_url: str, fields: Tuple[str, ...] = PARSE_URL_FIELDS):
+        self.lines = tuple(lines)
+        self.encoded_url = encoded_url
+        self.fields = fields
+
+    def _entry(self, line: Line) -> Dict[str, Any]:
+        entry = {}
+        for field in self.fields:
+            entry[field] = line.format(self.encoded_url) if field == 'url' else getattr(line, field)
+        return entry
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._entry(line) for line in self.lines[index]]
+        return self._entry(self.lines[index])
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (ParseUrlList, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        """生成完整的字典列表"""
+        return [self._entry(line) for line in self.lines]
+
+    def __repr__(self) -> str:
+        return f'ParseUrlList({len(self.lines)} lines)'
+
+
+class ParseResult(MutableMapping):
+    """解析结果
+
+    常用字段保存在槽位中，其余字段放入按需创建的 _extra 字典；
+    parse_urls 既可以是普通列表，也可以是 ParseUrlList（由 set_lines 设置）。
+    """
+
+    _FIELDS = ('success', 'platform', 'original_url', 'title', 'duration', 'thumbnail', 'vid',
+               'vip_content', 'parse_urls', 'best_parse_url', 'recommended_api', 'parse_method',
+               'parser_type', 'parser_info')
+
+    __slots__ = _FIELDS + ('_extra',)
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None, **kwargs):
+        self._extra = None
+        if data:
+            self.update(data)
+        if kwargs:
+            self.update(kwargs)
+
+    def set_lines(self, lines: Iterable[Line], encoded_url: str,
+                  fields: Tuple[str, ...] = PARSE_URL_FIELDS) -> ParseUrlList:
+        """由排好序的线路和编码后的链接设置 parse_urls"""
+        self.parse_urls = ParseUrlList(lines, encoded_url, fields)
+        return self.parse_urls
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._FIELDS:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in self._FIELDS:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key in self._FIELDS:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self._extra is None:
+            raise KeyError(key)
+        else:
+            del self._extra[key]
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self._FIELDS:
+            if hasattr(self, key):
+                yield key
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for key in self._FIELDS if hasattr(self, key)) + len(self._extra or ())
+
+    def __contains__(self, key) -> bool:
+        if key in self._FIELDS:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def copy(self) -> 'ParseResult':
+        """浅拷贝（parse_urls 为只读对象，可直接共享）"""
+        clone = ParseResult()
+        for key in self._FIELDS:
+            if hasattr(self, key):
+                setattr(clone, key, getattr(self, key))
+        if self._extra:
+            clone._extra = dict(self._extra)
+        return clone
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转为普通字典（parse_urls 展开为列表）"""
+        data = dict(self.items())
+        if isinstance(data.get('parse_urls'), ParseUrlList):
+            data['parse_urls'] = data['parse_urls'].to_list()
+        return data
+
+    def __repr__(self) -> str:
+        return f'ParseResult({dict(self.items())!r})'
+
+
+def json_default(obj: Any) -> Any:
+    """json.dumps 的 default 参数：展开解析结果与线路列表，其余对象转为字符串"""
+    if isinstance(obj, ParseResult):
+        return obj.to_dict()
+    if isinstance(obj, ParseUrlList):
+        return obj.to_list()
+    return str(obj)
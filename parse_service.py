@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+视频解析 HTTP 服务
+以 JSON API 提供 parse_video、剧集解析、线路测试和平台列表，带在途上限和有界队列（队列满时返回 503）
+"""
+
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+from integrated_parser import IntegratedVideoParser
+from metrics import metrics
+from parse_result import json_default
+from scheduler import PriorityScheduler, INTERACTIVE, BATCH
+from vid_index import VidIndex
+from cache_backend import RedisBackend
+from structured_log import setup_logging
+
+
+# POST 请求体上限（字节），请求参数只有链接与优先级
+MAX_BODY_BYTES = 64 * 1024
+
+
+def _content_length(value: Optional[str]) -> Optional[int]:
+    """解析 Content-Length，缺省为 0，非数字或负数返回 None"""
+    if value is None or not value.strip():
+        return 0
+    value = value.strip()
+    if not (value.isascii() and value.isdigit()):
+        return None
+    return int(value)
+
+
+class Overloaded(Exception):
+    """超出在途上限与队列容量"""
+
+
+class AdmissionController:
+    """准入控制
+
+    同时执行的任务不超过 max_inflight，等待执行的任务不超过 queue_size，超出时立即拒绝。
+    准入后的任务交给优先级调度器，交互请求与批量请求按权重分享执行槽位；
+    队列的最后 1/4 只接收交互请求，批量任务打满队列时交互请求仍可进入。
+    传入 scheduler 时使用它（通常是解析器的调度器），max_inflight 与 weights 由它决定。
+    """
+
+    def __init__(self, max_inflight: int = 8, queue_size: int = 64,
+                 weights: Optional[Dict[str, float]] = None,
+                 scheduler: Optional[PriorityScheduler] = None):
+        if scheduler is None:
+            if max_inflight < 1:
+                raise ValueError('max_inflight 必须不小于 1')
+            scheduler = PriorityScheduler(concurrency=max_inflight, weights=weights)
+        self.scheduler = scheduler
+        # 调度器的工作线程数即同时执行的任务数
+        self.max_inflight = scheduler.concurrency
+        self.queue_size = queue_size
+        self.interactive_reserve = max(1, queue_size // 4) if queue_size else 0
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._running = 0
+
+    @property
+    def capacity(self) -> int:
+        """可准入的任务总数（执行中 + 排队中）"""
+        return self.max_inflight + self.queue_size
+
+    def stats(self) -> Dict[str, Any]:
+        """当前执行与排队情况"""
+        with self._lock:
+            stats = {
+                'running': self._running,
+                'queued': self._admitted - self._running,
+                'max_inflight': self.max_inflight,
+                'queue_size': self.queue_size
+            }
+        stats['classes'] = self.scheduler.stats()
+        return stats
+
+    def has_capacity(self) -> bool:
+        """是否还能接收新任务"""
+        with self._lock:
+            return self._admitted < self.capacity
+
+    def submit(self, fn: Callable, *args, priority: str = INTERACTIVE) -> Any:
+        """准入并提交任务，返回 Future；容量已满时抛出 Overloaded，未知优先级类别抛出 ValueError"""
+        if priority not in self.scheduler.weights:
+            raise ValueError(f'未知的优先级类别: {priority}')
+        limit = self.capacity if priority == INTERACTIVE else self.capacity - self.interactive_reserve
+        with self._lock:
+            if self._admitted >= limit:
+                metrics.incr('service.shed', priority=priority)
+                raise Overloaded()
+            self._admitted += 1
+        metrics.incr('service.admitted', priority=priority)
+        try:
+            return self.scheduler.submit(self._run, fn, args, priority=priority)
+        except Exception:
+            with self._lock:
+                self._admitted -= 1
+            raise
+
+    def _run(self, fn: Callable, args: Tuple) -> Any:
+        """工作线程中执行任务"""
+        with self._lock:
+            self._running += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._admitted -= 1
+
+    def shutdown(self) -> None:
+        """停止调度器"""
+        self.scheduler.shutdown()
+
+
+class ParseService:
+    """解析服务
+
+    准入后的任务在解析器的调度器中执行，解析器内部不再重复排队；
+    未传入 parser 时创建带调度器的解析器，传入的解析器已有调度器时 max_inflight 与 weights 以它为准。
+    """
+
+    def __init__(self,
+                 parser: Optional[IntegratedVideoParser] = None,
+                 max_inflight: int = 8,
+                 queue_size: int = 64,
+                 request_timeout: float = 60,
+                 weights: Optional[Dict[str, float]] = None):
+        self.parser = parser or IntegratedVideoParser(
+            scheduler=PriorityScheduler(concurrency=max_inflight, weights=weights))
+        self.admission = AdmissionController(max_inflight, queue_size, weights, scheduler=self.parser.scheduler)
+        self.request_timeout = request_timeout
+        self.draining = False
+
+    def is_ready(self) -> bool:
+        """就绪：未在下线、连接预热已完成且仍有容量"""
+        warmer = self.parser.warmer
+        return (not self.draining
+                and (warmer is None or warmer.done.is_set())
+                and self.admission.has_capacity())
+
+    def run_job(self, fn: Callable, *args, priority: str = INTERACTIVE) -> Tuple[int, Any]:
+        """经准入控制执行解析任务，返回 (状态码, 响应体)"""
+        try:
+            future = self.admission.submit(fn, *args, priority=priority)
+        except ValueError as e:
+            return 400, {'success': False, 'error': str(e)}
+        except Overloaded:
+            return 503, {'success': False, 'error': '服务繁忙，请稍后重试'}
+        try:
+            return 200, future.result(timeout=self.request_timeout)
+        except FutureTimeoutError:
+            metrics.incr('service.timeout')
+            return 504, {'success': False, 'error': '解析超时'}
+        except Exception as e:
+            return 500, {'success': False, 'error': f'服务内部错误: {str(e)}'}
+
+    def handle(self, method: str, path: str, params: Dict[str, Any]) -> Tuple[int, Any]:
+        """路由请求"""
+        if path == '/healthz':
+            return 200, {'status': 'ok'}
+        if path == '/readyz':
+            ready = self.is_ready()
+            return (200 if ready else 503), {'status': 'ready' if ready else 'not_ready',
+                                             **self.admission.stats()}
+        if path == '/platforms' and method == 'GET':
+            return 200, {'platforms': self.parser.get_supported_platforms()}
+        if path == '/metrics' and method == 'GET':
+            return 200, {**self.parser.get_metrics(), 'admission': self.admission.stats()}
+        if path in ('/parse', '/series', '/test-apis'):
+            url = params.get('url')
+            if not url or not isinstance(url, str):
+                return 400, {'success': False, 'error': '缺少参数 url'}
+            # 未指定时按交互请求处理，批量任务应显式传 priority=batch
+            priority = params.get('priority') or INTERACTIVE
+            if not isinstance(priority, str):
+                return 400, {'success': False, 'error': 'priority 必须为字符串'}
+            if path == '/parse':
+                return self.run_job(self.parser.parse_video, url, priority=priority)
+            if path == '/series':
+                return self.run_job(self.parser.parse_series, url, priority=priority)
+            return self.run_job(self.parser.test_youku_apis, url, priority=priority)
+        return 404, {'success': False, 'error': '接口不存在'}
+
+    def make_handler(self):
+        """生成绑定到本服务的请求处理类"""
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _dispatch(self, method: str) -> None:
+                parts = urlsplit(self.path)
+                params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+                if method == 'POST':
+                    length = _content_length(self.headers.get('Content-Length'))
+                    if length is None or length > MAX_BODY_BYTES:
+                        # 请求体未读取，连接上的后续数据无法解析，回复后关闭连接
+                        self.close_connection = True
+                        if length is None:
+                            self._send(400, {'success': False, 'error': 'Content-Length 无效'})
+                        else:
+                            self._send(413, {'success': False, 'error': '请求体过大'})
+                        return
+                    try:
+                        body = json.loads(self.rfile.read(length) or b'{}')
+                    except ValueError:
+                        self._send(400, {'success': False, 'error': '请求体不是有效的JSON'})
+                        return
+                    if isinstance(body, dict):
+                        params.update(body)
+                if self.headers.get('X-Priority') and 'priority' not in params:
+                    params['priority'] = self.headers['X-Priority']
+                start_time = time.monotonic()
+                status, payload = service.handle(method, parts.path, params)
+                metrics.observe('service.latency', time.monotonic() - start_time, path=parts.path)
+                self._send(status, payload)
+
+            def _send(self, status: int, payload: Any) -> None:
+                body = json.dumps(payload, ensure_ascii=False, default=json_default).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                if status == 503:
+                    self.send_header('Retry-After', '1')
+                if self.close_connection:
+                    self.send_header('Connection', 'close')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._dispatch('GET')
+
+            def do_POST(self):
+                self._dispatch('POST')
+
+            def log_message(self, format, *args):
+                # 访问日志由指标替代，避免每个请求同步写 stderr
+                pass
+
+        return Handler
+
+    def create_server(self, host: str = '127.0.0.1', port: int = 8000) -> ThreadingHTTPServer:
+        """创建 HTTP 服务器（未启动）"""
+        server = ThreadingHTTPServer((host, port), self.make_handler())
+        server.daemon_threads = True
+        return server
+
+    def shutdown(self) -> None:
+        """进入下线状态并停止工作线程"""
+        self.draining = True
+        self.admission.shutdown()
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='视频解析 HTTP 服务')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8000, help='监听端口')
+    parser.add_argument('--max-inflight', type=int, default=8, help='同时执行的解析数上限（调度器工作线程数）')
+    parser.add_argument('--queue-size', type=int, default=64, help='排队上限，超出返回 503')
+    parser.add_argument('--timeout', type=float, default=60, help='单个请求超时（秒）')
+    parser.add_argument('--warm-up', action='store_true', help='启动时预热连接')
+    parser.add_argument('--interactive-weight', type=float, default=8, help='交互请求的调度权重')
+    parser.add_argument('--batch-weight', type=float, default=1, help='批量请求的调度权重')
+    parser.add_argument('--vid-index', default=None, help='视频元数据索引文件（vid_index.py build 生成）')
+    parser.add_argument('--cache-url', default=None,
+                        help='多节点共享的缓存后端，如 redis://127.0.0.1:6379/0（共享元数据与线路路由表）')
+    args = parser.parse_args()
+
+    setup_logging()
+    scheduler = PriorityScheduler(concurrency=args.max_inflight,
+                                  weights={INTERACTIVE: args.interactive_weight, BATCH: args.batch_weight})
+    service = ParseService(
+        parser=IntegratedVideoParser(warm_up=args.warm_up,
+                                     vid_index=VidIndex(args.vid_index) if args.vid_index else None,
+                                     cache_backend=RedisBackend.from_url(args.cache_url) if args.cache_url else None,
+                                     scheduler=scheduler),
+        queue_size=args.queue_size,
+        request_timeout=args.timeout
+    )
+    server = service.create_server(args.host, args.port)
+    print(f"解析服务已启动: http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
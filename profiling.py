@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+性能剖析钩子
+可选地对解析入口做 CPU 剖析（cProfile）和内存分配跟踪（tracemalloc），每次调用写出一份报告：
+耗时最多的函数、分配最多的代码行、墙钟时间与 CPU 时间（两者之差约为等待 I/O 的时间）
+
+剖析范围：cProfile 只记录调用所在线程，线路探测、对冲请求等线程池中的工作不在函数统计中（报告列出这些线程）；
+不同线程上的并发调用各自剖析、各写一份报告。tracemalloc 是进程级的，同一时刻只有一个调用统计内存分配
+（其余并发调用的报告注明未统计），分配统计包含同一时间段内其他线程的分配
+
+启用方式：
+    按调用启用     with profiling.profile('profiles'): parser.parse_video(url)
+    按进程启用     设置环境变量 PARSER_PROFILE_DIR=profiles
+未启用时被包装的方法只多一次上下文变量查询
+"""
+
+import contextlib
+import contextvars
+import cProfile
+import functools
+import io
+import itertools
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from typing import Callable, Iterator, Optional
+
+from metrics import metrics
+
+# 按进程启用时的报告目录
+ENV_PROFILE_DIR = 'PARSER_PROFILE_DIR'
+
+# 报告中列出的函数数与代码行数
+DEFAULT_TOP = 25
+
+_profile_dir: contextvars.ContextVar = contextvars.ContextVar('profile_dir', default=None)
+_active = threading.local()
+# tracemalloc 是进程级的，同一时刻只由一个调用统计内存分配
+_tracemalloc_lock = threading.Lock()
+_sequence = itertools.count(1)
+
+
+def report_dir() -> Optional[str]:
+    """当前调用的报告目录，未启用时返回 None"""
+    return _profile_dir.get() or os.environ.get(ENV_PROFILE_DIR) or None
+
+
+@contextlib.contextmanager
+def profile(directory: str = 'profiles') -> Iterator[str]:
+    """在上下文内对被包装的方法启用剖析"""
+    token = _profile_dir.set(directory)
+    try:
+        yield directory
+    finally:
+        _profile_dir.reset(token)
+
+
+def _describe_call(args, kwargs) -> str:
+    """报告中记录的调用参数（只取字符串参数，如视频链接）"""
+    values = [arg for arg in args if isinstance(arg, str)]
+    values += [f'{key}={value}' for key, value in kwargs.items() if isinstance(value, str)]
+    return ', '.join(values)
+
+
+def _write_report(directory: str, name: str, description: str, profiler: Optional[cProfile.Profile],
+                  wall_time: float, cpu_time: float, peak: Optional[int],
+                  allocations: Optional[list], top: int, other_threads: list) -> str:
+    """写出文本报告和 .prof 原始数据，返回报告路径
+
+    profiler 为 None 表示未能启用函数统计，peak/allocations 为 None 表示未统计内存分配
+    """
+    os.makedirs(directory, exist_ok=True)
+    stem = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_sequence):04d}-{name}")
+    if profiler is not None:
+        profiler.dump_stats(stem + '.prof')
+
+    buffer = io.StringIO()
+    buffer.write(f'调用: {name}({description})\n')
+    buffer.write(f'墙钟时间: {wall_time:.4f} 秒\n')
+    buffer.write(f'CPU 时间: {cpu_time:.4f} 秒\n')
+    buffer.write(f'等待时间（I/O 等）: {max(0.0, wall_time - cpu_time):.4f} 秒\n')
+    if peak is not None:
+        buffer.write(f'内存分配峰值: {peak / 1024:.1f} KiB\n')
+    else:
+        buffer.write('内存分配峰值: 未统计（其他并发调用正在统计内存分配）\n')
+    buffer.write('剖析范围: 函数统计只含调用线程；内存分配为进程级，含同期其他线程的分配\n')
+    buffer.write(f"未剖析的线程: {', '.join(other_threads) if other_threads else '无'}\n\n")
+
+    if profiler is not None:
+        stats = pstats.Stats(profiler, stream=buffer)
+        stats.strip_dirs()
+        buffer.write(f'===== 按自身耗时排序（前 {top}） =====\n')
+        stats.sort_stats('tottime').print_stats(top)
+        buffer.write(f'===== 按累计耗时排序（前 {top}） =====\n')
+        stats.sort_stats('cumulative').print_stats(top)
+    else:
+        buffer.write('===== 函数统计: 未启用（解释器同一时刻只允许一个剖析器） =====\n')
+
+    if allocations is not None:
+        buffer.write(f'===== 分配最多的代码行（前 {top}） =====\n')
+        for stat in allocations[:top]:
+            frame = stat.traceback[0]
+            buffer.write(f'{stat.size_diff / 1024:10.1f} KiB  {stat.count_diff:8d} 次  '
+                         f'{frame.filename}:{frame.lineno}\n')
+
+    with open(stem + '.txt', 'w', encoding='utf-8') as f:
+        f.write(buffer.getvalue())
+    return stem + '.txt'
+
+
+def profiled(name: Optional[str] = None, top: int = DEFAULT_TOP) -> Callable:
+    """方法装饰器：启用剖析时记录本次调用；嵌套的被包装方法只由最外层记录"""
+
+    def decorator(fn: Callable) -> Callable:
+        label = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            directory = report_dir()
+            if directory is None or getattr(_active, 'depth', 0):
+                return fn(*args, **kwargs)
+
+            _active.depth = 1
+            # 其他线程正在统计内存分配时，本次报告不含内存统计
+            track_memory = _tracemalloc_lock.acquire(blocking=False)
+            started_tracing = False
+            try:
+                before = None
+                if track_memory:
+                    started_tracing = not tracemalloc.is_tracing()
+                    if started_tracing:
+                        tracemalloc.start()
+                    tracemalloc.reset_peak()
+                    before = tracemalloc.take_snapshot()
+                else:
+                    metrics.incr('profiling.memory_skipped', target=label)
+                # cProfile 只记录所在线程，各线程的并发调用分别剖析
+                profiler = cProfile.Profile()
+                try:
+                    profiler.enable()
+                except ValueError:
+                    # Python 3.12 起解释器同一时刻只允许一个剖析器，本次报告不含函数统计
+                    profiler = None
+                wall_start, cpu_start = time.perf_counter(), time.thread_time()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+                    wall_time = time.perf_counter() - wall_start
+                    cpu_time = time.thread_time() - cpu_start
+                    peak = allocations = None
+                    if before is not None:
+                        _, peak = tracemalloc.get_traced_memory()
+                        allocations = tracemalloc.take_snapshot().compare_to(before, 'lineno')
+                    current = threading.current_thread()
+                    other_threads = sorted(thread.name for thread in threading.enumerate() if thread is not current)
+                    try:
+                        _write_report(directory, label, _describe_call(args[1:], kwargs), profiler,
+                                      wall_time, cpu_time, peak, allocations, top, other_threads)
+                        metrics.incr('profiling.reports', target=label)
+                    except OSError:
+                        metrics.incr('profiling.write_failed', target=label)
+            finally:
+                if started_tracing:
+                    tracemalloc.stop()
+                if track_memory:
+                    _tracemalloc_lock.release()
+                _active.depth = 0
+
+        return wrapper
+
+    return decorator
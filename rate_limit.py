@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+按上游主机的令牌桶限速
+避免批量任务以网络允许的最快速度请求同一主机而触发限流
+"""
+
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import requests
+
+from metrics import metrics as default_metrics, MetricsRegistry
+
+
+class RateLimitExceeded(requests.RequestException):
+    """非阻塞模式下令牌不足"""
+
+
+class TokenBucket:
+    """令牌桶：以 rate 个/秒的速度补充令牌，最多积累 capacity 个"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError('rate 必须大于 0')
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        if self.capacity < 1:
+            # 令牌永远攒不够一个，阻塞获取将无限等待
+            raise ValueError('capacity 必须不小于 1')
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        """按流逝时间补充令牌（调用方持有锁）"""
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """非阻塞获取令牌"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1, timeout: Optional[float] = None) -> bool:
+        """阻塞获取令牌，超过 timeout 秒仍未获取时返回 False"""
+        if tokens > self.capacity:
+            raise ValueError(f'一次获取的令牌数不能超过容量 {self.capacity}')
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait_time = (tokens - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - now
+                if remaining <= 0:
+                    return False
+                wait_time = min(wait_time, remaining)
+            time.sleep(wait_time)
+
+
+class HostRateLimiter:
+    """按主机限速
+
+    limits 形如 {'youku.com': (2.0, 5)}，表示 youku.com 及其子域名的每个主机
+    每秒 2 个请求、最多突发 5 个。未匹配的主机使用 default（为 None 时不限速）。
+    """
+
+    def __init__(self,
+                 limits: Optional[Dict[str, Tuple[float, float]]] = None,
+                 default: Optional[Tuple[float, float]] = None,
+                 metrics: Optional[MetricsRegistry] = None):
+        self.limits = dict(limits or {})
+        self.default = default
+        self.metrics = metrics or default_metrics
+        self._buckets: Dict[str, Optional[TokenBucket]] = {}
+        self._lock = threading.Lock()
+
+    def _rule_for(self, host: str) -> Optional[Tuple[float, float]]:
+        """查找主机对应的限速规则，最长域名优先"""
+        for pattern in sorted(self.limits, key=len, reverse=True):
+            if host == pattern or host.endswith('.' + pattern):
+                return self.limits[pattern]
+        return self.default
+
+    def bucket_for(self, host: str) -> Optional[TokenBucket]:
+        """获取主机的令牌桶，不限速时返回 None"""
+        with self._lock:
+            if host not in self._buckets:
+                rule = self._rule_for(host)
+                self._buckets[host] = TokenBucket(*rule) if rule else None
+            return self._buckets[host]
+
+    def try_acquire(self, host: str) -> bool:
+        """非阻塞获取主机令牌"""
+        bucket = self.bucket_for(host)
+        if bucket is None or bucket.try_acquire():
+            return True
+        self.metrics.incr('ratelimit.rejected', host=host)
+        return False
+
+    def acquire(self, host: str, timeout: Optional[float] = None) -> bool:
+        """阻塞获取主机令牌，并记录等待时间"""
+        bucket = self.bucket_for(host)
+        if bucket is None:
+            return True
+        start_time = time.monotonic()
+        acquired = bucket.acquire(timeout=timeout)
+        self.metrics.observe('ratelimit.wait', time.monotonic() - start_time, host=host)
+        if not acquired:
+            self.metrics.incr('ratelimit.rejected', host=host)
+        return acquired
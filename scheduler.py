@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+优先级调度器
+在解析器前按优先级类别分配上游并发：各类别按权重公平分享执行槽位，
+批量类别最多占用部分槽位，保证交互请求随时有空闲槽位可用
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+from metrics import metrics
+
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+
+DEFAULT_WEIGHTS = {INTERACTIVE: 8, BATCH: 1}
+
+
+class SchedulerFull(Exception):
+    """类别队列已满"""
+
+
+class PriorityScheduler:
+    """加权公平调度器（步幅调度）
+
+    每个类别维护一个虚拟进度 pass，每派发一个任务增加 1/权重；
+    空闲槽位总是派发给有排队任务且 pass 最小的类别。
+    max_running 限制类别同时执行的任务数，默认批量类别给交互类别预留一个槽位。
+    """
+
+    def __init__(self,
+                 concurrency: int = 8,
+                 weights: Optional[Dict[str, float]] = None,
+                 max_running: Optional[Dict[str, int]] = None,
+                 max_queued: Optional[Dict[str, int]] = None):
+        self.concurrency = concurrency
+        self.weights = dict(weights or DEFAULT_WEIGHTS)
+        self.max_running = dict(max_running) if max_running is not None else (
+            {BATCH: max(1, concurrency - 1)} if BATCH in self.weights else {})
+        self.max_queued = dict(max_queued or {})
+        self._cond = threading.Condition()
+        self._queues: Dict[str, deque] = {name: deque() for name in self.weights}
+        self._running: Dict[str, int] = {name: 0 for name in self.weights}
+        self._pass: Dict[str, float] = {name: 0.0 for name in self.weights}
+        self._virtual_time = 0.0
+        self._shutdown = False
+        # 标记本调度器的工作线程，嵌套调用时直接执行
+        self._local = threading.local()
+        self._workers = [
+            threading.Thread(target=self._worker, name=f'scheduler-{i}', daemon=True)
+            for i in range(concurrency)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, fn: Callable, *args, priority: str = BATCH, **kwargs) -> Future:
+        """按优先级类别提交任务，返回 Future"""
+        if priority not in self.weights:
+            raise ValueError(f'未知的优先级类别: {priority}')
+        future = Future()
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError('调度器已关闭')
+            queue = self._queues[priority]
+            limit = self.max_queued.get(priority)
+            if limit is not None and len(queue) >= limit:
+                metrics.incr('scheduler.rejected', priority=priority)
+                raise SchedulerFull(priority)
+            if not queue and self._running[priority] == 0:
+                # 空闲后重新进入的类别不能用积攒的进度抢占其他类别
+                self._pass[priority] = max(self._pass[priority], self._virtual_time)
+            queue.append((future, fn, args, kwargs, time.monotonic()))
+            self._cond.notify()
+        return future
+
+    def run(self, fn: Callable, *args, priority: str = BATCH, **kwargs) -> Any:
+        """按优先级类别排队执行并等待结果；已在本调度器的工作线程中时直接执行，避免嵌套排队占满槽位而死锁"""
+        if getattr(self._local, 'worker', False):
+            return fn(*args, **kwargs)
+        return self.submit(fn, *args, priority=priority, **kwargs).result()
+
+    def _next_task(self):
+        """选择下一个任务（调用方持有锁），无可派发任务时返回 None"""
+        candidates = [
+            name for name, queue in self._queues.items()
+            if queue and self._running[name] < self.max_running.get(name, self.concurrency)
+        ]
+        if not candidates:
+            return None
+        name = min(candidates, key=lambda n: (self._pass[n], -self.weights[n]))
+        self._virtual_time = self._pass[name]
+        self._pass[name] += 1.0 / self.weights[name]
+        self._running[name] += 1
+        return name, self._queues[name].popleft()
+
+    def _worker(self) -> None:
+        """工作线程"""
+        self._local.worker = True
+        while True:
+            with self._cond:
+                task = self._next_task()
+                while task is None:
+                    if self._shutdown:
+                        return
+                    self._cond.wait()
+                    task = self._next_task()
+            name, (future, fn, args, kwargs, enqueued_at) = task
+            metrics.observe('scheduler.wait', time.monotonic() - enqueued_at, priority=name)
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(fn(*args, **kwargs))
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                with self._cond:
+                    self._running[name] -= 1
+                    # 槽位释放后，可能有因类别上限而等待的任务可以派发
+                    self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """各类别的执行与排队数"""
+        with self._cond:
+            return {
+                name: {'running': self._running[name], 'queued': len(self._queues[name])}
+                for name in self.weights
+            }
+
+    def shutdown(self, wait: bool = False) -> None:
+        """停止接收任务；已排队的任务执行完后工作线程退出"""
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+单飞请求合并
+同一键的并发调用只执行一次，其余调用者等待并共享结果（支持线程与 asyncio 两种调用方式）
+"""
+
+import asyncio
+import operator
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from metrics import metrics as default_metrics, MetricsRegistry
+
+
+class SingleFlight:
+    """单飞请求组"""
+
+    def __init__(self,
+                 copy_result: Optional[Callable[[Any], Any]] = None,
+                 metrics: Optional[MetricsRegistry] = None,
+                 metric_prefix: str = 'singleflight'):
+        # 跟随者拿到的结果副本，避免调用方相互修改同一对象
+        self.copy_result = copy_result
+        self.metrics = metrics or default_metrics
+        # 指标名前缀，不同用途的单飞组分别计数（如 singleflight.saved、linkresolver.singleflight.saved）
+        self.metric_prefix = metric_prefix
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, Future] = {}
+
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        """加入或发起一次调用，返回 (future, 是否为发起者)"""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future, False
+            future = self._inflight[key] = Future()
+            # 已开始的调用不可取消：某个等待者被取消不会波及其他等待者
+            future.set_running_or_notify_cancel()
+            return future, True
+
+    def _finish(self, key: Hashable, future: Future, result: Any = None,
+                error: Optional[BaseException] = None) -> None:
+        """发起者完成调用，唤醒所有等待者"""
+        with self._lock:
+            self._inflight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _shared(self, result: Any) -> Any:
+        """返回给跟随者的结果"""
+        self.metrics.incr(f'{self.metric_prefix}.saved')
+        return self.copy_result(result) if self.copy_result else result
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """线程方式：同键并发调用只执行一次 fn"""
+        future, leader = self._join(key)
+        if not leader:
+            return self._shared(future.result())
+
+        self.metrics.incr(f'{self.metric_prefix}.executed')
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    async def do_async(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """asyncio 方式：fn 为同步函数，发起者在线程池中执行；与 do() 共享同一组在途调用
+
+        发起者协程被取消时 fn 仍执行完毕并把结果交给其他等待者，只有被取消的调用方收到 CancelledError。
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return self._shared(await asyncio.wrap_future(future))
+
+        self.metrics.incr(f'{self.metric_prefix}.executed')
+
+        def run():
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                self._finish(key, future, error=e)
+            else:
+                self._finish(key, future, result)
+
+        asyncio.get_running_loop().run_in_executor(None, run)
+        return await asyncio.wrap_future(future)
+
+    def inflight_count(self) -> int:
+        """当前在途的键数量"""
+        with self._lock:
+            return len(self._inflight)
+
+
+# 进程级共享的单飞组，不同解析器实例之间也能合并同一视频的请求
+shared_flight = SingleFlight(copy_result=operator.methodcaller('copy'))
@@ -11,12 +11,19 @@ import os
 import requests
 from urllib.parse import quote
 import time
+import json
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # 添加父目录到路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from youku_enhanced_parser import YoukuEnhancedParser
 from integrated_parser import IntegratedVideoParser
+from line_monitor import LineHealthStore, LineHealthMonitor
+from batch_cli import parse_one
+from parse_result import json_default
+from scheduler import PriorityScheduler, INTERACTIVE, BATCH
+from structured_log import setup_logging
 
 # 页面配置
 st.set_page_config(
@@ -112,7 +119,7 @@ def main():
         # 功能选择
         tab_option = st.selectbox(
             "选择功能",
-            ["🔍 视频解析", "🧪 线路测试", "📊 解析器信息", "📝 使用说明"]
+            ["🔍 视频解析", "🧪 线路测试", "📈 线路监控", "📊 解析器信息", "📝 使用说明"]
         )
         
         st.markdown("---")
@@ -133,15 +140,30 @@ def main():
         show_video_parse_tab()
     elif tab_option == "🧪 线路测试":
         show_api_test_tab()
+    elif tab_option == "📈 线路监控":
+        show_line_monitor_tab()
     elif tab_option == "📊 解析器信息":
         show_parser_info_tab()
     elif tab_option == "📝 使用说明":
         show_usage_tab()
 
+@st.cache_resource
+def get_integrated_parser():
+    """获取进程内共享的集成解析器，创建时在后台预热连接；
+    单个解析按交互类别、批量解析按批量类别调度，批量任务运行时单个解析仍有空闲槽位；
+    首次创建时启用结构化日志（缓存资源只创建一次，页面重跑不会重复安装）"""
+    setup_logging()
+    return IntegratedVideoParser(warm_up=True, scheduler=PriorityScheduler(concurrency=8))
+
 def show_video_parse_tab():
     """视频解析页面"""
     st.markdown("## 🔍 视频解析")
     
+    mode = st.radio("解析模式", ["单个链接", "批量解析"], horizontal=True)
+    if mode == "批量解析":
+        show_batch_parse_section()
+        return
+    
     # 视频链接输入
     col1, col2 = st.columns([3, 1])
     
@@ -159,11 +181,11 @@ def show_video_parse_tab():
     if parse_button and video_url:
         with st.spinner("正在解析视频..."):
             try:
-                # 初始化解析器
-                parser = IntegratedVideoParser()
+                # 获取解析器（连接已预热）
+                parser = get_integrated_parser()
                 
                 # 解析视频
-                result = parser.parse_video(video_url)
+                result = parser.parse_video(video_url, priority=INTERACTIVE)
                 
                 if result.get('success'):
                     st.markdown("""
@@ -226,6 +248,103 @@ def show_video_parse_tab():
                 </div>
                 """, unsafe_allow_html=True)
 
+def dedupe_urls(parser, urls):
+    """按规范键（平台 + 视频ID）去重，保持输入顺序"""
+    seen = set()
+    unique = []
+    for url in urls:
+        key = parser.canonical_key(url)
+        if key not in seen:
+            seen.add(key)
+            unique.append(url)
+    return unique
+
+def batch_result_row(index, result):
+    """批量结果表格中的一行"""
+    return {
+        '序号': index,
+        '状态': '✅ 成功' if result.get('success') else '❌ 失败',
+        '平台': result.get('platform', ''),
+        '标题': result.get('title', ''),
+        '时长': result.get('duration', ''),
+        '视频ID': result.get('vid', ''),
+        '推荐解析链接': result.get('best_parse_url') or '',
+        '错误信息': result.get('error', ''),
+        '耗时(秒)': result.get('elapsed'),
+        '链接': result.get('input', '')
+    }
+
+def show_batch_parse_section():
+    """批量解析：多个链接并发解析，结果随完成逐行填入表格"""
+    text = st.text_area(
+        "每行一个视频链接:",
+        height=200,
+        placeholder="https://v.youku.com/v_show/id_XXXXX.html\nhttps://v.qq.com/x/cover/xxx/yyy.html"
+    )
+    uploaded = st.file_uploader("或上传链接文件（每行一个链接）", type=["txt", "csv"])
+    
+    lines = text.splitlines()
+    if uploaded is not None:
+        lines += uploaded.getvalue().decode('utf-8', errors='ignore').splitlines()
+    urls = [line.strip() for line in lines if line.strip() and not line.strip().startswith('#')]
+    
+    parser = get_integrated_parser()
+    unique_urls = dedupe_urls(parser, urls)
+    if urls:
+        st.caption(f"共 {len(urls)} 个链接，按视频去重后 {len(unique_urls)} 个")
+    
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        parallelism = st.slider("并发数", min_value=1, max_value=32, value=8)
+    with col2:
+        st.markdown("<br>", unsafe_allow_html=True)
+        start_button = st.button("🚀 批量解析", type="primary", disabled=not unique_urls)
+    
+    if start_button:
+        progress_bar = st.progress(0.0, text="正在解析...")
+        table = st.empty()
+        results = [None] * len(unique_urls)
+        rows = []
+        done = 0
+        with ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix='streamlit-batch') as executor:
+            futures = {executor.submit(parse_one, parser, url, BATCH): index for index, url in enumerate(unique_urls)}
+            for future in as_completed(futures):
+                index = futures[future]
+                results[index] = future.result()
+                rows.append(batch_result_row(index + 1, results[index]))
+                done += 1
+                progress_bar.progress(done / len(unique_urls), text=f"已完成 {done}/{len(unique_urls)}")
+                table.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+        progress_bar.progress(1.0, text=f"解析完成，共 {len(unique_urls)} 个")
+        table.empty()
+        # 保存在会话中，点击下载按钮触发页面重跑后结果仍在
+        st.session_state.batch_results = results
+    
+    results = st.session_state.get('batch_results')
+    if not results:
+        return
+    
+    frame = pd.DataFrame([batch_result_row(index, result) for index, result in enumerate(results, 1)])
+    success_count = sum(1 for result in results if result.get('success'))
+    st.markdown(f"### 📋 批量结果（成功 {success_count} / {len(results)}）")
+    st.dataframe(frame, use_container_width=True, hide_index=True)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            "⬇️ 下载 CSV",
+            frame.to_csv(index=False).encode('utf-8-sig'),
+            file_name="parse_results.csv",
+            mime="text/csv"
+        )
+    with col2:
+        st.download_button(
+            "⬇️ 下载 JSONL",
+            "".join(json.dumps(result, ensure_ascii=False, default=json_default) + "\n" for result in results),
+            file_name="parse_results.jsonl",
+            mime="application/x-ndjson"
+        )
+
 def show_api_test_tab():
     """线路测试页面"""
     st.markdown("## 🧪 解析线路测试")
@@ -241,7 +360,7 @@ def show_api_test_tab():
         if test_url:
             with st.spinner("正在测试所有解析线路..."):
                 try:
-                    parser = YoukuEnhancedParser()
+                    parser = get_integrated_parser().youku_parser
                     
                     if parser.is_youku_url(test_url):
                         results = parser.test_all_apis(test_url)
@@ -282,13 +401,75 @@ def show_api_test_tab():
         else:
             st.warning("⚠️ 请输入测试URL")
 
+@st.cache_resource
+def get_line_monitor():
+    """获取进程内共享的线路监控器"""
+    store = LineHealthStore(os.environ.get('LINE_HEALTH_STORE', 'line_health.bin'))
+    return LineHealthMonitor(store)
+
+def show_line_monitor_tab():
+    """线路监控页面"""
+    st.markdown("## 📈 线路监控")
+    
+    monitor = get_line_monitor()
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        if monitor.is_running():
+            st.success("✅ 后台监控运行中")
+            if st.button("⏹️ 停止后台监控"):
+                monitor.stop(timeout=0)
+        else:
+            st.info("后台监控未启动")
+            if st.button("▶️ 启动后台监控", type="primary"):
+                monitor.start()
+    
+    with col2:
+        if st.button("🧪 立即探测一轮"):
+            with st.spinner("正在探测所有线路..."):
+                monitor.run_once()
+    
+    window_hours = st.selectbox(
+        "时间窗口",
+        [1, 6, 24, 72],
+        index=2,
+        format_func=lambda h: f"最近 {h} 小时"
+    )
+    window = window_hours * 3600
+    
+    summary = monitor.store.summary(window=window)
+    if not summary:
+        st.info("暂无监控数据，请启动后台监控或立即探测一轮")
+        return
+    
+    st.markdown("### 📊 线路可用率")
+    st.dataframe(
+        pd.DataFrame([
+            {
+                '线路': entry['line'],
+                '样本数': entry['samples'],
+                '可用率(%)': round(entry['availability'] * 100, 1),
+                'p50耗时(秒)': round(entry['p50'], 2) if entry['p50'] is not None else None,
+                'p95耗时(秒)': round(entry['p95'], 2) if entry['p95'] is not None else None
+            }
+            for entry in summary
+        ]),
+        use_container_width=True
+    )
+    
+    st.markdown("### 📉 可用率趋势")
+    series = monitor.store.timeseries(window=window, bucket=max(300, window / 48))
+    chart_data = pd.DataFrame(series)
+    chart_data['time'] = pd.to_datetime(chart_data['time'], unit='s')
+    st.line_chart(chart_data.pivot(index='time', columns='line', values='availability'))
+
 def show_parser_info_tab():
     """解析器信息页面"""
     st.markdown("## 📊 解析器信息")
     
     try:
-        parser = YoukuEnhancedParser()
-        integrated_parser = IntegratedVideoParser()
+        integrated_parser = get_integrated_parser()
+        parser = integrated_parser.youku_parser
         
         # 基本信息
         st.markdown("### 🎯 优酷专线解析器")
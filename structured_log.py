@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+结构化日志
+解析过程中的事件以结构化字段（链接键、平台、阶段、耗时、结果）记录，经有界队列交给后台线程输出为 JSON 行；
+请求线程只做一次入队，队列满时丢弃并计数，从不阻塞；大量出现的成功事件按比例采样
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from typing import Any, Optional, TextIO
+
+from metrics import metrics
+
+# 所有解析器日志的根记录器
+ROOT_LOGGER = 'video2'
+
+# 成功事件的默认采样比例，可通过环境变量 PARSER_LOG_SAMPLE 调整
+DEFAULT_SAMPLE_RATE = float(os.environ.get('PARSER_LOG_SAMPLE', '0.1'))
+
+_sample_rate = DEFAULT_SAMPLE_RATE
+_listener: Optional[logging.handlers.QueueListener] = None
+_setup_lock = threading.Lock()
+_atexit_registered = False
+
+# 未调用 setup_logging 时日志直接丢弃，不经 logging.lastResort 同步写到标准错误
+logging.getLogger(ROOT_LOGGER).addHandler(logging.NullHandler())
+
+
+def get_logger(name: str) -> logging.Logger:
+    """获取解析器模块的记录器"""
+    return logging.getLogger(f'{ROOT_LOGGER}.{name}')
+
+
+def log_event(logger: logging.Logger, event: str, level: int = logging.INFO,
+              sampled: bool = False, **fields: Any) -> None:
+    """记录一条结构化事件；sampled=True 的事件按采样比例记录"""
+    if not logger.isEnabledFor(level):
+        return
+    if sampled and _sample_rate < 1.0 and random.random() >= _sample_rate:
+        return
+    if sampled and _sample_rate < 1.0:
+        fields['sample_rate'] = _sample_rate
+    logger.log(level, event, extra={'fields': fields})
+
+
+class JsonFormatter(logging.Formatter):
+    """把日志记录格式化为单行 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'event': record.getMessage()
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """入队不阻塞的队列处理器：队列满时丢弃记录并计数"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 格式化推迟到后台线程；结构化字段不会在入队后被修改
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.incr('log.dropped')
+
+
+class _Listener(logging.handlers.QueueListener):
+    """后台输出线程；停止时等待队列腾出位置放入结束标记，保证剩余日志全部写出"""
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
+
+
+def setup_logging(stream: Optional[TextIO] = None,
+                  level: int = logging.INFO,
+                  sample_rate: Optional[float] = None,
+                  queue_size: int = 10000) -> None:
+    """为解析器日志安装队列处理器和后台输出线程（由命令行、服务等入口调用，重复调用无效果）"""
+    global _listener, _sample_rate, _atexit_registered
+    with _setup_lock:
+        if sample_rate is not None:
+            _sample_rate = sample_rate
+        if _listener is not None:
+            return
+        log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(JsonFormatter())
+        _listener = _Listener(log_queue, output, respect_handler_level=False)
+        _listener.start()
+        logger = logging.getLogger(ROOT_LOGGER)
+        logger.addHandler(NonBlockingQueueHandler(log_queue))
+        logger.setLevel(level)
+        # 已由本模块输出，不再传给根记录器
+        logger.propagate = False
+        if not _atexit_registered:
+            atexit.register(shutdown_logging)
+            _atexit_registered = True
+
+
+def shutdown_logging() -> None:
+    """输出队列中剩余的日志并停止后台线程"""
+    global _listener
+    with _setup_lock:
+        if _listener is None:
+            return
+        listener, _listener = _listener, None
+    logger = logging.getLogger(ROOT_LOGGER)
+    for handler in list(logger.handlers):
+        if isinstance(handler, NonBlockingQueueHandler):
+            logger.removeHandler(handler)
+    logger.propagate = True
+    listener.stop()
+
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+批量解析命令行离线测试
+覆盖按完成顺序与按输入顺序的流式输出；解析器由替身代替，不访问网络
+"""
+
+import io
+import json
+import time
+
+from batch_cli import run_batch
+from scheduler import BATCH
+
+
+class DelayedParser:
+    """替身解析器：按链接指定的耗时返回结果"""
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.priorities = []
+
+    def parse_video(self, url, priority=None):
+        self.priorities.append(priority)
+        time.sleep(self.delays[url])
+        return {'success': not url.endswith('bad'), 'original_url': url}
+
+
+def test_unordered_output_follows_completion():
+    # 输入条数小于窗口，全部结果都在收尾阶段输出，慢的链接也应最后输出
+    delays = {'slow': 0.3, 'fast1': 0.01, 'fast2': 0.02, 'bad': 0.0}
+    parser = DelayedParser(delays)
+    out = io.StringIO()
+    stats = run_batch(parser, list(delays), out, parallelism=4)
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert lines[-1]['input'] == 'slow'
+    assert stats['total'] == 4 and stats['success'] == 3 and stats['failed'] == 1
+    assert set(parser.priorities) == {BATCH}
+
+
+def test_ordered_output_follows_input():
+    delays = {'slow': 0.1, 'fast1': 0.0, 'fast2': 0.0}
+    out = io.StringIO()
+    run_batch(DelayedParser(delays), list(delays), out, parallelism=2, ordered=True)
+    assert [json.loads(line)['input'] for line in out.getvalue().splitlines()] == list(delays)
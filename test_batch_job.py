@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+可断点续跑批量任务离线测试
+覆盖中断后续跑、按规范键去重、追加导入、临时失败重试和任务库中的进度统计；解析器由替身代替，不访问网络
+"""
+
+import logging
+import sqlite3
+import threading
+
+import pytest
+
+from batch_job import BatchJob, DONE, FAILED
+from integrated_parser import IntegratedVideoParser
+from line_router import LineRouter
+from negative_cache import NegativeCache, TRANSIENT, UNSUPPORTED
+from singleflight import SingleFlight
+
+URLS = [f'https://www.bilibili.com/video/BV1GJ411x{i:03d}' for i in range(10)]
+
+
+class Crash(Exception):
+    """模拟进程在运行中途退出"""
+
+
+class FakeParser:
+    """替身解析器：规范键由真实解析器计算，结果按 outcomes 中的列表依次返回（默认成功）"""
+
+    def __init__(self, outcomes=None):
+        self.outcomes = {url: list(results) for url, results in (outcomes or {}).items()}
+        self.calls = []
+        self._lock = threading.Lock()
+        self._keys = IntegratedVideoParser(singleflight=SingleFlight(), negative_cache=NegativeCache(),
+                                           router=LineRouter())
+
+    def canonical_key(self, url):
+        return self._keys.canonical_key(url)
+
+    def parse_video(self, url, priority=None):
+        with self._lock:
+            self.calls.append(url)
+            results = self.outcomes.get(url)
+            return dict(results.pop(0)) if results else {'success': True, 'original_url': url}
+
+
+@pytest.fixture
+def job_path(tmp_path):
+    return str(tmp_path / 'job.db')
+
+
+def statuses(job):
+    return {url: (status, attempts) for url, status, attempts in
+            job.db.execute('SELECT url, status, attempts FROM items')}
+
+
+def test_resume_after_crash(job_path):
+    first = FakeParser()
+    job = BatchJob(job_path, parser=first, parallelism=1, commit_interval=0)
+    assert job.add_urls(URLS) == 10
+
+    def crash(stats):
+        if stats['done'] >= 4:
+            raise Crash()
+
+    with pytest.raises(Crash):
+        job.run(on_progress=crash)
+    job.close()
+
+    second = FakeParser()
+    resumed = BatchJob(job_path, parser=second, parallelism=2, commit_interval=0)
+    done_before = {url for url, (status, _) in statuses(resumed).items() if status == DONE}
+    assert len(done_before) >= 4
+    # 续跑：输入不再导入，已完成的条目不再解析
+    assert resumed.add_urls(URLS) == 0
+    stats = resumed.run()
+    assert stats['done'] == 10 and stats['pending'] == 0
+    assert sorted(second.calls) == sorted(set(URLS) - done_before)
+    resumed.close()
+
+
+def test_dedupe_by_canonical_key(job_path):
+    parser = FakeParser()
+    job = BatchJob(job_path, parser=parser, commit_interval=0)
+    urls = [URLS[0], 'https://m.bilibili.com/video/BV1GJ411x000', URLS[1] + '?p=1', URLS[1]]
+    assert job.add_urls(urls) == 2
+    job.run()
+    assert len(parser.calls) == 2
+    job.close()
+
+
+def test_completed_input_is_skipped_unless_appending(job_path, caplog):
+    job = BatchJob(job_path, parser=FakeParser(), commit_interval=0)
+    assert job.add_urls(URLS[:3]) == 3
+    with caplog.at_level(logging.WARNING, logger='video2'):
+        assert job.add_urls(URLS[3:5]) == 0
+    assert 'batch_job.input_skipped' in caplog.text
+    assert job.add_urls(URLS[2:5], append=True) == 2
+    assert job.progress()['pending'] == 5
+    # 追加的条目排在原有条目之后
+    assert [url for (url,) in job.db.execute('SELECT url FROM items ORDER BY seq')] == URLS[:5]
+    job.close()
+
+
+def test_transient_failures_are_retried(job_path):
+    transient = {'success': False, 'error': '请求超时', 'error_type': TRANSIENT}
+    parser = FakeParser({
+        URLS[0]: [transient, {'success': True}],
+        URLS[1]: [{'success': False, 'error': '不支持的视频平台', 'error_type': UNSUPPORTED}],
+        URLS[2]: [transient] * 5,
+        URLS[3]: [{'success': False, 'error': '解析异常: 连接被重置'}, {'success': True}],
+    })
+    job = BatchJob(job_path, parser=parser, max_attempts=3, retry_delay=0, commit_interval=0)
+    job.add_urls(URLS[:4])
+    stats = job.run()
+    assert statuses(job) == {
+        URLS[0]: (DONE, 2),
+        URLS[1]: (FAILED, 1),
+        URLS[2]: (FAILED, 3),
+        URLS[3]: (DONE, 2),
+    }
+    assert stats['done'] == 2 and stats['failed'] == 2 and stats['retry'] == 0
+    job.close()
+
+
+def test_progress_visible_to_other_connections(job_path):
+    job = BatchJob(job_path, parser=FakeParser(), parallelism=2, commit_interval=0)
+    assert job.db.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    job.add_urls(URLS)
+    observed = []
+
+    def check(stats):
+        # 另一个连接（如 status 命令）读到的计数与运行中的统计一致
+        reader = sqlite3.connect(job_path)
+        counts = dict(reader.execute('SELECT status, COUNT(*) FROM items GROUP BY status').fetchall())
+        reader.close()
+        observed.append((stats['done'], counts.get(DONE, 0), stats['total']))
+        assert stats['rate'] >= 0 and 'eta' in stats
+
+    job.run(on_progress=check)
+    assert observed and all(done == seen and total == 10 for done, seen, total in observed)
+    job.close()
+    status = BatchJob(job_path, parser=FakeParser())
+    assert status.progress()['done'] == 10
+    status.close()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+共享缓存后端离线测试
+覆盖 RESP 客户端与本地替身服务的读写、格式错误回复的处理、路由表接入共享后端的约束，
+以及解析器对共享缓存中损坏元数据的处理
+"""
+
+import io
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from cache_backend import CacheError, LocalRedisServer, MemoryBackend, RedisBackend, read_reply
+from integrated_parser import IntegratedVideoParser, _metadata_key
+from line_router import LineRouter, shared_router
+from negative_cache import NegativeCache
+from singleflight import SingleFlight
+
+BILIBILI_URL = 'https://www.bilibili.com/video/BV1GJ411x7h7'
+
+
+@pytest.fixture
+def redis():
+    server = LocalRedisServer().start()
+    host, port = server.address
+    backend = RedisBackend(host, port, db=1, password='secret')
+    yield backend
+    backend.close()
+    server.stop()
+
+
+def test_resp_round_trip(redis):
+    assert redis.ping()
+    assert redis.get('missing') is None
+    redis.set('a', '中文')
+    redis.set_many({'b': '2', 'c': '3'}, ttl=60)
+    assert redis.get_many(['a', 'b', 'missing', 'c']) == ['中文', '2', None, '3']
+    redis.delete('a', 'b')
+    assert redis.get_many(['a', 'b', 'c']) == [None, None, '3']
+
+
+def test_resp_ttl_expires(redis):
+    redis.set('short', 'x', ttl=0.001)
+    time.sleep(0.05)
+    assert redis.get('short') is None
+
+
+@pytest.mark.parametrize('reply', [b':abc\r\n', b'$x\r\n', b'*?\r\n', b'%1\r\n', b':1'])
+def test_malformed_reply_raises_cache_error(reply):
+    with pytest.raises(CacheError):
+        read_reply(io.BytesIO(reply))
+
+
+def test_malformed_reply_closes_connection():
+    listener = socket.create_server(('127.0.0.1', 0))
+    accepted = []
+
+    def serve():
+        connection, _ = listener.accept()
+        accepted.append(connection)
+        connection.recv(1024)
+        connection.sendall(b':abc\r\n')
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    backend = RedisBackend(*listener.getsockname())
+    try:
+        with pytest.raises(CacheError):
+            backend.ping()
+        # 读了一半回复的连接不能回到连接池
+        assert backend._pool.empty()
+    finally:
+        thread.join(5)
+        for connection in accepted:
+            connection.close()
+        listener.close()
+
+
+def test_attach_backend_refuses_second_backend():
+    router = LineRouter()
+    first, second = MemoryBackend(), MemoryBackend()
+    router.attach_backend(first, sync_interval=60)
+    try:
+        router.attach_backend(first, sync_interval=60)
+        with pytest.raises(RuntimeError):
+            router.attach_backend(second, sync_interval=60)
+        router.detach_backend()
+        router.attach_backend(second, sync_interval=60)
+        assert router._backend is second
+    finally:
+        router.detach_backend()
+
+
+def make_parser(backend, **kwargs):
+    """接入共享后端、上游由替身函数应答的解析器"""
+    parser = IntegratedVideoParser(singleflight=SingleFlight(), negative_cache=NegativeCache(),
+                                   cache_backend=backend, **kwargs)
+    parser.upstream_calls = 0
+
+    def upstream(url):
+        parser.upstream_calls += 1
+        return {'success': True, 'platform': '哔哩哔哩', 'original_url': url, 'title': '替身视频'}
+
+    parser._parse_video = upstream
+    return parser
+
+
+def test_parsers_with_different_backends_use_own_routers():
+    first = make_parser(MemoryBackend())
+    second = make_parser(MemoryBackend())
+    try:
+        assert first.router is not second.router
+        assert shared_router not in (first.router, second.router)
+        assert shared_router._backend is None
+        assert first.original_parser.router is first.router
+        assert first.youku_parser.router is first.router
+    finally:
+        first.router.detach_backend()
+        second.router.detach_backend()
+
+
+def test_parser_with_explicit_router_attaches_it():
+    router = LineRouter()
+    backend = MemoryBackend()
+    parser = make_parser(backend, router=router)
+    try:
+        assert parser.router is router
+        assert router._backend is backend
+    finally:
+        router.detach_backend()
+
+
+@pytest.mark.parametrize('raw', ['{"title": "截断', '["替身视频"]', '"替身视频"', 'null'])
+def test_corrupt_cached_metadata_falls_through_to_upstream(raw):
+    backend = MemoryBackend()
+    parser = make_parser(backend)
+    try:
+        key = _metadata_key(parser.canonical_key(BILIBILI_URL))
+        backend.set(key, raw)
+        result = parser.parse_video(BILIBILI_URL)
+        assert result['success'] is True
+        assert parser.upstream_calls == 1
+        # 损坏的内容被删除，随后写入本次上游结果的元数据
+        assert json.loads(backend.get(key))['title'] == '替身视频'
+        assert parser.parse_video(BILIBILI_URL)['parse_method'] == 'cache'
+        assert parser.upstream_calls == 1
+    finally:
+        parser.router.detach_backend()
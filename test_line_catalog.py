@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+线路目录离线测试
+覆盖文件修改后的热加载，以及文件损坏或结构不符时继续使用旧目录
+"""
+
+import json
+import os
+
+import pytest
+
+from line_catalog import CatalogHolder
+
+
+def write_catalog(path, data, mtime):
+    """写入目录文件并设置修改时间（避免依赖文件系统的时间精度）"""
+    path.write_text(data if isinstance(data, str) else json.dumps(data), encoding='utf-8')
+    os.utime(path, (mtime, mtime))
+
+
+def catalog_data(host):
+    return {'youku': [{'name': f'{host}-2', 'url': f'https://{host}/b?url={{}}', 'priority': 2},
+                      {'name': f'{host}-1', 'url': f'https://{host}/a?url={{}}', 'priority': 1}]}
+
+
+@pytest.fixture
+def catalog_path(tmp_path):
+    path = tmp_path / 'lines.json'
+    write_catalog(path, catalog_data('old.example.com'), 1_000_000)
+    return path
+
+
+def test_hot_reload_on_mtime_change(catalog_path):
+    holder = CatalogHolder(str(catalog_path), check_interval=0)
+    first = holder.get()
+    assert [line.name for line in first.group('youku')] == ['old.example.com-1', 'old.example.com-2']
+    # 修改时间不变时不重新加载
+    assert holder.get() is first
+
+    write_catalog(catalog_path, catalog_data('new.example.com'), 1_000_100)
+    second = holder.get()
+    assert second is not first
+    assert second.group('youku')[0].format('x') == 'https://new.example.com/a?url=x'
+    # 持有旧快照的请求不受影响
+    assert first.group('youku')[0].format('x') == 'https://old.example.com/a?url=x'
+
+
+def test_reload_waits_for_check_interval(catalog_path):
+    holder = CatalogHolder(str(catalog_path), check_interval=3600)
+    first = holder.get()
+    write_catalog(catalog_path, catalog_data('new.example.com'), 1_000_100)
+    assert holder.get() is first
+    assert holder.reload().group('youku')[0].name == 'new.example.com-1'
+
+
+@pytest.mark.parametrize('content', [
+    '{"youku": [',
+    '{"youku": [{"name": "bad", "url": "https://bad.example.com/"}]}',
+    '{"youku": [{"url": "https://bad.example.com/?url={}"}]}',
+    '{"youku": 5}',
+    '{"youku": ["https://bad.example.com/?url={}"]}',
+    '["youku"]',
+])
+def test_malformed_file_keeps_previous_catalog(catalog_path, content):
+    holder = CatalogHolder(str(catalog_path), check_interval=0)
+    first = holder.get()
+    write_catalog(catalog_path, content, 1_000_100)
+    assert holder.get() is first
+    # 修复后再次变化的文件正常加载
+    write_catalog(catalog_path, catalog_data('fixed.example.com'), 1_000_200)
+    assert holder.get().group('youku')[0].name == 'fixed.example.com-1'
+
+
+def test_missing_file_keeps_previous_catalog(catalog_path):
+    holder = CatalogHolder(str(catalog_path), check_interval=0)
+    first = holder.get()
+    catalog_path.unlink()
+    assert holder.get() is first
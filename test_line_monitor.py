@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+线路健康监控离线测试
+覆盖时间序列存储的有序写入、时间窗口查询、按需压缩，以及探测轮次的串行执行
+"""
+
+import os
+import threading
+import time
+
+from enhanced_parser import EnhancedVIPParser
+from line_monitor import LineHealthMonitor, LineHealthStore
+from line_router import ANY_PLATFORM, LineRouter
+from youku_enhanced_parser import YoukuEnhancedParser
+
+
+def test_out_of_order_append_keeps_time_order(tmp_path):
+    store = LineHealthStore(str(tmp_path / 'health.bin'))
+    store.append_many([(100.0, 'youku:a', True, 0.1), (300.0, 'youku:a', True, 0.3)])
+    # 另一轮探测较早开始、较晚写入
+    store.append_many([(250.0, 'youku:b', False, None), (200.0, 'youku:b', True, 0.2)])
+    assert [record[0] for record in store.query(0)] == [100.0, 200.0, 250.0, 300.0]
+    assert [record[1] for record in store.query(150, 260)] == ['youku:b', 'youku:b']
+
+
+def test_query_window(tmp_path):
+    store = LineHealthStore(str(tmp_path / 'health.bin'))
+    assert list(store.query(0)) == []
+    for ts in range(10):
+        store.append('generic:x', ts % 2 == 0, 0.5, ts=float(ts))
+    assert [record[0] for record in store.query(3, 6)] == [3.0, 4.0, 5.0, 6.0]
+    assert list(store.query(3, 6))[0] == (3.0, 'generic:x', False, 0.5)
+    assert [record[0] for record in store.query(8)] == [8.0, 9.0]
+
+
+def test_compact_only_when_expired(tmp_path):
+    path = str(tmp_path / 'health.bin')
+    store = LineHealthStore(path)
+    store.append_many([(float(ts), 'youku:a', True, 0.1) for ts in range(100, 110)])
+    inode = os.stat(path).st_ino
+    assert store.compact(retention=50, now=140) is False
+    assert os.stat(path).st_ino == inode
+
+    assert store.compact(retention=50, now=155) is True
+    assert [record[0] for record in store.query(0)] == [105.0, 106.0, 107.0, 108.0, 109.0]
+    assert store.compact(retention=50, now=155) is False
+
+
+def test_concurrent_rounds_are_serialised(tmp_path):
+    store = LineHealthStore(str(tmp_path / 'health.bin'))
+    youku = YoukuEnhancedParser(router=LineRouter(exploration_rate=0.0))
+    monitor = LineHealthMonitor(store, youku_parser=youku,
+                                original_parser=EnhancedVIPParser(router=LineRouter(exploration_rate=0.0)))
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def fake_probe(target):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        ts = time.time()
+        time.sleep(0.01)
+        with lock:
+            active[0] -= 1
+        return ts, target[0], True, 0.01
+
+    monitor.max_concurrency = 1
+    monitor._probe = fake_probe
+    threads = [threading.Thread(target=monitor.run_once) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert peak[0] == 1
+    timestamps = [record[0] for record in store.query(0)]
+    assert len(timestamps) == 3 * len(monitor.targets())
+    assert timestamps == sorted(timestamps)
+
+
+def test_monitor_generic_results_rank_every_platform(tmp_path):
+    router = LineRouter(exploration_rate=0.0)
+    original = EnhancedVIPParser(router=router)
+    monitor = LineHealthMonitor(LineHealthStore(str(tmp_path / 'health.bin')),
+                                youku_parser=YoukuEnhancedParser(router=router), original_parser=original)
+    generic = list(original.parse_apis)
+    failing = {f'generic:{line.name}' for line in generic[:2]}
+    monitor._probe = lambda target: (time.time(), target[0], target[0] not in failing, 0.1)
+    monitor.run_once()
+
+    recorded = {entry['line'] for entry in router.snapshot() if entry['platform'] == ANY_PLATFORM}
+    assert recorded == {line.name for line in generic}
+    for platform_key in ('v.qq.com', 'iqiyi.com', 'bilibili.com'):
+        ranked = original._ranked_lines(platform_key)
+        assert [line.name for line in ranked[-2:]] == [line.name for line in generic[:2]]
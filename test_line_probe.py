@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+线路探测离线测试
+覆盖 HEAD 媒体类型直接判定、HEAD 不被支持时回退到 Range GET、206 视同 200、HTML 关键字扫描和请求异常
+"""
+
+import pytest
+import requests
+
+from line_probe import probe_line
+
+LINE_URL = 'https://jx.example.com/?url=https://v.youku.com/v_show/id_X1.html'
+
+
+class FakeResponse:
+    """替身响应：记录读取的字节数与是否已关闭"""
+
+    def __init__(self, status_code=200, content=b'', content_type='text/html'):
+        self.status_code = status_code
+        self.content = content
+        self.headers = {'Content-Type': content_type}
+        self.read = 0
+        self.closed = False
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            chunk = self.content[start:start + chunk_size]
+            self.read += len(chunk)
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    """替身会话：head / get 依次返回给定的响应或抛出给定的异常，并记录请求"""
+
+    def __init__(self, head=None, get=None):
+        self.head_outcome = head
+        self.get_outcome = get
+        self.calls = []
+
+    def _respond(self, method, outcome, url, kwargs):
+        self.calls.append((method, url, kwargs))
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def head(self, url, **kwargs):
+        return self._respond('HEAD', self.head_outcome, url, kwargs)
+
+    def get(self, url, **kwargs):
+        return self._respond('GET', self.get_outcome, url, kwargs)
+
+
+@pytest.mark.parametrize('content_type', ['video/mp4', 'audio/mpeg', 'application/vnd.apple.mpegURL'])
+def test_head_media_type_shortcut(content_type):
+    session = FakeSession(head=FakeResponse(200, content_type=content_type))
+    result = probe_line(session, LINE_URL, {})
+    assert result['available'] is True and result['method'] == 'HEAD'
+    assert [call[0] for call in session.calls] == ['HEAD']
+
+
+def test_head_server_error_skips_get():
+    session = FakeSession(head=FakeResponse(503))
+    result = probe_line(session, LINE_URL, {})
+    assert result == {'available': False, 'status_code': 503,
+                      'response_time': result['response_time'], 'method': 'HEAD'}
+    assert len(session.calls) == 1
+
+
+@pytest.mark.parametrize('head_status', [200, 403, 404, 405, 501])
+def test_ranged_get_fallback(head_status):
+    page = FakeResponse(206, b'<html><body><IFRAME src="/p.html"></iframe></body></html>')
+    session = FakeSession(head=FakeResponse(head_status), get=page)
+    result = probe_line(session, LINE_URL, {'User-Agent': 'test'}, max_bytes=1024)
+    assert result['available'] is True and result['method'] == 'GET'
+    # 206 部分内容视同 200
+    assert result['status_code'] == 200
+    method, url, kwargs = session.calls[1]
+    assert method == 'GET' and kwargs['stream'] is True
+    assert kwargs['headers'] == {'User-Agent': 'test', 'Range': 'bytes=0-1023'}
+    assert page.closed
+
+
+def test_keyword_scan_reads_only_prefix():
+    # 关键字在前 max_bytes 字节之后，不应被读到
+    page = FakeResponse(200, b'<html>' + b' ' * 10000 + b'<video></video>')
+    session = FakeSession(head=FakeResponse(200), get=page)
+    result = probe_line(session, LINE_URL, {}, max_bytes=4096)
+    assert result['available'] is False and result['status_code'] == 200
+    assert page.read == 4096
+    assert page.closed
+
+
+def test_keyword_scan_without_player():
+    session = FakeSession(head=FakeResponse(200), get=FakeResponse(200, b'<html>404 not here</html>'))
+    assert probe_line(session, LINE_URL, {})['available'] is False
+
+
+def test_get_error_status_not_scanned():
+    page = FakeResponse(500, b'<video>')
+    session = FakeSession(head=FakeResponse(405), get=page)
+    result = probe_line(session, LINE_URL, {})
+    assert result['available'] is False and result['status_code'] == 500
+    assert page.read == 0
+
+
+def test_full_mode_downloads_whole_page():
+    session = FakeSession(get=FakeResponse(200, b'<html>' + b' ' * 10000 + b'<video></video>'))
+    result = probe_line(session, LINE_URL, {}, mode='full', max_bytes=4096)
+    assert result['available'] is True
+    assert [call[0] for call in session.calls] == ['GET']
+
+
+@pytest.mark.parametrize('stage, error', [
+    ('head', requests.Timeout('read timed out')),
+    ('head', requests.ConnectionError('connection refused')),
+    ('get', requests.Timeout('read timed out')),
+    ('get', requests.ConnectionError('connection reset')),
+])
+def test_request_errors_mark_line_unavailable(stage, error):
+    outcomes = {'head': FakeResponse(200), 'get': FakeResponse(200, b'<video>')}
+    outcomes[stage] = error
+    result = probe_line(FakeSession(**outcomes), LINE_URL, {})
+    assert result == {'available': False, 'error': str(error)}
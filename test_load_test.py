@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+本地压测工具离线测试
+覆盖独立进程中的替身服务与饱和拐点的判定
+"""
+
+import requests
+
+from load_test import StandInProcess, find_knee
+
+
+def _step(concurrency, throughput, error_rate=0.0):
+    return {'concurrency': concurrency, 'throughput': throughput, 'error_rate': error_rate}
+
+
+def test_stand_in_runs_in_child_process():
+    server = StandInProcess(latency=0).start()
+    process = server._process
+    try:
+        host, port = server.address
+        response = requests.get(f'http://{host}:{port}/line.example.com/x', timeout=5)
+        assert response.status_code == 200
+        assert process.pid is not None and process.is_alive()
+    finally:
+        server.stop()
+    assert not process.is_alive()
+
+
+def test_knee_at_efficiency_drop():
+    knee = find_knee([_step(1, 10), _step(2, 20), _step(4, 39), _step(8, 45)])
+    assert knee['saturated'] is True and knee['concurrency'] == 4
+
+
+def test_knee_at_error_rate():
+    knee = find_knee([_step(1, 10), _step(2, 20, error_rate=0.2)])
+    assert knee['saturated'] is True and knee['concurrency'] == 1
+
+
+def test_knee_not_saturated():
+    knee = find_knee([_step(1, 10), _step(2, 20)])
+    assert knee['saturated'] is False and knee['concurrency'] == 2
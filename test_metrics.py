@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+运行指标离线测试
+检查共享缓存命中、失败缓存命中和短链接缓存命中时记录的计数器与耗时分布的具体数值
+"""
+
+import pytest
+
+import integrated_parser
+import link_resolver
+import negative_cache
+from cache_backend import MemoryBackend
+from integrated_parser import IntegratedVideoParser
+from line_router import LineRouter
+from link_resolver import LinkResolver
+from metrics import MetricsRegistry
+from negative_cache import INVALID, NegativeCache
+from singleflight import SingleFlight
+
+BILIBILI_URL = 'https://www.bilibili.com/video/BV1GJ411x7h7'
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """用独立的注册表代替进程级默认注册表"""
+    registry = MetricsRegistry()
+    for module in (integrated_parser, link_resolver, negative_cache):
+        monkeypatch.setattr(module, 'metrics', registry)
+    return registry
+
+
+def make_parser(registry, **kwargs):
+    parser = IntegratedVideoParser(singleflight=SingleFlight(metrics=registry), negative_cache=NegativeCache(),
+                                   router=LineRouter(), **kwargs)
+    parser.upstream_calls = 0
+    return parser
+
+
+def fake_upstream(parser, result):
+    def upstream(url):
+        parser.upstream_calls += 1
+        return dict(result, original_url=url)
+
+    parser._parse_video = upstream
+
+
+def test_cache_backend_hit_metrics(registry):
+    backend = MemoryBackend()
+    first = make_parser(registry, cache_backend=backend)
+    fake_upstream(first, {'success': True, 'title': '替身视频', 'duration': '03:33', 'thumbnail': ''})
+    first.parse_video(BILIBILI_URL)
+
+    # 另一节点命中共享缓存，不请求上游
+    second = make_parser(registry, cache_backend=backend)
+    fake_upstream(second, {'success': False})
+    result = second.parse_video(BILIBILI_URL)
+    assert result['parse_method'] == 'cache' and result['title'] == '替身视频'
+    assert second.upstream_calls == 0
+    assert registry.get_counter('cache_backend.miss') == 1
+    assert registry.get_counter('cache_backend.hit') == 1
+    assert registry.get_counter('cache_backend.error') == 0
+    assert registry.get_counter('singleflight.executed') == 1
+
+
+def test_negative_cache_hit_metrics(registry):
+    parser = make_parser(registry)
+    fake_upstream(parser, {'success': False, 'error': '视频不存在', 'error_type': INVALID})
+    for _ in range(3):
+        result = parser.parse_video(BILIBILI_URL)
+    assert result['cached'] is True
+    assert parser.upstream_calls == 1
+    assert registry.get_counter('negcache.stored', error_type=INVALID) == 1
+    assert registry.get_counter('negcache.hit', error_type=INVALID) == 2
+    assert registry.get_counter('singleflight.executed') == 1
+
+
+class RedirectSession:
+    """替身会话：短链接返回 302 跳转到移动端链接"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def head(self, url, **kwargs):
+        self.calls += 1
+        response = type('Response', (), {})()
+        response.status_code = 302
+        response.headers = {'Location': 'https://m.bilibili.com/video/BV1GJ411x7h7'}
+        return response
+
+
+def test_link_resolver_cache_hit_metrics(registry):
+    resolver = LinkResolver(RedirectSession())
+    for _ in range(3):
+        assert resolver.resolve('https://b23.tv/abc123') == BILIBILI_URL
+    assert registry.get_counter('linkresolver.cache_miss') == 1
+    assert registry.get_counter('linkresolver.cache_hit', negative=False) == 2
+    assert registry.get_counter('linkresolver.failed') == 0
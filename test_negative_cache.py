@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+失败结果缓存离线测试
+覆盖状态码到失败类别的映射、按类别缓存与过期、容量淘汰，以及批量任务对各类失败的重试判断
+"""
+
+import time
+
+import pytest
+
+from batch_job import is_transient_failure
+from negative_cache import (INVALID, TRANSIENT, UNEXTRACTABLE, UNSUPPORTED, NegativeCache,
+                            error_type_for_status)
+
+
+@pytest.mark.parametrize('status_code, error_type', [
+    (404, INVALID),
+    (410, INVALID),
+    (400, TRANSIENT),
+    (401, TRANSIENT),
+    (403, TRANSIENT),
+    (408, TRANSIENT),
+    (412, TRANSIENT),
+    (429, TRANSIENT),
+    (451, TRANSIENT),
+    (500, TRANSIENT),
+    (503, TRANSIENT),
+])
+def test_error_type_for_status(status_code, error_type):
+    assert error_type_for_status(status_code) == error_type
+
+
+@pytest.mark.parametrize('status_code, retried', [(403, True), (412, True), (451, True), (404, False)])
+def test_batch_job_retries_only_transient_statuses(status_code, retried):
+    result = {'success': False, 'error': f'HTTP {status_code}', 'error_type': error_type_for_status(status_code)}
+    assert is_transient_failure(result) is retried
+
+
+@pytest.mark.parametrize('error_type, cached', [
+    (UNSUPPORTED, True), (INVALID, True), (UNEXTRACTABLE, True), (TRANSIENT, False), (None, False)])
+def test_only_deterministic_failures_are_cached(error_type, cached):
+    cache = NegativeCache()
+    assert cache.put('key', {'success': False, 'error_type': error_type}) is cached
+    hit = cache.get('key')
+    assert (hit is not None) is cached
+    if cached:
+        assert hit['cached'] is True
+    assert cache.put('ok', {'success': True}) is False
+
+
+def test_entries_expire():
+    cache = NegativeCache(ttls={INVALID: 0.05})
+    cache.put('key', {'success': False, 'error_type': INVALID})
+    assert cache.get('key') is not None
+    time.sleep(0.06)
+    assert cache.get('key') is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = NegativeCache(max_entries=2)
+    for key in ('a', 'b'):
+        cache.put(key, {'success': False, 'error_type': INVALID})
+    cache.get('a')
+    cache.put('c', {'success': False, 'error_type': INVALID})
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
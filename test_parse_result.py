@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+紧凑解析结果测试
+ParseResult 与 ParseUrlList 对调用方保持普通字典、列表的行为，解析链接在访问时才生成
+"""
+
+import json
+
+from line_catalog import Line
+from parse_result import ParseResult, ParseUrlList, json_default
+
+ENCODED_URL = 'https://v.youku.com/v_show/id_X1.html'
+
+
+class CountingLine(Line):
+    """记录生成链接次数的线路"""
+
+    __slots__ = ()
+
+    formatted = []
+
+    def format(self, encoded_url):
+        CountingLine.formatted.append(self.name)
+        return super().format(encoded_url)
+
+
+LINES = (Line('线路1', 'https://a.example/?url={}', priority=2),
+         Line('线路2', 'https://b.example/{}/play', type='m3u8', priority=1))
+
+EXPECTED_URLS = [
+    {'name': '线路1', 'url': 'https://a.example/?url=' + ENCODED_URL, 'type': 'iframe'},
+    {'name': '线路2', 'url': 'https://b.example/' + ENCODED_URL + '/play', 'type': 'm3u8'},
+]
+
+
+def make_result():
+    result = ParseResult(success=True, platform='优酷', vid='X1', best_parse_url=None)
+    result.set_lines(LINES, ENCODED_URL)
+    result['cached'] = True
+    return result
+
+
+def expected_dict():
+    return {'success': True, 'platform': '优酷', 'vid': 'X1', 'parse_urls': EXPECTED_URLS,
+            'best_parse_url': None, 'cached': True}
+
+
+def test_dict_conversion():
+    result = make_result()
+    data = dict(result)
+    assert list(data) == ['success', 'platform', 'vid', 'parse_urls', 'best_parse_url', 'cached']
+    assert data == expected_dict()
+    assert result.to_dict() == expected_dict()
+    assert isinstance(result.to_dict()['parse_urls'], list)
+
+
+def test_equals_plain_dict():
+    result = make_result()
+    assert result == expected_dict()
+    assert expected_dict() == result
+    assert result != dict(expected_dict(), vid='X2')
+    assert result != {k: v for k, v in expected_dict().items() if k != 'cached'}
+
+
+def test_missing_fields_behave_like_dict():
+    result = ParseResult(success=False)
+    assert 'vid' not in result
+    assert result.get('vid') is None
+    assert len(result) == 1
+    result['error'] = '失败'
+    del result['success']
+    assert dict(result) == {'error': '失败'}
+
+
+def test_copy_is_independent():
+    result = make_result()
+    clone = result.copy()
+    assert isinstance(clone, ParseResult)
+    assert clone == result
+    clone['title'] = '新标题'
+    clone['cached'] = False
+    clone['extra'] = 1
+    assert 'title' not in result
+    assert result['cached'] is True
+    assert 'extra' not in result
+    # 只读的线路列表直接共享
+    assert clone['parse_urls'] is result['parse_urls']
+
+
+def test_json_dumps_with_json_default():
+    result = make_result()
+    data = json.loads(json.dumps({'result': result, 'urls': result['parse_urls']}, default=json_default))
+    assert data == {'result': expected_dict(), 'urls': EXPECTED_URLS}
+
+
+def test_parse_urls_materialized_on_access():
+    CountingLine.formatted.clear()
+    urls = ParseUrlList([CountingLine('线路1', 'https://a.example/?url={}'),
+                         CountingLine('线路2', 'https://b.example/?url={}')], ENCODED_URL)
+    assert len(urls) == 2
+    assert CountingLine.formatted == []
+
+    assert urls[1]['url'] == 'https://b.example/?url=' + ENCODED_URL
+    assert CountingLine.formatted == ['线路2']
+
+    assert [entry['name'] for entry in urls] == ['线路1', '线路2']
+    assert CountingLine.formatted == ['线路2', '线路1', '线路2']
+
+    assert urls[:1] == [{'name': '线路1', 'url': 'https://a.example/?url=' + ENCODED_URL, 'type': 'iframe'}]
+
+
+def test_parse_url_list_equals_list():
+    urls = ParseUrlList(LINES, ENCODED_URL)
+    assert urls == EXPECTED_URLS
+    assert EXPECTED_URLS == urls
+    assert urls == tuple(EXPECTED_URLS)
+    assert urls != EXPECTED_URLS[:1]
+    assert urls.to_list() == EXPECTED_URLS
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+解析服务离线测试
+覆盖请求参数校验、准入控制的容量与交互预留，以及 HTTP 接口；解析器由替身代替，不访问网络
+"""
+
+import http.client
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from parse_service import AdmissionController, Overloaded, ParseService
+from scheduler import BATCH, INTERACTIVE
+
+
+class FakeParser:
+    """替身解析器：parse_video 在 release 被设置前阻塞"""
+
+    warmer = None
+    scheduler = None
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.release.set()
+
+    def parse_video(self, url, priority=INTERACTIVE):
+        self.release.wait(5)
+        return {'success': True, 'original_url': url}
+
+    parse_series = parse_video
+    test_youku_apis = parse_video
+
+    def get_supported_platforms(self):
+        return ['优酷']
+
+    def get_metrics(self):
+        return {}
+
+
+@pytest.fixture
+def service():
+    service = ParseService(parser=FakeParser(), max_inflight=2, queue_size=4, request_timeout=5)
+    yield service
+    service.parser.release.set()
+    service.shutdown()
+
+
+@pytest.mark.parametrize('priority', [['x'], {'a': 1}, 3])
+def test_non_string_priority_is_rejected(service, priority):
+    status, body = service.handle('POST', '/parse', {'url': 'https://v.youku.com/x', 'priority': priority})
+    assert status == 400
+    assert body['success'] is False
+
+
+def test_unknown_priority_is_rejected(service):
+    status, body = service.handle('POST', '/parse', {'url': 'https://v.youku.com/x', 'priority': 'urgent'})
+    assert status == 400
+    assert service.admission.stats()['queued'] == 0
+
+
+def test_parse_ok(service):
+    status, body = service.handle('GET', '/parse', {'url': 'https://v.youku.com/x'})
+    assert status == 200
+    assert body['original_url'] == 'https://v.youku.com/x'
+    assert service.handle('GET', '/nope', {})[0] == 404
+    assert service.handle('GET', '/parse', {})[0] == 400
+
+
+def test_admission_sheds_and_reserves_queue_for_interactive():
+    admission = AdmissionController(max_inflight=2, queue_size=4)
+    release = threading.Event()
+    try:
+        # 容量 6，队列最后 1 个位置只留给交互请求
+        futures = [admission.submit(release.wait, 5, priority=BATCH) for _ in range(5)]
+        with pytest.raises(Overloaded):
+            admission.submit(release.wait, 5, priority=BATCH)
+        futures.append(admission.submit(release.wait, 5, priority=INTERACTIVE))
+        with pytest.raises(Overloaded):
+            admission.submit(release.wait, 5, priority=INTERACTIVE)
+        assert not admission.has_capacity()
+    finally:
+        release.set()
+    assert all(future.result(5) for future in futures)
+    assert admission.has_capacity()
+    admission.shutdown()
+
+
+def test_invalid_max_inflight():
+    with pytest.raises(ValueError):
+        AdmissionController(max_inflight=0)
+
+
+def test_http_endpoint(service):
+    server = service.create_server('127.0.0.1', 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+    try:
+        request = urllib.request.Request(
+            f'{base}/parse', data=json.dumps({'url': 'https://v.youku.com/x', 'priority': ['x']}).encode(),
+            headers={'Content-Type': 'application/json'})
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(request, timeout=5)
+        assert error.value.code == 400
+        with urllib.request.urlopen(f'{base}/healthz', timeout=5) as response:
+            assert json.loads(response.read()) == {'status': 'ok'}
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.parametrize('length, status', [('abc', 400), ('-1', 400), ('1e3', 400), ('99999999999', 413)])
+def test_bad_content_length_is_rejected(service, length, status):
+    server = service.create_server('127.0.0.1', 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        connection = http.client.HTTPConnection(*server.server_address[:2], timeout=5)
+        connection.putrequest('POST', '/parse')
+        connection.putheader('Content-Type', 'application/json')
+        connection.putheader('Content-Length', length)
+        connection.endheaders()
+        response = connection.getresponse()
+        assert response.status == status
+        assert json.loads(response.read())['success'] is False
+        assert response.getheader('Connection') == 'close'
+        connection.close()
+    finally:
+        server.shutdown()
+        server.server_close()
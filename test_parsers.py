@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+解析器离线测试
+覆盖链接分派、视频ID提取、基于保存页面（test_pages/）的元数据提取、各平台解析链接生成和两阶段解析；
+所有请求由内存中的替身会话应答，不访问网络
+"""
+
+import datetime
+import json
+import os
+import threading
+import time
+from urllib.parse import quote
+
+import pytest
+import requests
+
+from enhanced_parser import EnhancedVIPParser
+from integrated_parser import IntegratedVideoParser
+from line_catalog import LineCatalog, get_catalog
+from line_router import LineRouter
+from negative_cache import INVALID, NegativeCache, UNSUPPORTED
+from singleflight import SingleFlight
+from youku_enhanced_parser import YoukuEnhancedParser
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_pages')
+
+YOUKU_URL = 'https://v.youku.com/v_show/id_XNTEyNzQ4NjY1Mg==.html'
+QQ_URL = 'https://v.qq.com/x/cover/mzc00200mp8vo9b'
+IQIYI_URL = 'https://www.iqiyi.com/v_19rr7qhfzc.html'
+MGTV_URL = 'https://www.mgtv.com/b/339542/8835412.html'
+BILIBILI_URL = 'https://www.bilibili.com/video/BV1GJ411x7h7'
+BILIBILI_API_URL = 'https://api.bilibili.com/x/web-interface/view?bvid=BV1GJ411x7h7'
+
+
+def load_page(name: str) -> str:
+    """读取保存的页面"""
+    with open(os.path.join(PAGES_DIR, name), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+class FakeResponse:
+    """替身响应"""
+
+    def __init__(self, status_code: int = 200, text: str = ''):
+        self.status_code = status_code
+        self.text = text
+        self.content = text.encode('utf-8')
+        self.headers = {'Content-Type': 'text/html; charset=utf-8'}
+        self.elapsed = datetime.timedelta(milliseconds=20)
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class FakeSession:
+    """替身会话：已登记的链接返回保存的页面，线路的 HEAD 请求返回 200，其余请求视为网络错误"""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.requested = []
+
+    def get(self, url, **kwargs):
+        self.requested.append(url)
+        if url not in self.pages:
+            raise requests.ConnectionError(f'offline: {url}')
+        return FakeResponse(200, self.pages[url])
+
+    def head(self, url, **kwargs):
+        self.requested.append(url)
+        return FakeResponse(200)
+
+
+SAVED_PAGES = {
+    YOUKU_URL: load_page('youku_video.html'),
+    QQ_URL: load_page('qq_page.html'),
+    IQIYI_URL: load_page('iqiyi_page.html'),
+    MGTV_URL: load_page('mgtv_page.html'),
+    BILIBILI_API_URL: load_page('bilibili_view.json')
+}
+
+
+@pytest.fixture
+def session():
+    return FakeSession(dict(SAVED_PAGES))
+
+
+@pytest.fixture
+def enhanced(session):
+    # 独立且不探索的路由表：线路顺序即优先级顺序
+    return EnhancedVIPParser(session=session, router=LineRouter(exploration_rate=0.0))
+
+
+@pytest.fixture
+def youku(session):
+    return YoukuEnhancedParser(session=session, router=LineRouter(exploration_rate=0.0))
+
+
+@pytest.mark.parametrize('url, platform_key', [
+    (YOUKU_URL, 'youku.com'),
+    ('https://v.youku.com/video?vid=XNjQ4MzA5ODkwOA==&s=bdfb0949', 'youku.com'),
+    (QQ_URL, 'v.qq.com'),
+    ('https://v.qq.com/x/page/n0035ba0y8r.html', 'v.qq.com'),
+    (IQIYI_URL, 'iqiyi.com'),
+    (BILIBILI_URL, 'bilibili.com'),
+    (MGTV_URL, 'mgtv.com'),
+])
+def test_detect_platform(enhanced, url, platform_key):
+    assert enhanced.detect_platform(url)['key'] == platform_key
+
+
+def test_detect_platform_unsupported(enhanced):
+    assert enhanced.detect_platform('https://example.com/video/1') is None
+    result = enhanced.parse_video('https://example.com/video/1')
+    assert result['success'] is False
+    assert result['error_type'] == UNSUPPORTED
+
+
+@pytest.mark.parametrize('url, expected', [
+    ('https://v.qq.com/x/page/n0035ba0y8r.html', 'n0035ba0y8r'),
+    ('https://v.qq.com/x/cover/mzc00200mp8vo9b/n0035ba0y8r.html', 'n0035ba0y8r'),
+    ('https://v.qq.com/txp/iframe/player.html?vid=n0035ba0y8r', 'n0035ba0y8r'),
+    (BILIBILI_URL, 'BV1GJ411x7h7'),
+    ('https://www.bilibili.com/video/av80433022', 'av80433022'),
+    (YOUKU_URL, 'XNTEyNzQ4NjY1Mg=='),
+    (MGTV_URL, '8835412'),
+    (QQ_URL, None),
+])
+def test_extract_vid_from_url(enhanced, url, expected):
+    assert enhanced.extract_vid_from_url(url) == expected
+
+
+@pytest.mark.parametrize('url, expected', [
+    (YOUKU_URL, 'XNTEyNzQ4NjY1Mg=='),
+    ('https://v.youku.com/video?vid=XNjQ4MzA5ODkwOA==&s=bdfb0949', 'XNjQ4MzA5ODkwOA=='),
+    ('https://www.youku.com/show_page/id_XNjQ4MzA5ODkwOA==.html', 'XNjQ4MzA5ODkwOA=='),
+    ('https://v.youku.com/v_show/index.html', None),
+])
+def test_youku_extract_video_id_from_url(youku, url, expected):
+    assert youku.extract_video_id_from_url(url) == expected
+
+
+def test_youku_extract_video_id_from_page(youku, session):
+    url = 'https://v.youku.com/v_show/index.html'
+    session.pages[url] = load_page('youku_video.html')
+    assert youku.extract_video_id(url) == 'XNTEyNzQ4NjY1Mg=='
+
+
+def test_canonical_key_dispatch():
+    parser = IntegratedVideoParser(singleflight=SingleFlight(), negative_cache=NegativeCache(), router=LineRouter())
+    assert parser.canonical_key(YOUKU_URL) == ('youku.com', 'XNTEyNzQ4NjY1Mg==')
+    assert parser.canonical_key('https://m.bilibili.com/video/BV1GJ411x7h7') == ('bilibili.com', 'BV1GJ411x7h7')
+    assert parser.canonical_key(' https://Example.com/a#top ') == ('unknown', 'https://example.com/a')
+
+
+def test_integrated_dispatch():
+    parser = IntegratedVideoParser(singleflight=SingleFlight(), negative_cache=NegativeCache(), router=LineRouter())
+    parser.youku_parser.parse_youku_video = lambda url: {'success': True, 'platform': '优酷'}
+    parser.original_parser.parse_video = lambda url: {'success': True, 'platform': 'B站'}
+    assert parser._parse_video(YOUKU_URL)['parser_type'] == 'youku_enhanced'
+    assert parser._parse_video(BILIBILI_URL)['parser_type'] == 'original'
+
+
+def test_youku_page_info_extraction(youku):
+    info = youku._extract_page_info(load_page('youku_video.html'))
+    assert info == {
+        'title': '山海情 第01集',
+        'thumbnail': 'https://vthumb.ykimg.com/054101015FF6B1F38B7B6A9B2C5B8E3A',
+        'duration': '45:10'
+    }
+    assert youku._extract_page_info('<html></html>') is None
+
+
+@pytest.mark.parametrize('url, title, vid, duration', [
+    (YOUKU_URL, '山海情 第01集', 'XNTEyNzQ4NjY1Mg==', '未知'),
+    (QQ_URL, '庆余年 第1集', 'n0035ba0y8r', '未知'),
+    (IQIYI_URL, '狂飙第1集', 'a8ac0bcdb7b3d6c0d7a0f9e7d8f1c2b3', '未知'),
+    (MGTV_URL, '乘风破浪的姐姐 第1期', '8835412', '未知'),
+    (BILIBILI_URL, '【官方 MV】Never Gonna Give You Up - Rick Astley', 'BV1GJ411x7h7', '03:33'),
+])
+def test_parse_saved_pages(enhanced, url, title, vid, duration):
+    result = enhanced.parse_video(url)
+    assert result['success'] is True
+    assert result['title'] == title
+    assert result['vid'] == vid
+    assert result['duration'] == duration
+    assert result['best_parse_url'] == result['parse_urls'][0]['url']
+
+
+def test_youku_parse_saved_page(youku):
+    result = youku.parse_youku_video(YOUKU_URL)
+    first_line = get_catalog().group('youku')[0]
+    assert result['success'] is True
+    assert result['vid'] == 'XNTEyNzQ4NjY1Mg=='
+    assert result['title'] == '山海情 第01集'
+    assert result['duration'] == '45:10'
+    assert result['recommended_api'] == first_line.name
+    assert result['best_parse_url'] == first_line.format(quote(YOUKU_URL, safe=':/?#[]@!$&\'()*+,;='))
+
+
+def test_best_parse_url_is_top_ranked_line(session):
+    # 解析结果不记录线路结果，不参与探索：即使探索率为 1 也取得分最高的线路
+    router = LineRouter(exploration_rate=1.0)
+    parser = EnhancedVIPParser(session=session, router=router)
+    lines = list(parser.parse_apis)
+    router.record('bilibili.com', lines[0].name, False)
+    for _ in range(5):
+        result = parser.parse_video(BILIBILI_URL)
+        assert result['best_parse_url'] == result['parse_urls'][0]['url']
+        assert result['parse_urls'][-1]['name'] == lines[0].name
+
+
+@pytest.mark.parametrize('url', [QQ_URL, IQIYI_URL, MGTV_URL, BILIBILI_URL, YOUKU_URL])
+def test_parse_url_generation(enhanced, url):
+    encoded_url = quote(url, safe=':/?#[]@!$&\'()*+,;=')
+    catalog = get_catalog()
+    if enhanced.detect_platform(url)['key'] == 'youku.com':
+        # 优酷：首选解析器在前，其后为不重复的通用线路
+        lines = list(catalog.group('youku_preferred'))
+        lines += [line for line in catalog.group('generic') if line.url not in {l.url for l in lines}]
+        parse_urls = enhanced.get_youku_parse_urls(url)
+    else:
+        lines = list(catalog.group('generic'))
+        parse_urls = enhanced.get_all_parse_urls(url)
+    assert [entry['name'] for entry in parse_urls] == [line.name for line in lines]
+    assert [entry['url'] for entry in parse_urls] == [line.url.format(encoded_url) for line in lines]
+    assert all(set(entry) == {'name', 'url', 'type'} for entry in parse_urls)
+
+
+def test_youku_parse_url_generation(youku):
+    encoded_url = quote(YOUKU_URL, safe=':/?#[]@!$&\'()*+,;=')
+    lines = get_catalog().group('youku')
+    parse_urls = youku._generate_parse_urls(YOUKU_URL)
+    assert [entry['url'] for entry in parse_urls] == [line.url.format(encoded_url) for line in lines]
+    assert [entry['priority'] for entry in parse_urls] == sorted(entry['priority'] for entry in parse_urls)
+
+
+def swapping_catalogs():
+    """每次读取都返回新一份目录（模拟请求过程中的热替换），各份目录的线路主机不同"""
+    generation = 0
+    while True:
+        generation += 1
+        lines = [{'name': f'线路{i}', 'url': f'https://gen{generation}.example.com/{i}?url={{}}'} for i in range(3)]
+        yield LineCatalog.from_dict({'youku': lines, 'generic': lines, 'youku_preferred': lines[:1]})
+
+
+class SwappingYoukuParser(YoukuEnhancedParser):
+    catalogs = None
+
+    @property
+    def catalog(self):
+        return next(self.catalogs)
+
+
+class SwappingEnhancedParser(EnhancedVIPParser):
+    catalogs = None
+
+    @property
+    def catalog(self):
+        return next(self.catalogs)
+
+
+def test_youku_request_reads_catalog_once(session):
+    parser = SwappingYoukuParser(session=session, router=LineRouter(exploration_rate=0.0))
+    parser.catalogs = swapping_catalogs()
+    result = parser.parse_youku_video(YOUKU_URL)
+    probed = [url for url in session.requested if url != YOUKU_URL]
+    urls = [entry['url'] for entry in result['parse_urls']] + [result['best_parse_url']] + probed
+    assert probed and all(url.startswith('https://gen1.example.com/') for url in urls)
+
+
+@pytest.mark.parametrize('url', [YOUKU_URL, BILIBILI_URL])
+def test_enhanced_request_reads_catalog_once(session, url):
+    parser = SwappingEnhancedParser(session=session, router=LineRouter(exploration_rate=0.0))
+    parser.catalogs = swapping_catalogs()
+    result = parser.parse_video(url)
+    urls = [entry['url'] for entry in result['parse_urls']] + [result['best_parse_url']]
+    assert all(url.startswith('https://gen1.example.com/') for url in urls)
+
+
+class SlowProbeSession(FakeSession):
+    """线路 HEAD 请求耗时 probe_delay 秒的替身会话"""
+
+    def __init__(self, pages, probe_delay, page_status=200):
+        super().__init__(pages)
+        self.probe_delay = probe_delay
+        self.page_status = page_status
+        self.probes = 0
+
+    def get(self, url, **kwargs):
+        if self.page_status != 200:
+            self.requested.append(url)
+            return FakeResponse(self.page_status)
+        return super().get(url, **kwargs)
+
+    def head(self, url, **kwargs):
+        self.probes += 1
+        time.sleep(self.probe_delay)
+        return FakeResponse(503)
+
+
+def test_youku_probes_do_not_queue_under_concurrency():
+    # 16 个并发解析的线路测试同时进行，而不是在固定的 4 个线程上排队
+    session = SlowProbeSession(dict(SAVED_PAGES), probe_delay=0.1)
+    parser = YoukuEnhancedParser(session=session, router=LineRouter(exploration_rate=0.0))
+    parser._test_best_parse_api = lambda url, abandon=None, catalog=None: time.sleep(0.2)
+    start = time.monotonic()
+    threads = [threading.Thread(target=parser.parse_youku_video, args=(YOUKU_URL,)) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.monotonic() - start < 0.6
+
+
+def test_youku_probe_abandoned_when_page_is_invalid():
+    session = SlowProbeSession({}, probe_delay=0.05, page_status=404)
+    parser = YoukuEnhancedParser(session=session, router=LineRouter(exploration_rate=0.0))
+    result = parser.parse_youku_video('https://v.youku.com/v_show/index.html')
+    assert result['success'] is False
+    time.sleep(0.3)
+    # 最多已开始的一条线路测试完成，其余线路不再测试
+    assert session.probes <= 1
+
+
+def test_youku_page_invalid_only_on_404():
+    session = SlowProbeSession({}, probe_delay=0.0, page_status=404)
+    parser = YoukuEnhancedParser(session=session, router=LineRouter(exploration_rate=0.0))
+    result = parser.parse_youku_video('https://v.youku.com/v_show/index.html')
+    assert result['error_type'] == INVALID
+
+
+@pytest.mark.parametrize('pages', [
+    {'https://v.youku.com/v_show/index.html': '<html><title>优酷</title></html>'},
+    {},
+])
+def test_youku_page_without_vid_keeps_parse_urls(youku, session, pages):
+    # 页面正常但找不到视频ID、或页面请求失败时，仍按原链接返回解析链接
+    session.pages = pages
+    url = 'https://v.youku.com/v_show/index.html'
+    result = youku.parse_youku_video(url)
+    assert result['success'] is True
+    assert result['vid'] == ''
+    assert result['parse_urls']
+    assert result['best_parse_url'].endswith(url)
+
+
+QQ_SERIES_URL = 'https://v.qq.com/x/cover/mzc00200mp8vo9b.html'
+YOUKU_SHOW_URL = 'https://v.youku.com/v_show/id_XNTEyNzQ4NjY1Mg==.html?s=show'
+
+
+def test_tencent_series_ignores_recommendations(enhanced, session):
+    session.pages[QQ_SERIES_URL] = load_page('qq_series.html')
+    result = enhanced.parse_series(QQ_SERIES_URL)
+    assert result['success'] is True
+    assert [episode['vid'] for episode in result['episodes']] == ['n0035ba0y8r', 'k00353pxgfv', 'v0035ct4cnx']
+    assert all('/x/cover/mzc00200mp8vo9b/' in episode['original_url'] for episode in result['episodes'])
+
+
+def test_tencent_series_falls_back_to_own_episode_links(enhanced, session):
+    page = load_page('qq_series.html')
+    session.pages[QQ_SERIES_URL] = page[:page.index('<script>')]
+    result = enhanced.parse_series(QQ_SERIES_URL)
+    assert [episode['vid'] for episode in result['episodes']] == ['n0035ba0y8r', 'k00353pxgfv', 'v0035ct4cnx']
+
+
+def test_youku_series_ignores_recommendations(youku, session):
+    session.pages[YOUKU_SHOW_URL] = load_page('youku_show.html')
+    result = youku.parse_series(YOUKU_SHOW_URL)
+    assert result['success'] is True
+    assert [episode['vid'] for episode in result['episodes']] == [
+        'XNTEyNzQ4NjY1Mg==', 'XNTEyNzQ4NzE0OA==', 'XNTEyNzQ4NzU5Mg==']
+
+
+def test_youku_series_without_episode_list(youku, session):
+    # 推荐位里的视频不是分集：没有分集列表时只返回当前这一集
+    page = load_page('youku_show.html')
+    session.pages[YOUKU_SHOW_URL] = page.replace('"videoList"', '"items"')
+    result = youku.parse_series(YOUKU_SHOW_URL)
+    assert [episode['vid'] for episode in result['episodes']] == ['XNTEyNzQ4NjY1Mg==']
+
+
+@pytest.fixture
+def integrated(session):
+    parser = IntegratedVideoParser(singleflight=SingleFlight(), negative_cache=NegativeCache(),
+                                   router=LineRouter(exploration_rate=0.0))
+    parser.session = parser.youku_parser.session = parser.original_parser.session = session
+    return parser
+
+
+def gate_upstream(parser):
+    """上游解析在返回的事件被设置前阻塞"""
+    gate = threading.Event()
+    upstream = parser._parse_video
+    parser._parse_video = lambda url: gate.wait(5) and upstream(url)
+    return gate
+
+
+@pytest.mark.parametrize('url, title, duration', [
+    (BILIBILI_URL, '【官方 MV】Never Gonna Give You Up - Rick Astley', '03:33'),
+    (YOUKU_URL, '山海情 第01集', '45:10'),
+])
+def test_deferred_returns_url_only_result_then_merges(integrated, session, url, title, duration):
+    gate = gate_upstream(integrated)
+    enriched = []
+    result = integrated.parse_video(url, deferred=True, on_enriched=enriched.append)
+    # 第一阶段不发起网络请求，已包含视频ID和全部解析链接
+    assert session.requested == []
+    assert result['success'] is True and result['metadata_pending'] is True
+    assert result['vid'] == integrated.canonical_key(url)[1]
+    assert result['best_parse_url'] == result['parse_urls'][0]['url']
+    assert enriched == []
+
+    gate.set()
+    assert result.wait(5) is result
+    assert result['metadata_pending'] is False
+    assert result['title'] == title and result['duration'] == duration
+    assert 'enrichment_error' not in result
+    assert enriched == [result] and enriched[0] is result
+
+
+def test_deferred_enrichment_error_is_recorded(integrated):
+    def failing(url):
+        raise RuntimeError('boom')
+
+    integrated._parse_video = failing
+    enriched = []
+    result = integrated.parse_video(BILIBILI_URL, deferred=True, on_enriched=enriched.append)
+    result.wait(5)
+    assert result['metadata_pending'] is False
+    assert result['enrichment_error'] == 'boom'
+    # 第一阶段的结果保留
+    assert result['success'] is True and result['parse_urls']
+    assert enriched == [result]
+    with pytest.raises(RuntimeError):
+        result.enrichment.result()
+
+
+def test_deferred_enrichment_failure_keeps_first_stage(integrated):
+    integrated._parse_video = lambda url: {'success': False, 'error': '视频不存在'}
+    result = integrated.parse_video(BILIBILI_URL, deferred=True).wait(5)
+    assert result['success'] is True and result['title'] == 'B站视频'
+    assert result['enrichment_error'] == '视频不存在'
+
+
+def test_deferred_without_vid_in_url_parses_synchronously(integrated):
+    result = integrated.parse_video(IQIYI_URL, deferred=True)
+    assert result['metadata_pending'] is False
+    assert result['title'] == '狂飙第1集'
+    assert result.enrichment.done()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+热点路径性能回归门禁
+对 detect_platform、视频ID提取、页面信息提取和解析链接生成做微基准测试，与 perf_baselines.json 中的基线比较，
+单次耗时超过基线的 PERF_GATE_THRESHOLD 倍（默认 1.5）即失败。
+为消除机器差异，耗时以同一进程内一段固定纯 Python 负载的耗时为单位进行比较。
+
+更新基线（确认性能变化符合预期后）：
+    python test_performance.py --update
+跳过门禁：设置环境变量 PERF_GATE_SKIP=1
+"""
+
+import json
+import os
+import re
+import sys
+import timeit
+from typing import Callable, Dict
+
+import pytest
+
+from enhanced_parser import EnhancedVIPParser
+from line_router import LineRouter
+from youku_enhanced_parser import YoukuEnhancedParser
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'perf_baselines.json')
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_pages')
+
+DEFAULT_THRESHOLD = 1.5
+
+# 每个基准重复测量的次数（取最小值）与单次测量的目标时长（秒）
+REPEAT = 5
+TARGET_TIME = 0.01
+
+URLS = (
+    'https://v.youku.com/v_show/id_XNTEyNzQ4NjY1Mg==.html',
+    'https://v.qq.com/x/cover/mzc00200mp8vo9b/n0035ba0y8r.html',
+    'https://www.iqiyi.com/v_19rr7qhfzc.html',
+    'https://www.bilibili.com/video/BV1GJ411x7h7',
+    'https://www.mgtv.com/b/339542/8835412.html',
+    'https://example.com/video/1'
+)
+
+
+def _calibration() -> None:
+    """固定的纯 Python 负载（字符串处理 + 正则 + 字典），作为耗时单位"""
+    pattern = re.compile(r'id_([^.]+)\.html')
+    table = {}
+    for i in range(200):
+        text = f'https://v.youku.com/v_show/id_X{i:08d}.html'
+        match = pattern.search(text)
+        table[match.group(1)] = text.upper()
+    sorted(table)
+
+
+def build_benchmarks() -> Dict[str, Callable[[], None]]:
+    """基准名称 -> 无参可调用对象"""
+    # 不探索的独立路由表，保证线路顺序固定
+    enhanced = EnhancedVIPParser(router=LineRouter(exploration_rate=0.0))
+    youku = YoukuEnhancedParser(router=LineRouter(exploration_rate=0.0))
+    with open(os.path.join(PAGES_DIR, 'youku_video.html'), 'r', encoding='utf-8') as f:
+        youku_page = f.read()
+    youku_url, bilibili_url = URLS[0], URLS[3]
+
+    def detect_platform():
+        for url in URLS:
+            enhanced.detect_platform(url)
+
+    def extract_vid_from_url():
+        for url in URLS:
+            enhanced.extract_vid_from_url(url)
+
+    def youku_extract_video_id():
+        youku.extract_video_id_from_url(youku_url)
+
+    def youku_page_info():
+        youku._extract_page_info(youku_page)
+
+    def youku_parse_urls():
+        youku._generate_parse_urls(youku_url)
+
+    def generic_parse_urls():
+        enhanced.get_all_parse_urls(bilibili_url, 'bilibili.com')
+
+    return {
+        'detect_platform': detect_platform,
+        'extract_vid_from_url': extract_vid_from_url,
+        'youku_extract_video_id': youku_extract_video_id,
+        'youku_page_info': youku_page_info,
+        'youku_parse_urls': youku_parse_urls,
+        'generic_parse_urls': generic_parse_urls
+    }
+
+
+def _calibrated_timer(fn: Callable[[], None]):
+    """(Timer, 单次测量的调用次数)，使单次测量约为 TARGET_TIME 秒"""
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    return timer, max(1, int(number * TARGET_TIME / elapsed)) if elapsed else number
+
+
+def measure(fn: Callable[[], None]) -> float:
+    """单次调用耗时（秒），多次测量取最小值以排除调度干扰"""
+    timer, number = _calibrated_timer(fn)
+    return min(timer.repeat(repeat=REPEAT, number=number)) / number
+
+
+def measure_relative(fn: Callable[[], None]) -> float:
+    """以校准负载耗时为单位的相对耗时；两者交替测量，使频率变化等干扰同时作用于两边"""
+    timer, number = _calibrated_timer(fn)
+    calibration_timer, calibration_number = _calibrated_timer(_calibration)
+    best = best_calibration = float('inf')
+    for _ in range(REPEAT):
+        best_calibration = min(best_calibration, calibration_timer.timeit(calibration_number) / calibration_number)
+        best = min(best, timer.timeit(number) / number)
+    return best / best_calibration
+
+
+def load_baselines() -> Dict[str, float]:
+    with open(BASELINE_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f)['benchmarks']
+
+
+def update_baselines() -> Dict[str, float]:
+    """重新测量并写入基线"""
+    baselines = {name: round(measure_relative(fn), 4) for name, fn in build_benchmarks().items()}
+    with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+        json.dump({'unit': '相对于校准负载的耗时', 'benchmarks': baselines}, f, ensure_ascii=False, indent=2)
+        f.write('\n')
+    return baselines
+
+
+BENCHMARKS = build_benchmarks()
+
+
+@pytest.mark.skipif(os.environ.get('PERF_GATE_SKIP') == '1', reason='PERF_GATE_SKIP=1')
+@pytest.mark.parametrize('name', sorted(BENCHMARKS))
+def test_hot_path_performance(name):
+    baseline = load_baselines().get(name)
+    assert baseline is not None, f'{name} 没有基线，请运行 python test_performance.py --update'
+    threshold = float(os.environ.get('PERF_GATE_THRESHOLD', DEFAULT_THRESHOLD))
+    relative = measure_relative(BENCHMARKS[name])
+    if relative > baseline * threshold:
+        # 复测一次，排除偶发的调度抖动
+        relative = min(relative, measure_relative(BENCHMARKS[name]))
+    assert relative <= baseline * threshold, (
+        f'{name} 性能回退：{relative:.3f}，基线 {baseline:.3f}，允许 {threshold} 倍')
+
+
+if __name__ == "__main__":
+    if '--update' in sys.argv[1:]:
+        for name, value in update_baselines().items():
+            print(f"{name}: {value}")
+    else:
+        for name, fn in BENCHMARKS.items():
+            print(f"{name}: {measure(fn) * 1e6:.2f} µs（相对 {measure_relative(fn):.3f}）")
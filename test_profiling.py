@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+性能剖析钩子离线测试
+覆盖报告输出、未启用时不写报告、报告头部注明未剖析的工作线程，以及并发调用各自写出报告
+"""
+
+import glob
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import profiling
+
+
+class Target:
+    def __init__(self, pool):
+        self.pool = pool
+
+    @profiling.profiled()
+    def parse(self, url):
+        return self.pool.submit(lambda: sum(range(1000))).result()
+
+
+def test_report_lists_unprofiled_threads(tmp_path):
+    with ThreadPoolExecutor(1, thread_name_prefix='probe') as pool:
+        target = Target(pool)
+        target.parse('https://v.youku.com/x')
+        assert not os.listdir(tmp_path)
+        with profiling.profile(str(tmp_path)):
+            assert target.parse('https://v.youku.com/x') == sum(range(1000))
+    reports = glob.glob(str(tmp_path / '*.txt'))
+    assert len(reports) == 1 and glob.glob(str(tmp_path / '*.prof'))
+    with open(reports[0], encoding='utf-8') as f:
+        header = f.read().split('=====', 1)[0]
+    assert 'https://v.youku.com/x' in header
+    assert '未剖析的线程' in header and 'probe_0' in header
+
+
+class ConcurrentTarget:
+    def __init__(self, parties):
+        self.barrier = threading.Barrier(parties, timeout=5)
+
+    @profiling.profiled()
+    def parse(self, url):
+        # 所有调用都进入剖析后才继续，确保剖析时间段相互重叠
+        self.barrier.wait()
+        return sum(range(1000))
+
+
+def test_concurrent_calls_each_write_a_report(tmp_path, monkeypatch):
+    monkeypatch.setenv(profiling.ENV_PROFILE_DIR, str(tmp_path))
+    target = ConcurrentTarget(4)
+    urls = [f'https://v.youku.com/v_show/id_X{i}.html' for i in range(4)]
+    with ThreadPoolExecutor(4, thread_name_prefix='worker') as pool:
+        assert list(pool.map(target.parse, urls)) == [sum(range(1000))] * 4
+
+    reports = []
+    for path in glob.glob(str(tmp_path / '*.txt')):
+        with open(path, encoding='utf-8') as f:
+            reports.append(f.read())
+    assert len(reports) == 4
+    assert sorted(url for url in urls for report in reports if url in report.split('\n', 1)[0]) == urls
+    # 内存分配是进程级的，同一时刻只有一个调用统计
+    assert sum('分配最多的代码行' in report for report in reports) == 1
+    assert sum('内存分配峰值: 未统计' in report for report in reports) == 3
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+按主机限速测试
+"""
+
+import time
+
+import pytest
+
+from metrics import MetricsRegistry
+from rate_limit import HostRateLimiter, TokenBucket
+
+
+@pytest.mark.parametrize('rate, capacity', [(0, 1), (-1, 1), (1, 0.5), (10, 0)])
+def test_token_bucket_rejects_invalid_settings(rate, capacity):
+    with pytest.raises(ValueError):
+        TokenBucket(rate, capacity)
+
+
+def test_token_bucket_rejects_oversized_acquire():
+    with pytest.raises(ValueError):
+        TokenBucket(5, 2).acquire(tokens=3)
+
+
+def test_token_bucket_burst_then_refill():
+    bucket = TokenBucket(rate=20, capacity=3)
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+    start = time.monotonic()
+    assert bucket.acquire(timeout=1.0)
+    assert 0.02 <= time.monotonic() - start < 0.5
+
+
+def test_token_bucket_acquire_times_out():
+    bucket = TokenBucket(rate=1, capacity=1)
+    assert bucket.try_acquire()
+    start = time.monotonic()
+    assert bucket.acquire(timeout=0.05) is False
+    assert time.monotonic() - start < 0.5
+
+
+def test_host_rate_limiter_matches_longest_domain():
+    limiter = HostRateLimiter({'youku.com': (1, 1), 'v.youku.com': (100, 5)}, metrics=MetricsRegistry())
+    assert limiter.bucket_for('v.youku.com').capacity == 5
+    assert limiter.bucket_for('www.youku.com').capacity == 1
+    assert limiter.bucket_for('v.qq.com') is None
+
+
+def test_host_rate_limiter_counts_rejections():
+    registry = MetricsRegistry()
+    limiter = HostRateLimiter({'youku.com': (1, 1)}, metrics=registry)
+    assert limiter.try_acquire('v.youku.com')
+    assert not limiter.try_acquire('v.youku.com')
+    assert registry.get_counter('ratelimit.rejected', host='v.youku.com') == 1
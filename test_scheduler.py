@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+优先级调度器离线测试
+覆盖加权公平派发、批量类别为交互类别预留槽位、嵌套调用，以及集成解析器中批量负载不阻塞交互解析
+"""
+
+import threading
+import time
+
+import pytest
+
+from integrated_parser import IntegratedVideoParser
+from line_router import LineRouter
+from negative_cache import NegativeCache
+from scheduler import BATCH, INTERACTIVE, PriorityScheduler
+from singleflight import SingleFlight
+
+
+@pytest.fixture
+def scheduler():
+    schedulers = []
+
+    def make(**kwargs):
+        schedulers.append(PriorityScheduler(**kwargs))
+        return schedulers[-1]
+
+    yield make
+    for created in schedulers:
+        created.shutdown()
+
+
+def test_weighted_fair_dispatch(scheduler):
+    sched = scheduler(concurrency=1, max_running={})
+    gate = threading.Event()
+    order = []
+    blocker = sched.submit(gate.wait, 5, priority=BATCH)
+    futures = [sched.submit(order.append, name, priority=name) for name in [BATCH, INTERACTIVE] * 9]
+    gate.set()
+    blocker.result(5)
+    for future in futures:
+        future.result(5)
+    # 权重 8:1：前 9 个派发中至少 8 个交互任务（批量类别已因占位任务推进过进度），批量任务随后全部执行
+    assert order[:9].count(INTERACTIVE) >= 8
+    assert order.count(BATCH) == 9
+
+
+def test_batch_leaves_a_slot_for_interactive(scheduler):
+    sched = scheduler(concurrency=2)
+    gate = threading.Event()
+    batch = [sched.submit(gate.wait, 5, priority=BATCH) for _ in range(5)]
+    try:
+        assert sched.run(lambda: 'ok', priority=INTERACTIVE) == 'ok'
+        stats = sched.stats()[BATCH]
+        assert stats['running'] <= 1 and stats['running'] + stats['queued'] == 5
+    finally:
+        gate.set()
+    assert all(future.result(5) for future in batch)
+
+
+def test_nested_run_does_not_deadlock(scheduler):
+    sched = scheduler(concurrency=1)
+    assert sched.run(lambda: sched.run(lambda: 42, priority=BATCH), priority=BATCH) == 42
+
+
+def test_unknown_priority(scheduler):
+    with pytest.raises(ValueError):
+        scheduler(concurrency=1).submit(print, priority='urgent')
+
+
+def test_batch_load_does_not_starve_interactive(scheduler):
+    parser = IntegratedVideoParser(singleflight=SingleFlight(), negative_cache=NegativeCache(),
+                                   router=LineRouter(), scheduler=scheduler(concurrency=2))
+
+    def upstream(url):
+        time.sleep(0.05)
+        return {'success': True, 'original_url': url}
+
+    parser._parse_video = upstream
+    batch = [
+        threading.Thread(target=parser.parse_video,
+                         args=(f'https://www.bilibili.com/video/BV1GJ411x{i:03d}',), kwargs={'priority': BATCH})
+        for i in range(20)
+    ]
+    start = time.monotonic()
+    for thread in batch:
+        thread.start()
+    time.sleep(0.02)
+    result = parser.parse_video('https://www.bilibili.com/video/BV1GJ411x7h7', priority=INTERACTIVE)
+    interactive_latency = time.monotonic() - start
+    for thread in batch:
+        thread.join()
+    batch_elapsed = time.monotonic() - start
+
+    assert result['success'] is True
+    # 20 个批量任务只能串行使用 1 个槽位（约 1 秒），交互请求使用预留槽位立即执行
+    assert interactive_latency < 0.3
+    assert batch_elapsed > 0.9
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+请求合并与短链接解析测试
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from link_resolver import LinkResolver
+from metrics import MetricsRegistry
+from singleflight import SingleFlight
+
+
+def run_concurrently(count, target):
+    """同时启动 count 个线程执行 target，返回各线程的返回值"""
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def worker(index):
+        barrier.wait()
+        results[index] = target()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_calls_execute_once():
+    registry = MetricsRegistry()
+    flight = SingleFlight(copy_result=dict.copy, metrics=registry)
+    calls = []
+
+    def slow_parse():
+        calls.append(1)
+        time.sleep(0.1)
+        return {'success': True}
+
+    results = run_concurrently(8, lambda: flight.do('key', slow_parse))
+    assert len(calls) == 1
+    assert all(result == {'success': True} for result in results)
+    # 跟随者拿到的是副本
+    assert len({id(result) for result in results}) == 8
+    assert registry.get_counter('singleflight.executed') == 1
+    assert registry.get_counter('singleflight.saved') == 7
+    assert flight.inflight_count() == 0
+
+
+def test_error_is_shared_and_key_released():
+    flight = SingleFlight(metrics=MetricsRegistry())
+
+    def failing():
+        time.sleep(0.05)
+        raise ValueError('boom')
+
+    def call():
+        try:
+            flight.do('key', failing)
+        except ValueError as e:
+            return str(e)
+
+    assert run_concurrently(4, call) == ['boom'] * 4
+    assert flight.do('key', lambda: 'ok') == 'ok'
+
+
+def test_metric_prefix_separates_groups():
+    registry = MetricsRegistry()
+    flight = SingleFlight(metrics=registry, metric_prefix='linkresolver.singleflight')
+    flight.do('key', lambda: 1)
+    assert registry.get_counter('linkresolver.singleflight.executed') == 1
+    assert registry.get_counter('singleflight.executed') == 0
+
+
+def test_cancelled_async_leader_does_not_cancel_followers():
+    flight = SingleFlight(metrics=MetricsRegistry())
+    calls = []
+
+    def slow_parse():
+        calls.append(1)
+        time.sleep(0.2)
+        return 'ok'
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do_async('key', slow_parse))
+        await asyncio.sleep(0.02)
+        followers = [asyncio.ensure_future(flight.do_async('key', slow_parse)) for _ in range(3)]
+        thread_result = asyncio.get_running_loop().run_in_executor(None, flight.do, 'key', slow_parse)
+        await asyncio.sleep(0.02)
+        leader.cancel()
+        # 跟随者之一被取消同样不影响其他等待者
+        followers[0].cancel()
+        results = await asyncio.gather(*followers[1:], thread_result)
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return results
+
+    assert asyncio.run(main()) == ['ok'] * 3
+    assert len(calls) == 1
+    assert flight.inflight_count() == 0
+
+
+class RedirectSession:
+    """替身会话：短链接返回 302 跳转"""
+
+    def __init__(self, location):
+        self.location = location
+        self.calls = 0
+
+    def head(self, url, **kwargs):
+        self.calls += 1
+        time.sleep(0.05)
+        response = type('Response', (), {})()
+        response.status_code = 302
+        response.headers = {'Location': self.location}
+        return response
+
+
+def test_link_resolver_follows_and_caches(monkeypatch):
+    import link_resolver
+    registry = MetricsRegistry()
+    monkeypatch.setattr(link_resolver, 'metrics', registry)
+    session = RedirectSession('https://m.bilibili.com/video/BV1GJ411x7h7')
+    resolver = LinkResolver(session)
+    resolver._flight.metrics = registry
+
+    results = run_concurrently(4, lambda: resolver.resolve('https://b23.tv/abc123'))
+    assert results == ['https://www.bilibili.com/video/BV1GJ411x7h7'] * 4
+    assert resolver.resolve('https://b23.tv/abc123') == 'https://www.bilibili.com/video/BV1GJ411x7h7'
+    assert session.calls == 1
+    assert registry.get_counter('singleflight.saved') == 0
+    assert registry.get_counter('linkresolver.singleflight.executed') == 1
+
+
+def test_link_resolver_passes_through_regular_links():
+    resolver = LinkResolver(RedirectSession('unused'))
+    assert resolver.resolve(' https://v.qq.com/x/page/n0035ba0y8r.html ') == 'https://v.qq.com/x/page/n0035ba0y8r.html'
+    assert resolver.session.calls == 0
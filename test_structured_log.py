@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+结构化日志离线测试
+覆盖成功事件采样、JSON 行格式、队列满时丢弃计数、停止时写出队列中剩余的日志，
+以及未配置输出时日志不经 logging.lastResort 写到标准错误
+"""
+
+import io
+import json
+import logging
+import queue
+import sys
+
+import pytest
+
+import structured_log
+from metrics import MetricsRegistry
+from structured_log import (ROOT_LOGGER, JsonFormatter, NonBlockingQueueHandler, get_logger, log_event,
+                            setup_logging, shutdown_logging)
+
+
+class RecordingHandler(logging.Handler):
+    """记录收到的日志"""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def root_logger():
+    """测试结束后停止后台输出线程，恢复解析器根记录器的级别与采样比例"""
+    shutdown_logging()
+    logger = logging.getLogger(ROOT_LOGGER)
+    level, sample_rate = logger.level, structured_log._sample_rate
+    yield logger
+    shutdown_logging()
+    logger.setLevel(level)
+    structured_log._sample_rate = sample_rate
+
+
+def fake_random(monkeypatch, values):
+    values = iter(values)
+    monkeypatch.setattr(structured_log.random, 'random', lambda: next(values))
+
+
+def test_null_handler_installed_at_import(monkeypatch):
+    handlers = logging.getLogger(ROOT_LOGGER).handlers
+    assert any(isinstance(handler, logging.NullHandler) for handler in handlers)
+
+    # 根记录器没有任何处理器时也不会落到 lastResort
+    last_resort = RecordingHandler()
+    monkeypatch.setattr(logging, 'lastResort', last_resort)
+    monkeypatch.setattr(logging.getLogger(), 'handlers', [])
+    log_event(get_logger('test'), 'test.unconfigured', level=logging.WARNING)
+    assert last_resort.records == []
+
+
+def test_sampled_events_follow_sample_rate(monkeypatch, caplog):
+    monkeypatch.setattr(structured_log, '_sample_rate', 0.25)
+    fake_random(monkeypatch, [0.1, 0.3, 0.2, 0.9])
+    logger = get_logger('test')
+    with caplog.at_level(logging.INFO, logger=ROOT_LOGGER):
+        for index in range(4):
+            log_event(logger, 'test.sampled', sampled=True, index=index)
+        log_event(logger, 'test.failed', level=logging.WARNING, index=4)
+    assert [record.fields for record in caplog.records] == [
+        {'index': 0, 'sample_rate': 0.25},
+        {'index': 2, 'sample_rate': 0.25},
+        {'index': 4},
+    ]
+
+
+def test_full_sample_rate_logs_every_event(monkeypatch, caplog):
+    monkeypatch.setattr(structured_log, '_sample_rate', 1.0)
+    fake_random(monkeypatch, [])
+    with caplog.at_level(logging.INFO, logger=ROOT_LOGGER):
+        for index in range(3):
+            log_event(get_logger('test'), 'test.sampled', sampled=True, index=index)
+    assert [record.fields for record in caplog.records] == [{'index': 0}, {'index': 1}, {'index': 2}]
+
+
+def test_disabled_level_skips_sampling(monkeypatch, caplog):
+    fake_random(monkeypatch, [])
+    with caplog.at_level(logging.WARNING, logger=ROOT_LOGGER):
+        log_event(get_logger('test'), 'test.sampled', sampled=True)
+    assert caplog.records == []
+
+
+def test_json_formatter():
+    logger = get_logger('test')
+    record = logger.makeRecord(logger.name, logging.WARNING, __file__, 1, 'parse.failed', (), None,
+                               extra={'fields': {'platform': '优酷', 'elapsed_ms': 12.5, 'key': ('youku', 'X1'),
+                                                 'error': ValueError('坏数据')}})
+    line = JsonFormatter().format(record)
+    assert '\n' not in line and '优酷' in line
+    entry = json.loads(line)
+    assert entry == {'ts': round(record.created, 3), 'level': 'WARNING', 'logger': 'video2.test',
+                     'event': 'parse.failed', 'platform': '优酷', 'elapsed_ms': 12.5, 'key': ['youku', 'X1'],
+                     'error': '坏数据'}
+
+
+def test_json_formatter_includes_exception():
+    logger = get_logger('test')
+    try:
+        raise RuntimeError('上游错误')
+    except RuntimeError:
+        record = logger.makeRecord(logger.name, logging.ERROR, __file__, 1, 'parse.error', (), sys.exc_info())
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry['event'] == 'parse.error'
+    assert 'RuntimeError: 上游错误' in entry['exception']
+
+
+def test_full_queue_drops_and_counts(monkeypatch):
+    registry = MetricsRegistry()
+    monkeypatch.setattr(structured_log, 'metrics', registry)
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    logger = get_logger('test')
+    for index in range(3):
+        handler.handle(logger.makeRecord(logger.name, logging.INFO, __file__, 1, 'test.event', (), None))
+    assert handler.queue.qsize() == 1
+    assert registry.get_counter('log.dropped') == 2
+
+
+def test_shutdown_flushes_queued_records(root_logger):
+    stream = io.StringIO()
+    setup_logging(stream, sample_rate=1.0, queue_size=1000)
+    assert root_logger.propagate is False
+    logger = get_logger('test')
+    for index in range(500):
+        log_event(logger, 'test.event', index=index)
+    shutdown_logging()
+
+    lines = stream.getvalue().splitlines()
+    assert [json.loads(line)['index'] for line in lines] == list(range(500))
+    # 停止后恢复传递给根记录器，只保留 NullHandler
+    assert root_logger.propagate is True
+    assert not any(isinstance(handler, NonBlockingQueueHandler) for handler in root_logger.handlers)
+    assert any(isinstance(handler, logging.NullHandler) for handler in root_logger.handlers)
+    log_event(logger, 'test.after_shutdown')
+    assert len(stream.getvalue().splitlines()) == 500
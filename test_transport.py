@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+共享传输层与指标测试
+请求由挂载在会话上的替身适配器应答，不访问网络
+"""
+
+import threading
+import time
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from metrics import MetricsRegistry, percentile
+from transport import HedgingPolicy, HostLatencyTracker, ParserSession
+
+
+class StubAdapter(BaseAdapter):
+    """替身适配器：按 behaviours 依次决定每个请求的耗时与结果，记录发出请求的线程"""
+
+    def __init__(self, behaviours=None, default=(0.0, 200)):
+        super().__init__()
+        self.behaviours = list(behaviours or [])
+        self.default = default
+        self.threads = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        with self._lock:
+            self.threads.append(threading.current_thread().name)
+            delay, outcome = self.behaviours.pop(0) if self.behaviours else self.default
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(delay)
+        finally:
+            with self._lock:
+                self.active -= 1
+        if isinstance(outcome, Exception):
+            raise outcome
+        response = requests.Response()
+        response.status_code = outcome
+        response.url = request.url
+        response._content = b'ok'
+        return response
+
+    def close(self):
+        pass
+
+
+def make_session(adapter, samples=20, sample_latency=0.05, **policy):
+    """带对冲策略的会话，主机耗时统计预先填入 samples 个样本"""
+    tracker = HostLatencyTracker()
+    for _ in range(samples):
+        tracker.record('v.youku.com', sample_latency)
+    policy.setdefault('max_extra_load', 1.0)
+    session = ParserSession(hedging=HedgingPolicy(**policy), latency_tracker=tracker, metrics=MetricsRegistry())
+    session.mount('https://', adapter)
+    return session, tracker
+
+
+@pytest.mark.parametrize('values, q, expected', [
+    (range(1, 101), 95, 95),
+    (range(1, 101), 50, 50),
+    (range(1, 101), 99, 99),
+    (range(1, 101), 100, 100),
+    (range(1, 11), 50, 5),
+    (range(1, 11), 90, 9),
+    (range(1, 11), 0, 1),
+    ([7], 95, 7),
+])
+def test_percentile_nearest_rank(values, q, expected):
+    assert percentile(list(values), q) == expected
+
+
+def test_percentile_empty():
+    assert percentile([], 95) is None
+
+
+def test_primary_not_run_on_hedge_pool():
+    adapter = StubAdapter()
+    session, _ = make_session(adapter)
+    session.get('https://v.youku.com/v_show/id_X1.html')
+    assert adapter.threads == ['hedge-primary']
+
+
+def test_hedge_returned_before_slow_primary_completes():
+    adapter = StubAdapter([(0.5, 200), (0.0, 203)])
+    session, _ = make_session(adapter, sample_latency=0.05)
+    start = time.monotonic()
+    response = session.get('https://v.youku.com/v_show/id_X1.html')
+    assert response.status_code == 203
+    assert time.monotonic() - start < 0.4
+    assert session.metrics.get_counter('hedge.fired', host='v.youku.com') == 1
+    assert session.metrics.get_counter('hedge.won', host='v.youku.com') == 1
+
+
+def test_primary_wins_when_hedge_is_slower():
+    adapter = StubAdapter([(0.1, 200), (0.5, 203)])
+    session, _ = make_session(adapter, sample_latency=0.05)
+    assert session.get('https://v.youku.com/v_show/id_X1.html').status_code == 200
+    assert session.metrics.get_counter('hedge.fired', host='v.youku.com') == 1
+    assert session.metrics.get_counter('hedge.won', host='v.youku.com') == 0
+
+
+def test_hedged_request_metrics():
+    adapter = StubAdapter([(0.3, 200), (0.0, 203)])
+    session, _ = make_session(adapter, sample_latency=0.05)
+    assert session.get('https://v.youku.com/v_show/id_X1.html').status_code == 203
+    counters = session.metrics.snapshot()['counters']
+    assert counters == {'hedge.eligible{host=v.youku.com}': 1,
+                        'hedge.fired{host=v.youku.com}': 1,
+                        'hedge.won{host=v.youku.com}': 1}
+
+    # 落败的首次请求完成后同样计入耗时分布
+    deadline = time.monotonic() + 2
+    while session.metrics.snapshot()['observations'].get('http.latency{host=v.youku.com}', {}).get('count') != 2:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    latency = session.metrics.snapshot()['observations']['http.latency{host=v.youku.com}']
+    assert latency['p50'] < 0.1
+    assert latency['p99'] >= 0.3
+    assert 0.3 <= latency['sum'] < 0.5
+
+
+def test_primary_not_capped_by_hedge_pool():
+    # 对冲线程池只有 1 个线程，16 个并发首次请求仍同时进行
+    adapter = StubAdapter(default=(0.3, 200))
+    session, _ = make_session(adapter, sample_latency=1.0, max_workers=1)
+    threads = [threading.Thread(target=session.get, args=(f'https://v.youku.com/v_show/id_X{i}.html',))
+               for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert adapter.max_active == 16
+    assert session.metrics.get_counter('hedge.fired', host='v.youku.com') == 0
+
+
+def test_hedge_used_when_primary_fails():
+    adapter = StubAdapter([(0.2, requests.ConnectionError('reset')), (0.0, 200)])
+    session, _ = make_session(adapter, sample_latency=0.05)
+    response = session.get('https://v.youku.com/v_show/id_X1.html')
+    assert response.status_code == 200
+    assert session.metrics.get_counter('hedge.fired', host='v.youku.com') == 1
+    assert session.metrics.get_counter('hedge.won', host='v.youku.com') == 1
+
+
+def test_no_hedge_when_primary_is_fast():
+    adapter = StubAdapter([(0.0, 200)])
+    session, _ = make_session(adapter, sample_latency=0.2)
+    assert session.get('https://v.youku.com/v_show/id_X1.html').status_code == 200
+    time.sleep(0.3)
+    assert len(adapter.threads) == 1
+    assert session.metrics.get_counter('hedge.fired', host='v.youku.com') == 0
+
+
+def test_failed_attempts_recorded_in_latency_tracker():
+    adapter = StubAdapter([(0.05, requests.Timeout('read timeout'))])
+    session, tracker = make_session(adapter, samples=0)
+    with pytest.raises(requests.Timeout):
+        session.get('https://v.youku.com/v_show/id_X1.html')
+    assert tracker.count('v.youku.com') == 1
+    assert tracker.percentile('v.youku.com', 95) >= 0.05
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+视频元数据索引离线测试
+覆盖索引的写入与查询、超长字段在字符边界截断，以及集成解析器对各平台索引命中的结果构造（不访问网络）
+"""
+
+import pytest
+
+from integrated_parser import IntegratedVideoParser
+from line_router import LineRouter
+from negative_cache import NegativeCache
+from singleflight import SingleFlight
+from vid_index import MAX_FIELD_BYTES, VidIndex, build_index
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    return str(tmp_path / 'videos.idx')
+
+
+def test_build_and_lookup(index_path):
+    count = build_index([
+        (('youku.com', 'XNTEyNzQ4NjY1Mg=='), {'title': '山海情 第01集', 'duration': '45:10'}),
+        (('bilibili.com', 'BV1GJ411x7h7'), {'title': '旧标题'}),
+        (('bilibili.com', 'BV1GJ411x7h7'), {'title': 'Never Gonna Give You Up', 'thumbnail': 'https://i0.hdslb.com/a.jpg'}),
+    ], index_path)
+    index = VidIndex(index_path)
+    try:
+        assert count == len(index) == 2
+        assert index.get(('youku.com', 'XNTEyNzQ4NjY1Mg==')) == {
+            'title': '山海情 第01集', 'duration': '45:10', 'thumbnail': ''}
+        # 同键以后出现的为准
+        assert index.get(('bilibili.com', 'BV1GJ411x7h7'))['title'] == 'Never Gonna Give You Up'
+        assert index.get(('bilibili.com', 'BV0000000000')) is None
+        assert ('youku.com', 'XNTEyNzQ4NjY1Mg==') in index
+        assert [key for key, _ in index.items()] == ['bilibili.com|BV1GJ411x7h7', 'youku.com|XNTEyNzQ4NjY1Mg==']
+    finally:
+        index.close()
+
+
+@pytest.mark.parametrize('char', ['中', '😀', 'é'])
+@pytest.mark.parametrize('prefix', ['', 'a'])
+def test_long_multibyte_field_truncated_at_character_boundary(index_path, char, prefix):
+    title = prefix + char * MAX_FIELD_BYTES
+    build_index([(('iqiyi.com', 'a'), {'title': title})], index_path)
+    index = VidIndex(index_path)
+    try:
+        stored = index.get(('iqiyi.com', 'a'))['title']
+        assert len(stored.encode('utf-8')) <= MAX_FIELD_BYTES
+        assert title.startswith(stored) and len(stored.encode('utf-8')) > MAX_FIELD_BYTES - 4
+    finally:
+        index.close()
+
+
+def test_empty_or_foreign_file_rejected(index_path):
+    open(index_path, 'wb').close()
+    with pytest.raises(ValueError):
+        VidIndex(index_path)
+    with open(index_path, 'wb') as f:
+        f.write(b'not an index file at all')
+    with pytest.raises(ValueError):
+        VidIndex(index_path)
+
+
+@pytest.mark.parametrize('url', [
+    'https://www.iqiyi.com/v_19rr7qhfzc.html',
+    'https://www.mgtv.com/b/339542/8835412.html',
+    'https://v.youku.com/v_show/index.html?show=shanhaiqing',
+    'https://v.qq.com/x/cover/mzc00200mp8vo9b/n0035ba0y8r.html',
+])
+def test_index_hit_builds_result_for_every_platform(index_path, url):
+    parser = IntegratedVideoParser(singleflight=SingleFlight(), negative_cache=NegativeCache(),
+                                   router=LineRouter(exploration_rate=0.0))
+    key = parser.canonical_key(url)
+    build_index([(key, {'title': '索引中的标题', 'duration': '45:10'})], index_path)
+    parser.vid_index = VidIndex(index_path)
+
+    def offline(*args, **kwargs):
+        raise AssertionError('索引命中时不应请求网络')
+
+    parser._parse_video = offline
+    try:
+        result = parser.parse_video(url)
+    finally:
+        parser.vid_index.close()
+    assert result['success'] is True
+    assert result['parse_method'] == 'index'
+    assert result['title'] == '索引中的标题' and result['duration'] == '45:10'
+    assert result['parse_urls'] and result['best_parse_url'] == result['parse_urls'][0]['url']
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+连接预热离线测试
+覆盖 DNS 缓存的键归一化、主机范围、TTL 与失败不缓存，以及预热请求绕过限速；不访问网络
+"""
+
+import socket
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+from urllib3.util.connection import allowed_gai_family
+
+from rate_limit import HostRateLimiter
+from transport import ParserSession
+from warmup import ConnectionWarmer, DNSCache, collect_hosts
+
+ADDRESS = [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('10.0.0.1', 443))]
+
+
+class StubAdapter(BaseAdapter):
+    """替身适配器：所有请求返回 200，记录请求的链接"""
+
+    def __init__(self):
+        super().__init__()
+        self.urls = []
+
+    def send(self, request, **kwargs):
+        self.urls.append(request.url)
+        response = requests.Response()
+        response.status_code = 200
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    """替身 getaddrinfo：记录每次真实解析的参数"""
+    calls = []
+
+    def fake_getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
+        calls.append((host, port, family, type))
+        if host == 'missing.example.com':
+            raise socket.gaierror('not found')
+        return ADDRESS
+
+    monkeypatch.setattr(socket, 'getaddrinfo', fake_getaddrinfo)
+    return calls
+
+
+@pytest.fixture
+def dns_cache(lookups):
+    cache = DNSCache(ttl=60)
+    cache.install(['v.youku.com'])
+    yield cache
+    cache.uninstall()
+
+
+def test_warm_up_entry_hit_by_connection_lookup(dns_cache, lookups):
+    # 预热与 urllib3 建立连接时的调用参数不同，仍命中同一条缓存
+    dns_cache.resolve('v.youku.com', 443, allowed_gai_family())
+    assert socket.getaddrinfo('v.youku.com', 443, allowed_gai_family(), socket.SOCK_STREAM) == ADDRESS
+    assert socket.getaddrinfo('V.Youku.com', '443', allowed_gai_family()) == ADDRESS
+    assert len(lookups) == 1
+
+
+def test_only_registered_hosts_are_cached(dns_cache, lookups):
+    for _ in range(2):
+        socket.getaddrinfo('redis.internal', 6379, 0, socket.SOCK_STREAM)
+    assert len(lookups) == 2
+
+
+def test_non_tcp_lookups_bypass_cache(dns_cache, lookups):
+    for _ in range(2):
+        socket.getaddrinfo('v.youku.com', 53, 0, socket.SOCK_DGRAM)
+    assert len(lookups) == 2
+
+
+def test_failures_not_cached_and_ttl_expires(lookups, monkeypatch):
+    cache = DNSCache(ttl=60)
+    for _ in range(2):
+        with pytest.raises(socket.gaierror):
+            cache.resolve('missing.example.com')
+    assert len(lookups) == 2
+
+    now = [1000.0]
+    monkeypatch.setattr('warmup.time.monotonic', lambda: now[0])
+    cache.resolve('v.youku.com')
+    cache.resolve('v.youku.com')
+    assert len(lookups) == 3
+    now[0] += 61
+    cache.resolve('v.youku.com')
+    assert len(lookups) == 4
+
+
+def test_uninstall_restores_getaddrinfo(lookups):
+    original = socket.getaddrinfo
+    cache = DNSCache()
+    cache.install(['v.youku.com'])
+    cache.install(['v.qq.com'])
+    assert socket.getaddrinfo is not original
+    cache.uninstall()
+    assert socket.getaddrinfo is original
+
+
+def test_warm_up_bypasses_rate_limiter(lookups):
+    limiter = HostRateLimiter(default=(0.001, 1))
+    session = ParserSession(rate_limiter=limiter, rate_limit_blocking=False)
+    adapter = StubAdapter()
+    session.mount('https://', adapter)
+    hosts = collect_hosts(['https://jx.example.com/?url='])
+    results = ConnectionWarmer(session, hosts, dns_cache=DNSCache()).run()
+    assert results and all(results.values())
+    assert len(adapter.urls) == len(hosts)
+    # 每个主机的令牌仍在，首个用户请求不会被限速
+    assert all(limiter.try_acquire(host) for _, host, _ in hosts)
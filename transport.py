@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+共享HTTP传输层
+所有解析器的 session.get/head 都经过这里，统一记录各主机耗时，并支持对冲请求与按主机限速
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Iterable
+from urllib.parse import urlparse
+
+import requests
+
+from metrics import metrics as default_metrics, percentile, MetricsRegistry
+from rate_limit import HostRateLimiter, RateLimitExceeded
+
+# 默认启用对冲的平台页面主机
+DEFAULT_HEDGE_HOSTS = ('youku.com', 'v.qq.com', 'iqiyi.com')
+
+
+def host_matches(host: str, patterns: Iterable[str]) -> bool:
+    """主机名是否等于或属于给定域名"""
+    return any(host == p or host.endswith('.' + p) for p in patterns)
+
+
+class HostLatencyTracker:
+    """按主机统计最近请求耗时"""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, deque] = {}
+
+    def record(self, host: str, seconds: float) -> None:
+        """记录一次请求耗时"""
+        with self._lock:
+            samples = self._latencies.get(host)
+            if samples is None:
+                samples = self._latencies[host] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def count(self, host: str) -> int:
+        """已记录的样本数"""
+        with self._lock:
+            return len(self._latencies.get(host, ()))
+
+    def percentile(self, host: str, q: float) -> Optional[float]:
+        """主机耗时百分位数"""
+        with self._lock:
+            samples = list(self._latencies.get(host, ()))
+        return percentile(samples, q)
+
+
+# 进程级共享的主机耗时统计，短生命周期的解析器实例也能利用历史数据
+shared_latency_tracker = HostLatencyTracker()
+
+
+class HedgingPolicy:
+    """对冲请求策略
+
+    首次请求在主机观测到的 p95 耗时内未返回时，再发出一个相同请求，取先完成者。
+    对冲请求数占总请求数的比例不超过 max_extra_load。
+    """
+
+    def __init__(self,
+                 hosts: Iterable[str] = DEFAULT_HEDGE_HOSTS,
+                 max_extra_load: float = 0.05,
+                 percentile: float = 95.0,
+                 min_samples: int = 20,
+                 max_workers: int = 8):
+        self.hosts = tuple(hosts)
+        self.max_extra_load = max_extra_load
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._hedges = 0
+
+    def applies_to(self, method: str, host: str) -> bool:
+        """该请求是否适用对冲（仅 GET 平台页面）"""
+        return method.upper() == 'GET' and host_matches(host, self.hosts)
+
+    def count_request(self) -> None:
+        """统计一次可对冲请求"""
+        with self._lock:
+            self._requests += 1
+
+    def try_acquire_hedge(self) -> bool:
+        """在额外负载预算内时占用一次对冲名额"""
+        with self._lock:
+            if (self._hedges + 1) > self.max_extra_load * self._requests:
+                return False
+            self._hedges += 1
+            return True
+
+
+class ParserSession(requests.Session):
+    """解析器共享会话
+
+    配置 rate_limiter 后每次请求（含对冲请求）都需先获取目标主机的令牌：
+    阻塞模式下等待令牌（最多 rate_limit_timeout 秒），非阻塞模式下令牌不足立即抛出 RateLimitExceeded。
+    """
+
+    def __init__(self,
+                 hedging: Optional[HedgingPolicy] = None,
+                 rate_limiter: Optional[HostRateLimiter] = None,
+                 rate_limit_blocking: bool = True,
+                 rate_limit_timeout: Optional[float] = None,
+                 latency_tracker: Optional[HostLatencyTracker] = None,
+                 metrics: Optional[MetricsRegistry] = None):
+        super().__init__()
+        self.hedging = hedging
+        self.rate_limiter = rate_limiter
+        self.rate_limit_blocking = rate_limit_blocking
+        self.rate_limit_timeout = rate_limit_timeout
+        self.latency_tracker = latency_tracker or shared_latency_tracker
+        self.metrics = metrics or default_metrics
+        self._hedge_executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def request(self, method, url, *args, **kwargs):
+        """发送请求，适用时走对冲路径"""
+        host = urlparse(url).hostname or ''
+        if (self.hedging is not None and not kwargs.get('stream')
+                and self.hedging.applies_to(method, host)):
+            return self._hedged_request(host, method, url, *args, **kwargs)
+        return self._timed_request(host, method, url, *args, **kwargs)
+
+    def _throttle(self, host: str) -> None:
+        """按主机限速"""
+        if self.rate_limit_blocking:
+            acquired = self.rate_limiter.acquire(host, timeout=self.rate_limit_timeout)
+        else:
+            acquired = self.rate_limiter.try_acquire(host)
+        if not acquired:
+            raise RateLimitExceeded(f'主机 {host} 请求过于频繁，已被限速')
+
+    def _timed_request(self, host, method, url, *args, **kwargs):
+        """发送单个请求并记录耗时（失败与超时的尝试同样计入，避免 p95 被低估）"""
+        if self.rate_limiter is not None:
+            self._throttle(host)
+        start_time = time.monotonic()
+        try:
+            return super().request(method, url, *args, **kwargs)
+        finally:
+            elapsed = time.monotonic() - start_time
+            self.latency_tracker.record(host, elapsed)
+            self.metrics.observe('http.latency', elapsed, host=host)
+
+    def _get_hedge_executor(self) -> ThreadPoolExecutor:
+        """惰性创建对冲线程池"""
+        with self._executor_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(
+                    max_workers=self.hedging.max_workers,
+                    thread_name_prefix='hedge'
+                )
+            return self._hedge_executor
+
+    def _hedged_request(self, host, method, url, *args, **kwargs):
+        """对冲请求：首次请求超过 p95 未返回则在线程池中补发一次，取先成功返回者
+
+        首次请求在独立线程中执行，不受对冲线程池大小限制；调用线程只等待先到的成功响应，
+        落败的响应在返回后关闭。两次请求都失败时抛出首次请求的异常。
+        """
+        policy = self.hedging
+        policy.count_request()
+        self.metrics.incr('hedge.eligible', host=host)
+
+        delay = None
+        if self.latency_tracker.count(host) >= policy.min_samples:
+            delay = self.latency_tracker.percentile(host, policy.percentile)
+        if delay is None:
+            # 样本不足时不对冲
+            return self._timed_request(host, method, url, *args, **kwargs)
+
+        race = _HedgeRace()
+
+        def attempt(name):
+            try:
+                response = self._timed_request(host, method, url, *args, **kwargs)
+            except Exception as e:
+                race.fail(name, e)
+            else:
+                if not race.succeed(name, response):
+                    response.close()
+
+        threading.Thread(target=attempt, args=('primary',), name='hedge-primary', daemon=True).start()
+        if not race.wait(delay) and policy.try_acquire_hedge():
+            self.metrics.incr('hedge.fired', host=host)
+            race.add()
+            self._get_hedge_executor().submit(attempt, 'hedge')
+        race.wait()
+        if race.response is None:
+            raise race.error
+        if race.winner == 'hedge':
+            self.metrics.incr('hedge.won', host=host)
+        return race.response
+
+    def close(self):
+        """关闭会话及对冲线程池"""
+        if self._hedge_executor is not None:
+            self._hedge_executor.shutdown(wait=False)
+        super().close()
+
+
+class _HedgeRace:
+    """首次请求与对冲请求的竞速：记录第一个成功的响应；全部失败时保留首次请求的异常"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.pending = 1
+        self.response = None
+        self.winner: Optional[str] = None
+        self.error: Optional[BaseException] = None
+
+    def add(self) -> None:
+        """登记一个新的尝试"""
+        with self._cond:
+            self.pending += 1
+
+    def succeed(self, name: str, response) -> bool:
+        """记录成功的响应，已有胜者时返回 False（由调用方关闭落败的响应）"""
+        with self._cond:
+            self.pending -= 1
+            if self.response is not None:
+                return False
+            self.response, self.winner = response, name
+            self._cond.notify_all()
+            return True
+
+    def fail(self, name: str, error: BaseException) -> None:
+        """记录失败的尝试"""
+        with self._cond:
+            self.pending -= 1
+            if self.error is None or name == 'primary':
+                self.error = error
+            self._cond.notify_all()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待出现成功响应或全部尝试结束，超时返回 False"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.response is not None or self.pending == 0, timeout)
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+视频元数据索引
+把已解析过的视频（标题、时长、缩略图）按规范键 (平台, 视频ID) 排序写成定长记录的二进制文件；
+查询时 mmap 只读映射，在记录区二分查找，字段直接从映射区解码，进程常驻内存几乎为零
+
+文件布局：
+    文件头   HEADER（魔数、版本、记录数、字符串区偏移）
+    记录区   RECORD × 记录数，按键的 UTF-8 字节序排序；每条为 4 组 (偏移, 长度)，依次指向键、标题、时长、缩略图
+    字符串区 UTF-8 字符串顺序拼接
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+MAGIC = b'VIDX'
+VERSION = 1
+HEADER = struct.Struct('<4sHxxII')
+RECORD = struct.Struct('<IHIHIHIH')
+
+# 记录中的字符串字段（键之后）
+FIELDS = ('title', 'duration', 'thumbnail')
+
+# 单个字符串的最大字节数（长度字段为 16 位）
+MAX_FIELD_BYTES = 0xFFFF
+
+
+def index_key(key: Tuple[str, str]) -> bytes:
+    """规范键 (平台, 视频ID) 的索引形式"""
+    return f'{key[0]}|{key[1]}'.encode('utf-8')
+
+
+def _encode_field(value: Any) -> bytes:
+    """字段的 UTF-8 形式，超长时在字符边界处截断"""
+    encoded = str(value or '').encode('utf-8')
+    if len(encoded) <= MAX_FIELD_BYTES:
+        return encoded
+    return encoded[:MAX_FIELD_BYTES].decode('utf-8', 'ignore').encode('utf-8')
+
+
+def build_index(entries: Iterable[Tuple[Tuple[str, str], Dict[str, Any]]], path: str) -> int:
+    """由 (规范键, 元数据) 写出索引文件，同键以后出现的为准；返回记录数
+
+    先写入临时文件再原子替换，正在使用旧索引的进程不受影响。
+    """
+    latest: Dict[bytes, Tuple[bytes, ...]] = {}
+    for key, metadata in entries:
+        values = tuple(_encode_field(metadata.get(field)) for field in FIELDS)
+        encoded_key = index_key(key)
+        if len(encoded_key) <= MAX_FIELD_BYTES:
+            latest[encoded_key] = values
+
+    keys = sorted(latest)
+    blob_offset = HEADER.size + RECORD.size * len(keys)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(keys), blob_offset))
+        offset = 0
+        for key in keys:
+            fields = []
+            for value in (key,) + latest[key]:
+                fields += (offset, len(value))
+                offset += len(value)
+            f.write(RECORD.pack(*fields))
+        for key in keys:
+            f.write(key)
+            for value in latest[key]:
+                f.write(value)
+    os.replace(tmp_path, path)
+    return len(keys)
+
+
+class VidIndex:
+    """只读元数据索引（mmap）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空文件无法映射
+            self._file.close()
+            raise ValueError(f'索引文件为空: {path}')
+        magic, version, self._count, self._blob_offset = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f'不是有效的索引文件: {path}')
+        self._view = memoryview(self._mm)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _key_at(self, index: int) -> memoryview:
+        """第 index 条记录的键（映射区切片，不复制）"""
+        key_offset, key_length = struct.unpack_from('<IH', self._mm, HEADER.size + RECORD.size * index)
+        start = self._blob_offset + key_offset
+        return self._view[start:start + key_length]
+
+    def _find(self, key: bytes) -> int:
+        """二分查找，返回记录序号，未找到时返回 -1"""
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            # memoryview 不支持大小比较，转为 bytes（键很短）
+            candidate = self._key_at(middle).tobytes()
+            if candidate < key:
+                low = middle + 1
+            elif candidate > key:
+                high = middle
+            else:
+                return middle
+        return -1
+
+    def _decode(self, index: int) -> Dict[str, str]:
+        """解码记录中的字符串字段"""
+        values = RECORD.unpack_from(self._mm, HEADER.size + RECORD.size * index)
+        metadata = {}
+        for position, field in enumerate(FIELDS, 1):
+            start = self._blob_offset + values[position * 2]
+            metadata[field] = str(self._view[start:start + values[position * 2 + 1]], 'utf-8')
+        return metadata
+
+    def get(self, key: Tuple[str, str]) -> Optional[Dict[str, str]]:
+        """按规范键查询元数据，未收录时返回 None"""
+        index = self._find(index_key(key))
+        return self._decode(index) if index >= 0 else None
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        return self._find(index_key(key)) >= 0
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, str]]]:
+        """按键顺序遍历全部记录"""
+        for index in range(self._count):
+            yield str(self._key_at(index), 'utf-8'), self._decode(index)
+
+    def close(self) -> None:
+        """释放映射"""
+        view = getattr(self, '_view', None)
+        if view is not None:
+            view.release()
+            self._view = None
+        if not self._mm.closed:
+            self._mm.close()
+        self._file.close()
+
+
+def iter_result_entries(paths, canonical_key) -> Iterator[Tuple[Tuple[str, str], Dict[str, Any]]]:
+    """从 JSON Lines 解析结果（batch_cli / batch_job export 的输出）中读取成功结果"""
+    for path in paths or ['-']:
+        stream = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+        try:
+            for line in stream:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    continue
+                url = result.get('original_url') or result.get('input')
+                if result.get('success') and url:
+                    yield canonical_key(url), result
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='视频元数据索引')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='由 JSON Lines 解析结果生成索引')
+    build_parser.add_argument('inputs', nargs='*', help="输入文件；省略或 '-' 表示标准输入")
+    build_parser.add_argument('-o', '--output', required=True, help='索引文件路径')
+
+    get_parser = subparsers.add_parser('get', help='按链接查询索引')
+    get_parser.add_argument('index', help='索引文件路径')
+    get_parser.add_argument('url', help='视频链接')
+
+    args = parser.parse_args()
+
+    # 规范键只依赖链接本身，与解析时的计算方式一致
+    from integrated_parser import IntegratedVideoParser
+    canonical_key = IntegratedVideoParser().canonical_key
+
+    if args.command == 'build':
+        count = build_index(iter_result_entries(args.inputs, canonical_key), args.output)
+        print(f"已写入 {count} 条记录: {args.output}")
+    else:
+        index = VidIndex(args.index)
+        print(json.dumps(index.get(canonical_key(args.url)), ensure_ascii=False))
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+连接预热
+进程启动时在后台预解析并预连接平台主机与线路主机，首个用户请求即可复用连接池中的连接
+"""
+
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from urllib3.util.connection import allowed_gai_family
+
+from metrics import metrics
+
+# 解析器直接访问的平台主机
+PLATFORM_HOSTS = (
+    'v.youku.com', 'www.youku.com', 'v.qq.com', 'www.iqiyi.com',
+    'api.bilibili.com', 'www.mgtv.com'
+)
+
+
+class DNSCache:
+    """带 TTL 的 DNS 解析缓存
+
+    install() 后替换 socket.getaddrinfo，只有登记过的主机（预热的平台与线路主机）走缓存，
+    其他主机（如 Redis、第三方库访问的地址）照常解析。缓存键为 (主机, 端口, 地址族)，
+    只缓存 TCP 解析（urllib3 建立连接时以 SOCK_STREAM 调用）；失败结果不缓存。
+    """
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple, Tuple[float, list]] = {}
+        self._hosts: Set[str] = set()
+        self._original_getaddrinfo = None
+
+    def resolve(self, host: str, port: int = 443, family: int = 0,
+                type: int = socket.SOCK_STREAM, proto: int = 0, flags: int = 0) -> list:
+        """解析主机地址，命中未过期缓存时直接返回；非 TCP 或带 proto/flags 的查询不经缓存"""
+        getaddrinfo = self._original_getaddrinfo or socket.getaddrinfo
+        if type not in (0, socket.SOCK_STREAM) or proto or flags:
+            return getaddrinfo(host, port, family, type, proto, flags)
+        key = (host.lower(), str(port), family)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                metrics.incr('dns.cache_hit')
+                return entry[1]
+        addresses = getaddrinfo(host, port, family, socket.SOCK_STREAM)
+        with self._lock:
+            self._entries[key] = (now + self.ttl, addresses)
+        metrics.incr('dns.cache_miss')
+        return addresses
+
+    def add_hosts(self, hosts: Iterable[str]) -> None:
+        """登记走缓存的主机"""
+        with self._lock:
+            self._hosts.update(host.lower() for host in hosts)
+
+    def install(self, hosts: Iterable[str] = ()) -> None:
+        """登记主机并替换 socket.getaddrinfo（重复调用只追加主机）"""
+        self.add_hosts(hosts)
+        with self._lock:
+            if self._original_getaddrinfo is not None:
+                return
+            self._original_getaddrinfo = socket.getaddrinfo
+
+        def cached_getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
+            original = self._original_getaddrinfo or socket.getaddrinfo
+            if not isinstance(host, str) or host.lower() not in self._hosts:
+                return original(host, port, family, type, proto, flags)
+            return self.resolve(host, port, family, type, proto, flags)
+
+        socket.getaddrinfo = cached_getaddrinfo
+
+    def uninstall(self) -> None:
+        """恢复原始的 socket.getaddrinfo"""
+        with self._lock:
+            if self._original_getaddrinfo is not None:
+                socket.getaddrinfo = self._original_getaddrinfo
+                self._original_getaddrinfo = None
+
+
+# 进程级共享的 DNS 缓存
+shared_dns_cache = DNSCache()
+
+
+def collect_hosts(api_urls: Iterable[str]) -> List[Tuple[str, str, int]]:
+    """从线路模板中收集 (协议, 主机, 端口)，去重并保持顺序"""
+    seen = set()
+    targets = []
+    for url in list(api_urls) + [f'https://{host}/' for host in PLATFORM_HOSTS]:
+        parts = urlsplit(url)
+        if not parts.hostname:
+            continue
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        target = (parts.scheme, parts.hostname, port)
+        if target not in seen:
+            seen.add(target)
+            targets.append(target)
+    return targets
+
+
+class ConnectionWarmer:
+    """连接预热器（预热请求不消耗限速令牌，也不计入主机耗时统计）"""
+
+    def __init__(self,
+                 session: requests.Session,
+                 hosts: List[Tuple[str, str, int]],
+                 dns_cache: Optional[DNSCache] = None,
+                 max_workers: int = 8,
+                 timeout: float = 5):
+        self.session = session
+        self.hosts = hosts
+        self.dns_cache = dns_cache or shared_dns_cache
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.done = threading.Event()
+        self.results: Dict[str, bool] = {}
+
+    def _warm(self, target: Tuple[str, str, int]) -> None:
+        """预解析并预连接单个主机"""
+        scheme, host, port = target
+        try:
+            # 与 urllib3 建立连接时使用相同的地址族，预热的解析结果才能被真实连接命中
+            self.dns_cache.resolve(host, port, allowed_gai_family())
+            # HEAD 请求完成后连接回到会话连接池（含 TLS 握手），后续请求直接复用；
+            # 直接调用 requests.Session.request，绕过 ParserSession 的限速、对冲和耗时统计
+            requests.Session.request(self.session, 'HEAD', f'{scheme}://{host}:{port}/',
+                                     timeout=self.timeout, allow_redirects=False)
+            self.results[host] = True
+            metrics.incr('warmup.connected')
+        except Exception:
+            self.results[host] = False
+            metrics.incr('warmup.failed')
+
+    def run(self) -> Dict[str, bool]:
+        """同步预热全部主机"""
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='warmup') as executor:
+                list(executor.map(self._warm, self.hosts))
+        finally:
+            self.done.set()
+        return self.results
+
+    def start(self) -> threading.Thread:
+        """在后台线程中预热"""
+        thread = threading.Thread(target=self.run, name='connection-warmup', daemon=True)
+        thread.start()
+        return thread
@@ -9,16 +9,38 @@
 import requests
 import re
 import json
+import logging
 import random
 import time
 import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse, parse_qs, unquote, quote
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
+
+from transport import ParserSession
+from line_probe import probe_line
+from line_router import LineRouter, shared_router
+from line_catalog import Line, LineCatalog, get_catalog
+from parse_result import ParseResult, ParseUrlList
+from profiling import profiled
+from negative_cache import INVALID, UNEXTRACTABLE, TRANSIENT, error_type_for_status
+from structured_log import get_logger, log_event
+
+logger = get_logger('youku_enhanced_parser')
+
+# 路由表中优酷平台的键，与 EnhancedVIPParser.platforms 保持一致
+ROUTER_PLATFORM = 'youku.com'
+
+# 优酷专线 parse_urls 中每条线路的字段
+PARSE_URL_FIELDS = ('name', 'url', 'type', 'priority')
 
 class YoukuEnhancedParser:
     """优酷增强解析器"""
     
-    def __init__(self):
+    def __init__(self, session: Optional[requests.Session] = None, probe_mode: str = 'light',
+                 router: Optional[LineRouter] = None, catalog: Optional[LineCatalog] = None,
+                 probe_workers: int = 32):
         # 多个用户代理，随机轮换
         self.user_agents = [
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -28,60 +50,24 @@ class YoukuEnhancedParser:
             'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         ]
         
-        # 优酷专用解析接口
-        self.youku_parse_apis = [
-            {
-                'name': '优酷专线1-高清稳定',
-                'url': 'https://jx.618g.com/?url={}',
-                'type': 'iframe',
-                'priority': 1
-            },
-            {
-                'name': '优酷专线2-超清画质',
-                'url': 'https://jx.jsonplayer.com/player/?url={}',
-                'type': 'iframe',
-                'priority': 2
-            },
-            {
-                'name': '优酷专线3-快速解析',
-                'url': 'https://api.bb3.buzz/jiexi/?url={}',
-                'type': 'iframe',
-                'priority': 3
-            },
-            {
-                'name': '优酷专线4-VIP专用',
-                'url': 'https://www.1717yun.com/jx/ty.php?url={}',
-                'type': 'iframe',
-                'priority': 4
-            },
-            {
-                'name': '优酷专线5-无广告',
-                'url': 'https://vip.gaotian.love/api/?key=8CNrwNGWumgOHNK5r3H7jsDJb1XhPp&url={}',
-                'type': 'iframe',
-                'priority': 5
-            },
-            {
-                'name': '优酷专线6-备用线路',
-                'url': 'https://okjx.cc/?url={}',
-                'type': 'iframe',
-                'priority': 6
-            },
-            {
-                'name': '优酷专线7-极速播放',
-                'url': 'https://jx.bozrc.com:4433/player/?url={}',
-                'type': 'iframe',
-                'priority': 7
-            },
-            {
-                'name': '优酷专线8-智能解析',
-                'url': 'https://jx.xmflv.com/?url={}',
-                'type': 'iframe',
-                'priority': 8
-            }
-        ]
+        # 线路目录快照；为 None 时使用进程内共享、可热更新的目录
+        self._catalog = catalog
+        
+        # 线路探测方式：light 仅读取页面前几 KB，full 下载完整页面
+        self.probe_mode = probe_mode
+        self.probe_keywords = ('video', 'mp4', 'iframe', 'player', 'source')
+        
+        # 请求会话（可由集成解析器注入共享传输层）
+        self.session = session or ParserSession()
         
-        # 请求会话
-        self.session = requests.Session()
+        # 根据探测结果学习的线路路由表（默认进程内共享）
+        self.router = router or shared_router
+        
+        # 解析流水线中并行阶段使用的线程池（惰性创建）；线程按需创建，
+        # probe_workers 应不小于同时解析优酷链接的调用方数量，否则线路测试会相互排队
+        self.probe_workers = probe_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
         
         # 优酷链接正则模式
         self.youku_patterns = [
@@ -91,6 +77,27 @@ class YoukuEnhancedParser:
             r'youku\.com.*videoId[=:]([^&\s]+)',
             r'youku\.com/.*?/id_([^.]+)\.html'
         ]
+        
+        # 节目页分集列表数据块的键，块内每项以 encodeVid 或 videoId 给出分集ID；
+        # 页面其他位置（推荐、其他节目）的视频ID不计入分集
+        self.series_list_keys = ('videoList', 'episodeList')
+    
+    @property
+    def catalog(self) -> LineCatalog:
+        """当前线路目录快照"""
+        return self._catalog or get_catalog()
+    
+    @property
+    def youku_parse_apis(self) -> Tuple[Line, ...]:
+        """优酷专用解析接口（按优先级排序）"""
+        return self.catalog.group('youku')
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """获取流水线线程池"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.probe_workers, thread_name_prefix='youku-probe')
+            return self._executor
     
     def get_random_headers(self) -> Dict[str, str]:
         """获取随机请求头"""
@@ -111,60 +118,100 @@ class YoukuEnhancedParser:
         """检测是否为优酷链接"""
         return any(re.search(pattern, url) for pattern in ['youku\.com', 'v\.youku\.com'])
     
-    def extract_video_id(self, url: str) -> Optional[str]:
-        """提取优酷视频ID"""
-        # 尝试多种ID提取方式
+    def extract_video_id_from_url(self, url: str) -> Optional[str]:
+        """仅从链接本身提取优酷视频ID（不发起网络请求）"""
         for pattern in self.youku_patterns:
             match = re.search(pattern, url)
             if match:
                 return match.group(1)
+        return None
+    
+    def extract_video_id(self, url: str) -> Optional[str]:
+        """提取优酷视频ID"""
+        # 尝试多种ID提取方式
+        vid = self.extract_video_id_from_url(url)
+        if vid:
+            return vid
         
         # 如果直接匹配失败，尝试从页面内容提取
+        return self._extract_video_id_from_page(url)[0]
+    
+    def _extract_video_id_from_page(self, url: str) -> Tuple[Optional[str], Optional[str]]:
+        """从页面内容提取视频ID，返回 (视频ID, 失败类别)"""
         try:
             headers = self.get_random_headers()
             response = self.session.get(url, headers=headers, timeout=10)
-            if response.status_code == 200:
-                html = response.text
-                
-                # 多种ID提取模式
-                id_patterns = [
-                    r'"videoId"\s*:\s*"([^"]+)"',
-                    r'"vid"\s*:\s*"([^"]+)"',
-                    r'videoId["\']?\s*[:=]\s*["\']([^"\']+)["\']',
-                    r'data-id["\']?\s*[:=]\s*["\']([^"\']+)["\']',
-                    r'/id_([^.]+)\.html',
-                    r'vid[=:]([^&\s]+)'
-                ]
-                
-                for pattern in id_patterns:
-                    match = re.search(pattern, html)
-                    if match:
-                        return match.group(1)
-        except:
-            pass
+            if response.status_code != 200:
+                return None, error_type_for_status(response.status_code)
+            html = response.text
+            
+            # 多种ID提取模式
+            id_patterns = [
+                r'"videoId"\s*:\s*"([^"]+)"',
+                r'"vid"\s*:\s*"([^"]+)"',
+                r'videoId["\']?\s*[:=]\s*["\']([^"\']+)["\']',
+                r'data-id["\']?\s*[:=]\s*["\']([^"\']+)["\']',
+                r'/id_([^.]+)\.html',
+                r'vid[=:]([^&\s]+)'
+            ]
+            
+            for pattern in id_patterns:
+                match = re.search(pattern, html)
+                if match:
+                    return match.group(1), None
+        except Exception:
+            return None, TRANSIENT
         
-        return None
+        return None, UNEXTRACTABLE
     
+    @profiled()
     def parse_youku_video(self, url: str) -> Dict[str, Any]:
         """解析优酷视频（增强版）"""
         try:
             # 基本信息初始化
-            result = {
-                'success': False,
-                'platform': '优酷',
-                'original_url': url,
-                'title': '优酷视频',
-                'duration': '未知',
-                'thumbnail': '',
-                'vid': '',
-                'parse_urls': [],
-                'best_parse_url': None,
-                'vip_content': True,
-                'parse_method': 'enhanced'
-            }
+            result = ParseResult(
+                success=False,
+                platform='优酷',
+                original_url=url,
+                title='优酷视频',
+                duration='未知',
+                thumbnail='',
+                vid='',
+                best_parse_url=None,
+                vip_content=True,
+                parse_method='enhanced'
+            )
+            
+            # 生成所有解析链接（只保存排好序的线路，访问时才生成链接）；
+            # 线路目录可能被热替换，本次请求的排序与测试使用同一份目录
+            catalog = self.catalog
+            encoded_url = quote(url, safe=':/?#[]@!$&\'()*+,;=')
+            parse_urls = result.set_lines(self._ranked_lines(catalog), encoded_url, PARSE_URL_FIELDS)
+            
+            # 线路测试与页面信息获取互不依赖（分别请求线路主机和优酷），
+            # 在后台线程中测试线路，与下面的页面请求并行
+            best_api_future = None
+            abandon = threading.Event()
+            if parse_urls:
+                best_api_future = self._get_executor().submit(self._test_best_parse_api, url, abandon, catalog)
             
-            # 提取视频ID
-            vid = self.extract_video_id(url)
+            # 提取视频ID；只有页面返回 404/410 时才判定链接无效，
+            # 页面正常但找不到视频ID（或请求失败）时仍返回按原链接生成的解析链接
+            vid = self.extract_video_id_from_url(url)
+            if not vid:
+                vid, error_type = self._extract_video_id_from_page(url)
+                if error_type == INVALID:
+                    # 未开始的测试直接取消，已开始的在测试下一条线路前停止
+                    abandon.set()
+                    if best_api_future is not None:
+                        best_api_future.cancel()
+                    return {
+                        'success': False,
+                        'error': '无法提取优酷视频ID，请检查链接是否正确',
+                        'error_type': error_type,
+                        'platform': '优酷',
+                        'original_url': url
+                    }
             if vid:
                 result['vid'] = vid
             
@@ -173,17 +220,13 @@ class YoukuEnhancedParser:
             if page_info:
                 result.update(page_info)
             
-            # 生成所有解析链接
-            parse_urls = self._generate_parse_urls(url)
-            result['parse_urls'] = parse_urls
-            
             if parse_urls:
-                result['best_parse_url'] = parse_urls[0]['url']
+                result['best_parse_url'] = parse_urls.lines[0].format(encoded_url)
                 result['success'] = True
             
-            # 测试最佳解析链接
-            if result['success']:
-                best_api = self._test_best_parse_api(url)
+            # 汇合最佳解析链接测试结果
+            if best_api_future is not None:
+                best_api = best_api_future.result()
                 if best_api:
                     result['best_parse_url'] = best_api['url']
                     result['recommended_api'] = best_api['name']
@@ -194,9 +237,122 @@ class YoukuEnhancedParser:
             return {
                 'success': False,
                 'error': f'优酷专线解析错误: {str(e)}',
+                'error_type': TRANSIENT,
+                'platform': '优酷',
+                'original_url': url
+            }
+    
+    def build_url_only_result(self, url: str, catalog: Optional[LineCatalog] = None) -> Optional[Dict[str, Any]]:
+        """仅根据链接构造解析结果（不发起网络请求），链接中没有视频ID时返回 None"""
+        vid = self.extract_video_id_from_url(url)
+        if not vid:
+            return None
+        return self._link_only_result(url, vid, 'url_only', catalog)
+    
+    def build_metadata_result(self, url: str, metadata: Dict[str, str], parse_method: str,
+                              catalog: Optional[LineCatalog] = None) -> Dict[str, Any]:
+        """由已知元数据（标题、时长、缩略图）构造解析结果（不发起网络请求），链接中没有视频ID时也可用"""
+        result = self._link_only_result(url, self.extract_video_id_from_url(url) or '', parse_method, catalog)
+        result.update((field, value) for field, value in metadata.items() if value)
+        return result
+    
+    def _link_only_result(self, url: str, vid: str, parse_method: str,
+                          catalog: Optional[LineCatalog]) -> Dict[str, Any]:
+        """不含页面信息的成功结果，专线线路按路由表排序"""
+        result = ParseResult(
+            success=True,
+            platform='优酷',
+            original_url=url,
+            title='优酷视频',
+            duration='未知',
+            thumbnail='',
+            vid=vid,
+            vip_content=True,
+            parse_method=parse_method
+        )
+        encoded_url = quote(url, safe=':/?#[]@!$&\'()*+,;=')
+        parse_urls = result.set_lines(self._ranked_lines(catalog), encoded_url, PARSE_URL_FIELDS)
+        result['best_parse_url'] = parse_urls.lines[0].format(encoded_url) if parse_urls else None
+        return result
+    
+    def parse_series(self, url: str) -> Dict[str, Any]:
+        """解析整部剧集：只请求一次节目页，从中提取全部分集ID并批量生成每集的解析结果"""
+        try:
+            headers = self.get_random_headers()
+            response = self.session.get(url, headers=headers, timeout=15)
+            if response.status_code != 200:
+                return {
+                    'success': False,
+                    'error': f'获取节目页失败: HTTP {response.status_code}',
+                    'error_type': error_type_for_status(response.status_code),
+                    'platform': '优酷',
+                    'original_url': url
+                }
+            html = response.text
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'优酷剧集解析错误: {str(e)}',
+                'error_type': TRANSIENT,
+                'platform': '优酷',
+                'original_url': url
+            }
+        
+        info = self._extract_page_info(html) or {}
+        series_title = info.get('title', '优酷视频')
+        
+        vids = self._extract_series_vids(html)
+        if not vids:
+            # 单集页面没有分集列表时，至少返回当前这一集
+            vid = self.extract_video_id_from_url(url)
+            if vid:
+                vids.append(vid)
+        if not vids:
+            return {
+                'success': False,
+                'error': '页面中未找到分集信息',
+                'error_type': UNEXTRACTABLE,
                 'platform': '优酷',
                 'original_url': url
             }
+        
+        # 所有分集使用同一份线路目录
+        catalog = self.catalog
+        episodes = []
+        for index, vid in enumerate(vids, 1):
+            episode = self.build_url_only_result(f'https://v.youku.com/v_show/id_{vid}.html', catalog)
+            episode['title'] = f'{series_title} 第{index}集'
+            episode['episode'] = index
+            episodes.append(episode)
+        
+        return {
+            'success': True,
+            'platform': '优酷',
+            'original_url': url,
+            'title': series_title,
+            'thumbnail': info.get('thumbnail', ''),
+            'episode_count': len(episodes),
+            'episodes': episodes,
+            'parse_method': 'series'
+        }
+    
+    def _extract_series_vids(self, html: str) -> List[str]:
+        """从节目页的分集列表数据块中提取分集ID（按出现顺序去重）"""
+        decoder = json.JSONDecoder()
+        for key in self.series_list_keys:
+            for match in re.finditer(rf'"{key}"\s*:\s*\[', html):
+                try:
+                    items, _ = decoder.raw_decode(html, match.end() - 1)
+                except ValueError:
+                    continue
+                vids = [
+                    vid for vid in (item.get('encodeVid') or item.get('videoId')
+                                    for item in items if isinstance(item, dict))
+                    if isinstance(vid, str) and re.fullmatch(r'X[a-zA-Z0-9=]+', vid)
+                ]
+                if vids:
+                    return list(dict.fromkeys(vids))
+        return []
     
     def _get_page_info(self, url: str) -> Optional[Dict[str, Any]]:
         """获取页面基本信息"""
@@ -205,100 +361,107 @@ class YoukuEnhancedParser:
             response = self.session.get(url, headers=headers, timeout=15)
             
             if response.status_code == 200:
-                html = response.text
-                info = {}
-                
-                # 提取标题
-                title_patterns = [
-                    r'<title>(.*?)</title>',
-                    r'"title"\s*:\s*"([^"]+)"',
-                    r'data-title["\']?\s*[:=]\s*["\']([^"\']+)["\']'
-                ]
-                
-                for pattern in title_patterns:
-                    match = re.search(pattern, html)
-                    if match:
-                        title = match.group(1).strip()
-                        # 清理标题
-                        title = re.sub(r'\s*-\s*优酷.*$', '', title)
-                        title = re.sub(r'\s*-\s*视频.*$', '', title)
-                        if title and len(title) > 2:
-                            info['title'] = title
-                            break
-                
-                # 提取缩略图
-                thumb_patterns = [
-                    r'"poster"\s*:\s*"([^"]+)"',
-                    r'"img"\s*:\s*"([^"]+)"',
-                    r'data-poster["\']?\s*[:=]\s*["\']([^"\']+)["\']'
-                ]
-                
-                for pattern in thumb_patterns:
-                    match = re.search(pattern, html)
-                    if match:
-                        thumbnail = match.group(1)
-                        if thumbnail.startswith('http'):
-                            info['thumbnail'] = thumbnail
-                            break
-                
-                # 提取时长
-                duration_patterns = [
-                    r'"duration"\s*:\s*(\d+)',
-                    r'data-duration["\']?\s*[:=]\s*["\']?(\d+)["\']?'
-                ]
-                
-                for pattern in duration_patterns:
-                    match = re.search(pattern, html)
-                    if match:
-                        duration_seconds = int(match.group(1))
-                        info['duration'] = self._format_duration(duration_seconds)
-                        break
-                
-                return info if info else None
+                return self._extract_page_info(response.text)
                 
         except Exception as e:
-            print(f"获取页面信息失败: {e}")
+            log_event(logger, 'page_info.failed', level=logging.WARNING,
+                      url=url, platform='youku', stage='page_info', outcome='failure', error=str(e))
             return None
     
-    def _generate_parse_urls(self, original_url: str) -> List[Dict[str, str]]:
-        """生成所有解析链接"""
-        encoded_url = quote(original_url, safe=':/?#[]@!$&\'()*+,;=')
+    def _extract_page_info(self, html: str) -> Optional[Dict[str, Any]]:
+        """从页面HTML中提取标题、缩略图和时长"""
+        info = {}
+        
+        # 提取标题
+        title_patterns = [
+            r'<title>(.*?)</title>',
+            r'"title"\s*:\s*"([^"]+)"',
+            r'data-title["\']?\s*[:=]\s*["\']([^"\']+)["\']'
+        ]
+        
+        for pattern in title_patterns:
+            match = re.search(pattern, html)
+            if match:
+                title = match.group(1).strip()
+                # 清理标题
+                title = re.sub(r'\s*-\s*优酷.*$', '', title)
+                title = re.sub(r'\s*-\s*视频.*$', '', title)
+                if title and len(title) > 2:
+                    info['title'] = title
+                    break
+        
+        # 提取缩略图
+        thumb_patterns = [
+            r'"poster"\s*:\s*"([^"]+)"',
+            r'"img"\s*:\s*"([^"]+)"',
+            r'data-poster["\']?\s*[:=]\s*["\']([^"\']+)["\']'
+        ]
+        
+        for pattern in thumb_patterns:
+            match = re.search(pattern, html)
+            if match:
+                thumbnail = match.group(1)
+                if thumbnail.startswith('http'):
+                    info['thumbnail'] = thumbnail
+                    break
+        
+        # 提取时长
+        duration_patterns = [
+            r'"duration"\s*:\s*(\d+)',
+            r'data-duration["\']?\s*[:=]\s*["\']?(\d+)["\']?'
+        ]
         
-        parse_urls = []
-        for api in sorted(self.youku_parse_apis, key=lambda x: x['priority']):
-            parse_url = api['url'].format(encoded_url)
-            parse_urls.append({
-                'name': api['name'],
-                'url': parse_url,
-                'type': api['type'],
-                'priority': api['priority']
-            })
+        for pattern in duration_patterns:
+            match = re.search(pattern, html)
+            if match:
+                duration_seconds = int(match.group(1))
+                info['duration'] = self._format_duration(duration_seconds)
+                break
         
-        return parse_urls
+        return info if info else None
+    
+    def _ranked_lines(self, catalog: Optional[LineCatalog] = None) -> List[Line]:
+        """优酷专线线路，按路由表得分排序，无数据时即为优先级顺序；catalog 为本次请求读取的线路目录"""
+        catalog = catalog or self.catalog
+        return self.router.rank(ROUTER_PLATFORM, list(catalog.group('youku')))
+    
+    def _generate_parse_urls(self, original_url: str, catalog: Optional[LineCatalog] = None) -> List[Dict[str, str]]:
+        """生成所有解析链接"""
+        encoded_url = quote(original_url, safe=':/?#[]@!$&\'()*+,;=')
+        return ParseUrlList(self._ranked_lines(catalog), encoded_url, PARSE_URL_FIELDS).to_list()
     
-    def _test_best_parse_api(self, original_url: str) -> Optional[Dict[str, Any]]:
-        """测试并返回最佳解析接口"""
+    def _test_best_parse_api(self, original_url: str,
+                             abandon: Optional[threading.Event] = None,
+                             catalog: Optional[LineCatalog] = None) -> Optional[Dict[str, Any]]:
+        """测试并返回最佳解析接口；abandon 被设置后不再测试后续线路"""
         encoded_url = quote(original_url, safe=':/?#[]@!$&\'()*+,;=')
+        catalog = catalog or self.catalog
         
-        # 按优先级测试接口
-        for api in sorted(self.youku_parse_apis, key=lambda x: x['priority']):
+        # 按路由表顺序测试接口，首条线路由 ε-贪心策略选出，通常一次探测即可命中
+        for api in self.router.order(ROUTER_PLATFORM, list(catalog.group('youku'))):
+            if abandon is not None and abandon.is_set():
+                return None
             try:
-                parse_url = api['url'].format(encoded_url)
+                parse_url = api.format(encoded_url)
                 headers = self.get_random_headers()
                 
                 # 快速测试接口可用性
                 response = self.session.head(parse_url, headers=headers, timeout=5)
                 
                 if response.status_code == 200:
+                    response_time = response.elapsed.total_seconds()
+                    self.router.record(ROUTER_PLATFORM, api['name'], True, response_time)
                     return {
                         'name': api['name'],
                         'url': parse_url,
                         'type': api['type'],
                         'priority': api['priority'],
-                        'response_time': response.elapsed.total_seconds()
+                        'response_time': response_time
                     }
+                self.router.record(ROUTER_PLATFORM, api['name'], False)
                     
             except Exception as e:
+                self.router.record(ROUTER_PLATFORM, api['name'], False)
                 continue
         
         return None
@@ -317,50 +480,43 @@ class YoukuEnhancedParser:
         else:
             return f"{minutes:02d}:{seconds:02d}"
     
+    @profiled()
     def test_all_apis(self, test_url: str) -> List[Dict[str, Any]]:
         """测试所有解析接口"""
         results = []
         encoded_url = quote(test_url, safe=':/?#[]@!$&\'()*+,;=')
         
         for api in self.youku_parse_apis:
-            try:
-                parse_url = api['url'].format(encoded_url)
-                headers = self.get_random_headers()
-                
-                start_time = time.time()
-                response = self.session.get(parse_url, headers=headers, timeout=10)
-                response_time = time.time() - start_time
-                
-                if response.status_code == 200:
-                    # 检测是否包含视频相关内容
-                    content = response.text.lower()
-                    has_video_content = any(keyword in content for keyword in [
-                        'video', 'mp4', 'iframe', 'player', 'source'
-                    ])
-                    
-                    results.append({
-                        'name': api['name'],
-                        'url': parse_url,
-                        'available': has_video_content,
-                        'response_time': response_time,
-                        'status_code': response.status_code,
-                        'priority': api['priority']
-                    })
-                else:
-                    results.append({
-                        'name': api['name'],
-                        'url': parse_url,
-                        'available': False,
-                        'error': f'状态码: {response.status_code}',
-                        'priority': api['priority']
-                    })
-                    
-            except Exception as e:
+            parse_url = api.format(encoded_url)
+            probe = probe_line(
+                self.session, parse_url, self.get_random_headers(),
+                timeout=10, keywords=self.probe_keywords, mode=self.probe_mode
+            )
+            self.router.record(ROUTER_PLATFORM, api['name'], probe['available'], probe.get('response_time'))
+            
+            if 'error' in probe:
                 results.append({
                     'name': api['name'],
-                    'url': api['url'].format(test_url),
+                    'url': api.format(test_url),
                     'available': False,
-                    'error': str(e),
+                    'error': probe['error'],
+                    'priority': api['priority']
+                })
+            elif probe['status_code'] == 200:
+                results.append({
+                    'name': api['name'],
+                    'url': parse_url,
+                    'available': probe['available'],
+                    'response_time': probe['response_time'],
+                    'status_code': probe['status_code'],
+                    'priority': api['priority']
+                })
+            else:
+                results.append({
+                    'name': api['name'],
+                    'url': parse_url,
+                    'available': False,
+                    'error': f'状态码: {probe["status_code"]}',
                     'priority': api['priority']
                 })
         
@@ -370,10 +526,10 @@ class YoukuEnhancedParser:
         """获取所有解析接口信息"""
         return [
             {
-                'name': api['name'],
-                'url': api['url'].replace('{}', '[视频链接]'),
-                'type': api['type'],
-                'priority': api['priority']
+                'name': api.name,
+                'url': api.display_url,
+                'type': api.type,
+                'priority': api.priority
             }
-            for api in sorted(self.youku_parse_apis, key=lambda x: x['priority'])
-        ] 
\ No newline at end of file
+            for api in self.youku_parse_apis
+        ]